@@ -1,37 +1,64 @@
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
-from fastapi.responses import FileResponse
-from app.services.query_generator import generate_sql
-from app.services.database import execute_sql_query
-from app.services.result_formatter import format_results
+from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, Request
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from app.services.query_generator import generate_sql_async, sql_translation_cache, sql_prompt_model
+from app.services.prompt_templates import prompt_metrics
+from app.services.database import execute_sql_query_async, get_pool_stats, query_result_cache
+from app.services.result_cache import CACHEABLE_TABLES
+from app.services.sql_guard import sql_guard, UnsafeQueryError, QueryTooExpensiveError
+from app.services.result_formatter import format_results_async, stream_format_results
 from app.models.models import *
 from app.models.admin import AdminSignup, AdminLogin, TokenResponse
 from app.services.auth_services import admin_signup, admin_login
-from app.core.security import get_current_admin
+from app.services.rate_limiter import login_rate_limiter, RateLimitExceeded
+from app.services.mail_service import mail_sender
+from app.core.security import get_current_admin, oauth2_scheme
+from app.core.token_verifier import token_verifier, InvalidTokenError
+from app.core.id_generator import id_generator
+from app.core.stage_timer import pipeline_timer
+from app.core.deadline import Deadline, StageTimeoutError
 from app.services.visualization_service import get_chart_suggestion, generate_plotly_chart
 from app.services.redis_service import *
 from app.services.mongo_service import *
-from app.services.excel_service import generate_excel, get_excel_path
+from app.services.excel_service import get_excel_path, media_type_for
+from app.services.export_jobs import enqueue_export, get_export_status, export_worker_pool, DONE, FAILED
 from app.services.extract_tables_service import *
 from app.core.config import *
 from app.core.helper import *
 import os
+import json
+import time
+import asyncio
 import logging
 import traceback
-from datetime import datetime, timedelta
+from datetime import datetime
 from app.core.config import config
-from app.services.database import db
 
 # Configure logging
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Canned replies for the markers the SQL generator returns instead of a query
+SPECIAL_RESPONSES = {
+    "unwanted": "I will answer only loan-related questions.",
+    "restricted": "You can only read the data; modifications or creations are not allowed.",
+    "ensitive": "I won't provide any sensitive data of users.",
+}
+
 @router.post("/admin/login/", response_model=TokenResponse)
-async def login(admin: AdminLogin):
+async def login(admin: AdminLogin, request: Request):
     """Logs in an admin and returns JWT token"""
     try:
+        client_ip = request.client.host if request.client else "unknown"
+        try:
+            await login_rate_limiter.hit(admin.email, client_ip)  # Before bcrypt, so storms never reach it
+        except RateLimitExceeded as e:
+            logger.warning(f"Login rate limited ({str(e)}): {admin.email} from {client_ip}")
+            raise HTTPException(status_code=429, detail="Too many login attempts. Please try again later.",
+                                headers={"Retry-After": str(e.retry_after)})
         token_data = await admin_login(admin.email, admin.password)
         if not token_data:
             raise HTTPException(status_code=401, detail="Invalid email or password")
+        await login_rate_limiter.reset(admin.email)
         return token_data
     except HTTPException as he:
         # Re-raise HTTP exceptions as they're already handled
@@ -41,138 +68,248 @@ async def login(admin: AdminLogin):
         logger.debug(traceback.format_exc())
         raise HTTPException(status_code=500, detail="Internal server error during login")
 
+@router.post("/admin/logout/")
+async def logout(token: str = Depends(oauth2_scheme)):
+    """Revoke the caller's JWT so it is rejected for the rest of its lifetime"""
+    try:
+        claims = await token_verifier.revoke(token)
+        logger.info(f"Token revoked for admin: {claims.get('sub')}")
+        return {"message": "Logged out"}
+    except InvalidTokenError:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    except Exception as e:
+        logger.error(f"Error revoking token: {str(e)}")
+        logger.debug(traceback.format_exc())
+        raise HTTPException(status_code=500, detail="Failed to log out")
+
+async def guard_query(sql_query: str):
+    """Validate and cost-check generated SQL; unsafe or over-budget queries become 400s"""
+    try:
+        return await sql_guard.prepare(sql_query)
+    except QueryTooExpensiveError as e:
+        logger.warning(f"Query over cost budget ({str(e)}): {sql_query}")
+        raise HTTPException(status_code=400, detail="This question would scan too much data. Please narrow it down, for example to a date range or a specific loan.")
+    except UnsafeQueryError as e:
+        logger.warning(f"Invalid SQL query generated ({str(e)}): {sql_query}")
+        raise HTTPException(status_code=400, detail="Failed to generate a valid SQL query")
+
+async def run_query(sql_query: str):
+    """Guard then execute a generated query; returns (guarded, rows, truncated)"""
+    guarded = await guard_query(sql_query)
+    try:
+        query_results, truncated = await execute_sql_query_async(guarded.sql, guarded.max_rows)
+    except asyncio.CancelledError:
+        raise  # Deadline hit; execute_sql_query_async has already killed the query
+    except Exception as e:
+        logger.debug(traceback.format_exc())
+        raise HTTPException(status_code=500, detail="Failed to execute database query")
+    if isinstance(query_results, dict) and "error" in query_results:
+        # MySQL errors come back as a result rather than raising
+        logger.error(f"Database query failed: {query_results['error']}")
+        raise HTTPException(status_code=500, detail="Failed to execute database query")
+    # Only a translation that passed the guard and ran is worth serving again
+    await sql_translation_cache.confirm(sql_query)
+    return guarded, query_results, truncated
+
+async def enqueue_export_for(conversation_id: str, sql_query: str, query_results, truncated: bool):
+    """Queue the export for a conversation; the file is written by the background export workers"""
+    if truncated:
+        # The in-memory rows are capped; the job streams the full result from MySQL instead
+        return await enqueue_export(conversation_id, sql_query=sql_query, fmt=config.EXPORT_LARGE_FORMAT)
+    return await enqueue_export(conversation_id, rows=query_results, sql_query=sql_query)
+
+def extract_stage(guarded, timings):
+    """Table/column extraction only needs the validated SQL, so it runs while the results are formatted"""
+    return pipeline_timer.run("extract_tables", asyncio.to_thread(extract_tables_and_columns, guarded.validated), timings)
+
+def check_extracted(extracted):
+    """Surface an extraction failure; returns the extracted (tables, cols)"""
+    if isinstance(extracted, Exception):
+        logger.error(f"Failed to extract tables: {str(extracted)}")
+        raise HTTPException(status_code=500, detail="Failed to format query results")
+    tables, cols = extracted
+    logger.debug(f"Extracted tables: {tables}, columns: {cols}")
+    return tables, cols
+
+def build_conversation_record(conversation_id, user_input, formatted_response, tables, cols, query_results, truncated):
+    return {
+        "conversation_id": conversation_id,
+        "query": user_input,
+        "response": formatted_response,
+        # "visualization": chart_img,
+        "timestamp": datetime.utcnow().isoformat(),
+        "data_type": tables,
+        "cols": cols,
+        "rows": len(query_results),
+        "truncated": truncated,
+        "excel_path": EXCEL_STORAGE_PATH+f"/{conversation_id}"
+    }
+
+async def rebuild_thread_cache(thread_id, admin_id):
+    """Re-cache a thread in Redis from MongoDB; returns its conversation count, or None if that failed"""
+    try:
+        snapshot = await get_thread_snapshot(admin_id, thread_id, config.THREAD_CACHE_MAX_CONVERSATIONS)
+        if snapshot is None:
+            return None
+        await insert_into_redis_async(snapshot)
+        return snapshot["conversation_count"]
+    except Exception as e:
+        # Redis is only a cache; the next append finds the thread missing and tries again
+        logger.error(f"Failed to rebuild Redis thread cache: {str(e)}")
+        return None
+
+async def persist_conversation(thread_id, is_new_thread, admin_id, user_input, conversation_record, timings):
+    """
+    Write a conversation to MongoDB and Redis concurrently, creating its thread first if it is new.
+    Returns the thread's conversation count when appending to an existing thread, otherwise None.
+    """
+    if not is_new_thread:
+        logger.info(f"Appending to existing thread {thread_id}")
+        append_result, inserted = await asyncio.gather(
+            pipeline_timer.run("redis_append", append_conversation_async(thread_id, conversation_record), timings),
+            pipeline_timer.run("insert_conversation", insert_into_conversations_async(thread_id, admin_id, conversation_record), timings),
+            return_exceptions=True
+        )
+        for error in (append_result, inserted):
+            if isinstance(error, Exception):
+                logger.error(f"Failed to update existing thread: {str(error)}")
+                raise HTTPException(status_code=500, detail="Failed to update conversation history")
+        if append_result["total_conversations"] is None:
+            # The cached thread expired; MongoDB now has this conversation too, so re-cache from it
+            return await pipeline_timer.run("redis_rebuild", rebuild_thread_cache(thread_id, admin_id), timings)
+        return append_result["total_conversations"]
+
+    # New thread: the thread goes first so the conversation insert can move its end_timestamp
+    logger.info(f"Creating new thread with ID: {thread_id}")
+    try:
+        await pipeline_timer.run("insert_thread", insert_into_threads_async(thread_id, admin_id, user_input), timings)
+    except Exception as e:
+        logger.error(f"Failed to create new thread: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to create new conversation thread")
+    thread_data = {
+        "thread_id": thread_id,
+        "admin_id": admin_id,
+        "chat_name": user_input,
+        "conversations": [conversation_record]
+    }
+    inserted, cached = await asyncio.gather(
+        pipeline_timer.run("insert_conversation", insert_into_conversations_async(thread_id, admin_id, conversation_record), timings),
+        pipeline_timer.run("redis_insert", insert_into_redis_async(thread_data), timings),
+        return_exceptions=True
+    )
+    if isinstance(inserted, Exception):
+        logger.error(f"Failed to create new thread: {str(inserted)}")
+        raise HTTPException(status_code=500, detail="Failed to create new conversation thread")
+    if isinstance(cached, Exception):
+        # Continue even if Redis fails, as it might be a caching layer
+        logger.error(f"Redis insertion error: {str(cached)}")
+    else:
+        logger.debug("Successfully inserted thread data into Redis")
+    return None
+
+async def persist_response(conversation_id, thread_id, is_new_thread, admin_id, user_input, conversation_record,
+                           guarded, query_results, truncated, timings):
+    """
+    Persist the conversation and queue its export. Only runs once the response is formatted,
+    so a failed or timed-out format leaves no thread or export job behind.
+    """
+    export_sql = sql_guard.for_export(guarded.validated)  # Exports may read past the interactive row cap
+    persisted, exported = await asyncio.gather(
+        persist_conversation(thread_id, is_new_thread, admin_id, user_input, conversation_record, timings),
+        pipeline_timer.run("export", enqueue_export_for(conversation_id, export_sql, query_results, truncated), timings),
+        return_exceptions=True
+    )
+    if isinstance(exported, Exception):
+        # Continue even if Excel generation fails
+        logger.error(f"Excel generation error: {str(exported)}")
+    if isinstance(persisted, Exception):
+        raise persisted
+    return persisted
+
 @router.post("/generate-response/")
 async def process_user_input(request: UserInputRequest, admin: dict = Depends(get_current_admin)):
     """Process user query, generate SQL, execute query and return formatted results with visualization"""
     try:
         admin_id = admin["admin_id"]        
+        deadline = Deadline(config.REQUEST_TIMEOUT)
         # Generate SQL from user input
         try:
-            sql_query = generate_sql(request.user_input, request.thread_id if hasattr(request, "thread_id") else None)
+            sql_query = await deadline.run(
+                "sql_generation",
+                generate_sql_async(request.user_input, request.thread_id if hasattr(request, "thread_id") else None),
+                config.SQL_GENERATION_TIMEOUT
+            )
+        except StageTimeoutError:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail="Failed to generate SQL query")
 
         # Handle special query cases
-        if sql_query.lower() == "unwanted":
-            return {"message": "I will answer only loan-related questions."}
-        elif sql_query.lower() == "restricted":
-            return {"message": "You can only read the data; modifications or creations are not allowed."}
-        elif sql_query.lower() == "ensitive":
-            return {"message": "I won't provide any sensitive data of users."}
-
-        elif sql_query.lower().startswith("select"):
-            # Execute SQL query
-            try:
-                query_results = execute_sql_query(sql_query)
-            except Exception as e:
-                logger.debug(traceback.format_exc())
-                raise HTTPException(status_code=500, detail="Failed to execute database query")
+        if sql_query.lower() in SPECIAL_RESPONSES:
+            await sql_translation_cache.confirm(sql_query)
+            return {"message": SPECIAL_RESPONSES[sql_query.lower()]}
+
+        else:
+            # Validate, cost-check and execute; an overrunning query is killed on the server
+            guarded, query_results, truncated = await deadline.run(
+                "sql_execution", run_query(sql_query), config.SQL_EXECUTION_TIMEOUT
+            )
             # try:
             #     chart_type = get_chart_suggestion(query_results,request.user_input)
             #     chart_img = generate_plotly_chart(query_results,chart_type,request.user_input)
             # except Exception as e:
             #     logger.debug(traceback.format_exc())
             #     raise HTTPException(status_code=500, detail="Failed to generate chart")
-            # Format results
-            try:
-                formatted_response = format_results(query_results,request.user_input)
-                tables, cols = extract_tables_and_columns(sql_query)
-                logger.debug(f"Extracted tables: {tables}, columns: {cols}")
-            except Exception as e:
-                logger.debug(traceback.format_exc())
-                raise HTTPException(status_code=500, detail="Failed to format query results")
-
             conversation_id = generate_id()
             logger.debug(f"Generated conversation ID: {conversation_id}")
+            is_new_thread = not (hasattr(request, "thread_id") and request.thread_id)
+            thread_id = request.thread_id if not is_new_thread else generate_id()
+            timings = {}
 
-            # Create conversation record
-            conversation_record = {
+            # Stage 1: formatting overlaps with table extraction
+            formatted, extracted = await asyncio.gather(
+                pipeline_timer.run("format", deadline.run(
+                    "format", format_results_async(query_results, request.user_input, truncated), config.FORMAT_TIMEOUT
+                ), timings),
+                extract_stage(guarded, timings),
+                return_exceptions=True
+            )
+            if isinstance(formatted, StageTimeoutError):
+                raise formatted
+            if isinstance(formatted, Exception):
+                logger.error(f"Failed to format query results: {str(formatted)}")
+                raise HTTPException(status_code=500, detail="Failed to format query results")
+            formatted_response = formatted
+            tables, cols = check_extracted(extracted)
+
+            # Stage 2: the thread, conversation and export are only written once formatting succeeded
+            conversation_record = build_conversation_record(conversation_id, request.user_input, formatted_response,
+                                                            tables, cols, query_results, truncated)
+            conversation_count = await deadline.run("persist", persist_response(
+                conversation_id, thread_id, is_new_thread, admin_id, request.user_input, conversation_record,
+                guarded, query_results, truncated, timings
+            ))
+
+            response_data = {
+                # "sql_query": sql_query,
+                "results": formatted_response,
+                # "chart_type": chart_type,
+                # "chart_image_url": chart_img,
+                "message": "",
+                "thread_id": thread_id,
                 "conversation_id": conversation_id,
-                "query": request.user_input,
-                "response": formatted_response,
-                # "visualization": chart_img,
-                "timestamp": datetime.utcnow().isoformat(),
-                "data_type": tables,
-                "cols": cols,
-                "rows": len(query_results),
+                "truncated": truncated,
                 "excel_path": EXCEL_STORAGE_PATH+f"/{conversation_id}"
             }
+            if conversation_count is not None:
+                response_data["conversation_count"] = conversation_count
 
-            # If thread_id exists, insert only into conversations
-            if hasattr(request, "thread_id") and request.thread_id:
-                try:
-                    logger.info(f"Appending to existing thread {request.thread_id}")
-                    append_result = append_conversation(request.thread_id, conversation_record)
-                    insert_into_conversations(request.thread_id, admin_id, conversation_record)
-                except Exception as e:
-                    logger.error(f"Failed to update existing thread: {str(e)}")
-                    logger.debug(traceback.format_exc())
-                    raise HTTPException(status_code=500, detail="Failed to update conversation history")
-
-                response_data = {
-                    # "sql_query": sql_query,
-                    "results": formatted_response,
-                    # "chart_type": chart_type,
-                    # "chart_image_url": chart_img,
-                    "message": "",
-                    "thread_id": request.thread_id,
-                    "conversation_count": append_result["total_conversations"],
-                    "conversation_id": conversation_id,
-                    "excel_path": EXCEL_STORAGE_PATH+f"/{conversation_id}"
-                }
-
-            # If no thread_id, create a new thread & insert first conversation
-            else:
-                thread_id = generate_id()
-                logger.info(f"Creating new thread with ID: {thread_id}")
-                
-                try:
-                    insert_into_threads(thread_id, admin_id, request.user_input)
-                    insert_into_conversations(thread_id, admin_id, conversation_record)
-                except Exception as e:
-                    logger.error(f"Failed to create new thread: {str(e)}")
-                    logger.debug(traceback.format_exc())
-                    raise HTTPException(status_code=500, detail="Failed to create new conversation thread")
-
-                # Push to Redis
-                try:
-                    thread_data = {
-                        "thread_id": thread_id,
-                        "admin_id": admin_id,
-                        "chat_name": request.user_input,
-                        "conversations": [conversation_record]
-                    }
-                    insert_into_redis(thread_data)
-                    logger.debug("Successfully inserted thread data into Redis")
-                except Exception as e:
-                    logger.error(f"Redis insertion error: {str(e)}")
-                    logger.debug(traceback.format_exc())
-                    # Continue even if Redis fails, as it might be a caching layer
-
-                response_data = {
-                    # "sql_query": sql_query,
-                    "results": formatted_response,
-                    # "chart_type": chart_type,
-                    # "chart_image_url": chart_img,
-                    "message": "",
-                    "thread_id": thread_id,
-                    "conversation_id": conversation_id,
-                    "excel_path": EXCEL_STORAGE_PATH+f"/{conversation_id}"
-                }
-
-            # Generate Excel file
-            try:
-                await generate_excel(conversation_id, query_results)
-            except Exception as e:
-                logger.error(f"Excel generation error: {str(e)}")
-                logger.debug(traceback.format_exc())
-                # Continue even if Excel generation fails
-
+            logger.info(f"Post-query stage timings (ms) for conversation {conversation_id}: {timings}")
             return response_data
-        else:
-            logger.warning(f"Invalid SQL query generated: {sql_query}")
-            raise HTTPException(status_code=400, detail="Failed to generate a valid SQL query")
-            
+
+    except StageTimeoutError as e:
+        logger.warning(f"process_user_input timed out: {str(e)}")
+        return JSONResponse(status_code=504, content=e.to_dict())
     except HTTPException as he:
         # Re-raise HTTP exceptions as they're already handled
         raise he
@@ -181,12 +318,109 @@ async def process_user_input(request: UserInputRequest, admin: dict = Depends(ge
         logger.debug(traceback.format_exc())
         raise HTTPException(status_code=500, detail="An unexpected error occurred processing your request")
 
+def sse_event(event: str, data: dict) -> str:
+    """Encode one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def stream_pipeline(request: UserInputRequest, admin_id: str):
+    """
+    Run the /generate-response/ pipeline, emitting progress as Server-Sent Events:
+    status (SQL generated), rows (row count), token (insight chunks as Gemini streams them),
+    then done with the conversation/thread IDs once persistence completes, or error.
+    """
+    side_task = None
+    deadline = Deadline(config.REQUEST_TIMEOUT)
+    try:
+        yield sse_event("status", {"stage": "generating_sql"})
+        try:
+            sql_query = await deadline.run(
+                "sql_generation",
+                generate_sql_async(request.user_input, request.thread_id if hasattr(request, "thread_id") else None),
+                config.SQL_GENERATION_TIMEOUT
+            )
+        except StageTimeoutError:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail="Failed to generate SQL query")
+
+        if sql_query.lower() in SPECIAL_RESPONSES:
+            await sql_translation_cache.confirm(sql_query)
+            yield sse_event("message", {"message": SPECIAL_RESPONSES[sql_query.lower()]})
+            return
+        yield sse_event("status", {"stage": "sql_generated"})
+
+        guarded, query_results, truncated = await deadline.run(
+            "sql_execution", run_query(sql_query), config.SQL_EXECUTION_TIMEOUT
+        )
+        yield sse_event("rows", {"rows": len(query_results), "truncated": truncated})
+
+        conversation_id = generate_id()
+        is_new_thread = not (hasattr(request, "thread_id") and request.thread_id)
+        thread_id = request.thread_id if not is_new_thread else generate_id()
+        timings = {}
+
+        # Extraction runs while the insight streams; nothing is persisted until it has finished
+        side_task = asyncio.gather(extract_stage(guarded, timings), return_exceptions=True)
+        chunks = []
+        start = time.perf_counter()
+        async for chunk in deadline.iterate("format", stream_format_results(query_results, request.user_input, truncated),
+                                            config.FORMAT_TIMEOUT):
+            chunks.append(chunk)
+            yield sse_event("token", {"text": chunk})
+        pipeline_timer.record("format_stream", time.perf_counter() - start)
+        formatted_response = "".join(chunks).strip()
+
+        tables, cols = check_extracted(*(await side_task))
+        conversation_record = build_conversation_record(conversation_id, request.user_input, formatted_response,
+                                                        tables, cols, query_results, truncated)
+        conversation_count = await deadline.run("persist", persist_response(
+            conversation_id, thread_id, is_new_thread, admin_id, request.user_input, conversation_record,
+            guarded, query_results, truncated, timings
+        ))
+
+        done = {"thread_id": thread_id, "conversation_id": conversation_id, "truncated": truncated,
+                "excel_path": EXCEL_STORAGE_PATH+f"/{conversation_id}"}
+        if conversation_count is not None:
+            done["conversation_count"] = conversation_count
+        logger.info(f"Post-query stage timings (ms) for conversation {conversation_id}: {timings}")
+        yield sse_event("done", done)
+    except StageTimeoutError as e:
+        logger.warning(f"stream_pipeline timed out: {str(e)}")
+        yield sse_event("error", {"status_code": 504, **e.to_dict()})
+    except HTTPException as he:
+        yield sse_event("error", {"status_code": he.status_code, "detail": he.detail})
+    except Exception as e:
+        logger.error(f"Unhandled error in stream_pipeline: {str(e)}")
+        logger.debug(traceback.format_exc())
+        yield sse_event("error", {"status_code": 500, "detail": "An unexpected error occurred processing your request"})
+    finally:
+        if side_task is not None and not side_task.done():
+            side_task.cancel()  # Client went away before the stages finished
+
+@router.post("/generate-response/stream/")
+async def stream_user_input(request: UserInputRequest, admin: dict = Depends(get_current_admin)):
+    """Streaming variant of /generate-response/ using Server-Sent Events"""
+    return StreamingResponse(
+        stream_pipeline(request, admin["admin_id"]),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}  # Don't let proxies buffer the stream
+    )
+
 @router.get("/download-excel/{conversation_id}/")
 async def download_excel(conversation_id: str, admin: dict = Depends(get_current_admin)):
     """Endpoint to download an Excel file based on conversation ID with authorization check"""
     try:
         logger.info(f"Excel download requested for conversation {conversation_id} by admin {admin['email']}")
         
+        job = await get_export_status(conversation_id)
+        if job and job["state"] not in (DONE, FAILED):
+            # Export is still queued or running; tell the client to poll the status endpoint
+            return JSONResponse(
+                status_code=202,
+                content={"conversation_id": conversation_id, "state": job["state"],
+                         "status_url": f"/exports/{conversation_id}/status"}
+            )
+
         file_path = get_excel_path(conversation_id)
         logger.debug(f"Excel file path: {file_path}")
 
@@ -195,10 +429,11 @@ async def download_excel(conversation_id: str, admin: dict = Depends(get_current
             raise HTTPException(status_code=404, detail="File not found")
 
         logger.info(f"Serving Excel file for conversation {conversation_id}")
+        extension = os.path.basename(file_path).split(".", 1)[-1]  # xlsx, csv or csv.gz
         return FileResponse(
             file_path,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            filename=f"conversation_{conversation_id}.xlsx"
+            media_type=media_type_for(file_path),
+            filename=f"conversation_{conversation_id}.{extension}"
         )
     except HTTPException as he:
         # Re-raise HTTP exceptions as they're already handled
@@ -208,15 +443,32 @@ async def download_excel(conversation_id: str, admin: dict = Depends(get_current
         logger.debug(traceback.format_exc())
         raise HTTPException(status_code=500, detail="Failed to download Excel file")
 
+@router.get("/exports/{conversation_id}/status")
+async def export_status(conversation_id: str, admin: dict = Depends(get_current_admin)):
+    """Report the state of a conversation's background export job"""
+    try:
+        job = await get_export_status(conversation_id)
+    except Exception as e:
+        logger.error(f"Export status error: {str(e)}")
+        logger.debug(traceback.format_exc())
+        raise HTTPException(status_code=500, detail="Failed to fetch export status")
+
+    if not job:
+        raise HTTPException(status_code=404, detail="No export found for this conversation")
+    job.pop("path", None)  # Served through /download-excel/ only
+    return job
+
 @router.get("/threads")
 async def fetch_threads_and_conversations(
     admin: dict = Depends(get_current_admin), 
     thread_id: str = None, 
     page: int = 1, 
-    limit: int = 10
+    limit: int = 10,
+    cursor: str = None
 ):
     """
-    Fetch all threads for an admin or fetch paginated conversations for a specific thread
+    Fetch all threads for an admin or fetch paginated conversations for a specific thread.
+    Pass the `next_cursor` of a page as `cursor` to fetch the page after it.
     """
     try:
         admin_id = admin["admin_id"]
@@ -224,7 +476,7 @@ async def fetch_threads_and_conversations(
 
         if thread_id:  # Fetch paginated conversations if thread_id exists
             try:
-                conversation_data = get_conversations_by_thread(admin_id, thread_id, page, limit)
+                conversation_data = await get_conversations_by_thread(admin_id, thread_id, page, limit, cursor)
                 if not conversation_data["conversations"]:
                     logger.warning(f"No conversations found for thread {thread_id}")
                     raise HTTPException(status_code=404, detail="No conversation found for this thread.")
@@ -233,6 +485,8 @@ async def fetch_threads_and_conversations(
                 return conversation_data
             except HTTPException as he:
                 raise he
+            except ValueError as ve:
+                raise HTTPException(status_code=400, detail=str(ve))
             except Exception as e:
                 logger.error(f"Error retrieving conversations: {str(e)}")
                 logger.debug(traceback.format_exc())
@@ -240,13 +494,15 @@ async def fetch_threads_and_conversations(
 
         else:  # Fetch all threads if thread_id is NOT provided
             try:
-                threads = get_threads_by_admin(admin_id, page, limit)
+                threads = await get_threads_by_admin(admin_id, page, limit, cursor)
                 logger.info(f"Retrieved {len(threads) if threads else 0} threads for admin {admin_id}")
                 
                 if not threads:
                     return {"message": "No chat history found.", "threads": []}
 
                 return {"threads": threads}
+            except ValueError as ve:
+                raise HTTPException(status_code=400, detail=str(ve))
             except Exception as e:
                 logger.error(f"Error retrieving threads: {str(e)}")
                 logger.debug(traceback.format_exc())
@@ -260,6 +516,54 @@ async def fetch_threads_and_conversations(
         logger.debug(traceback.format_exc())
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
+@router.get("/metrics")
+async def get_metrics(admin: dict = Depends(get_current_admin)):
+    """Expose internal runtime statistics (connection pools, caches) for monitoring"""
+    try:
+        return {
+            "mysql_pool": get_pool_stats(),
+            "sql_translation_cache": sql_translation_cache.stats(),
+            "query_result_cache": query_result_cache.stats(),
+            "export_workers": export_worker_pool.stats(),
+            "mongo_write_buffer": mongo_write_buffer.stats(),
+            "auth_token_cache": token_verifier.stats(),
+            "login_rate_limiter": login_rate_limiter.stats(),
+            "mail_sender": mail_sender.stats(),
+            "id_generator": id_generator.stats(),
+            "gemini_prompt_cache": sql_prompt_model.stats(),
+            "prompt_tokens": prompt_metrics.stats(),
+            "pipeline_stages": pipeline_timer.stats(),
+            "sql_guard": sql_guard.stats()
+        }
+    except Exception as e:
+        logger.error(f"Error collecting metrics: {str(e)}")
+        logger.debug(traceback.format_exc())
+        raise HTTPException(status_code=500, detail="Failed to collect metrics")
+
+@router.get("/metrics/redis-memory")
+async def get_redis_memory(admin: dict = Depends(get_current_admin)):
+    """Redis memory per key prefix (threads, export paths, OTPs); scans the keyspace, so use sparingly"""
+    try:
+        return {"redis_memory": await memory_report()}
+    except Exception as e:
+        logger.error(f"Error collecting Redis memory report: {str(e)}")
+        logger.debug(traceback.format_exc())
+        raise HTTPException(status_code=500, detail="Failed to collect Redis memory report")
+
+@router.post("/cache/invalidate/{table}")
+async def invalidate_result_cache(table: str, admin: dict = Depends(get_current_admin)):
+    """Drop cached query results that depend on the given table"""
+    if table.lower() not in CACHEABLE_TABLES:
+        raise HTTPException(status_code=404, detail=f"Unknown table: {table}")
+    try:
+        removed = await query_result_cache.invalidate_table(table)
+        logger.info(f"Admin {admin['admin_id']} invalidated {removed} cached results for {table}")
+        return {"table": table.lower(), "invalidated": removed}
+    except Exception as e:
+        logger.error(f"Error invalidating result cache for {table}: {str(e)}")
+        logger.debug(traceback.format_exc())
+        raise HTTPException(status_code=500, detail="Failed to invalidate result cache")
+
 @router.post("/admin/request-otp/")
 async def request_otp(background_tasks: BackgroundTasks):
     """Generate and send OTP to the configured admin email for registration verification"""
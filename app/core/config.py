@@ -27,13 +27,104 @@ class Config:
     DB_PORT = int(os.getenv("DB_PORT"))
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
+    # MySQL connection pool
+    DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", 1))
+    DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", 10))
+    DB_POOL_IDLE_TIMEOUT = float(os.getenv("DB_POOL_IDLE_TIMEOUT", 300))  # seconds an idle connection is kept
+    DB_POOL_MAX_LIFETIME = float(os.getenv("DB_POOL_MAX_LIFETIME", 3600))  # seconds before a connection is recycled
+    DB_POOL_ACQUIRE_TIMEOUT = float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT", 10))  # seconds to wait for a free connection
+    DB_POOL_HEALTH_CHECK = os.getenv("DB_POOL_HEALTH_CHECK", "true").lower() == "true"
+
+    # Deadlines (seconds)
+    REQUEST_TIMEOUT = float(os.getenv("REQUEST_TIMEOUT", 90))  # overall /generate-response/ deadline
+    SQL_GENERATION_TIMEOUT = float(os.getenv("SQL_GENERATION_TIMEOUT", 30))  # Gemini NL -> SQL
+    SQL_EXECUTION_TIMEOUT = float(os.getenv("SQL_EXECUTION_TIMEOUT", 30))  # EXPLAIN + query; overruns are KILLed
+    FORMAT_TIMEOUT = float(os.getenv("FORMAT_TIMEOUT", 30))  # Gemini insight formatting
+    EXPORT_TIMEOUT = float(os.getenv("EXPORT_TIMEOUT", 900))  # one background export job
+
+    # Result streaming
+    SQL_MAX_ROWS = int(os.getenv("SQL_MAX_ROWS", 10000))  # hard cap on rows kept per query
+    SQL_STREAM_BATCH_SIZE = int(os.getenv("SQL_STREAM_BATCH_SIZE", 1000))  # rows per server-side fetch
+
+    # Pre-execution SQL guard
+    SQL_GUARD_EXPLAIN = os.getenv("SQL_GUARD_EXPLAIN", "true").lower() == "true"  # estimate cost with EXPLAIN
+    SQL_GUARD_MAX_ROWS_EXAMINED = int(os.getenv("SQL_GUARD_MAX_ROWS_EXAMINED", 5000000))  # EXPLAIN row estimate budget
+    SQL_GUARD_MODE = os.getenv("SQL_GUARD_MODE", "reject")  # reject or downgrade queries over budget
+    SQL_GUARD_DOWNGRADE_ROWS = int(os.getenv("SQL_GUARD_DOWNGRADE_ROWS", 1000))  # injected LIMIT for downgraded queries
+    SQL_GUARD_DOWNGRADE_EXECUTION_MS = int(os.getenv("SQL_GUARD_DOWNGRADE_EXECUTION_MS", 5000))
+    SQL_MAX_EXECUTION_MS = int(os.getenv("SQL_MAX_EXECUTION_MS", 30000))  # MAX_EXECUTION_TIME hint per query
+    EXPORT_MAX_EXECUTION_MS = int(os.getenv("EXPORT_MAX_EXECUTION_MS", 600000))  # hint for background exports
+
+    # Exports
+    EXPORT_MAX_ROWS = int(os.getenv("EXPORT_MAX_ROWS", 1000000))  # cap for exports streamed from MySQL
+    EXPORT_LARGE_FORMAT = os.getenv("EXPORT_LARGE_FORMAT", "csv.gz")  # xlsx, csv or csv.gz for results over SQL_MAX_ROWS
+    EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", 2))  # concurrent background export jobs
+    EXPORT_MAX_ATTEMPTS = int(os.getenv("EXPORT_MAX_ATTEMPTS", 3))  # tries before a job is marked failed
+    EXPORT_RETRY_BACKOFF = float(os.getenv("EXPORT_RETRY_BACKOFF", 5))  # seconds before the first retry, doubled each time
+    EXPORT_INLINE_MAX_BYTES = int(os.getenv("EXPORT_INLINE_MAX_BYTES", 256 * 1024))  # larger results are re-read by the job
+
+    # Result formatting prompt
+    FORMAT_SUMMARY_THRESHOLD = int(os.getenv("FORMAT_SUMMARY_THRESHOLD", 50))  # larger results are summarized
+    FORMAT_SAMPLE_ROWS = int(os.getenv("FORMAT_SAMPLE_ROWS", 20))  # representative rows kept in a summary
+    FORMAT_TOP_K = int(os.getenv("FORMAT_TOP_K", 5))  # most frequent values listed per text column
+
+    # Gemini prompt caching
+    GEMINI_CONTEXT_CACHE = os.getenv("GEMINI_CONTEXT_CACHE", "false").lower() == "true"  # cache the schema prompt server-side once it outgrows the minimum
+    GEMINI_CONTEXT_CACHE_TTL = int(os.getenv("GEMINI_CONTEXT_CACHE_TTL", 3600))  # seconds; recreated before expiry
+    GEMINI_CACHE_MODEL = os.getenv("GEMINI_CACHE_MODEL", "gemini-2.0-flash-001")  # context caching needs a pinned version
+    GEMINI_CACHE_MIN_TOKENS = int(os.getenv("GEMINI_CACHE_MIN_TOKENS", 4096))  # smallest prefix GEMINI_CACHE_MODEL will cache
+    GEMINI_CONTEXT_CACHE_RETRY = float(os.getenv("GEMINI_CONTEXT_CACHE_RETRY", 60))  # seconds before retrying a failed cache, doubled each time
+
+    # SQL parsing
+    SQL_PARSE_CACHE_SIZE = int(os.getenv("SQL_PARSE_CACHE_SIZE", 1024))  # memoized parses keyed on query text
+
     # Redis Config
     REDIS_HOST = os.getenv("REDIS_HOST")
     REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
     REDIS_DB = int(os.getenv("REDIS_DB", 0))
+    THREAD_CONTEXT_SIZE = int(os.getenv("THREAD_CONTEXT_SIZE", 10))  # recent queries kept per thread for SQL generation
+    THREAD_CACHE_MAX_CONVERSATIONS = int(os.getenv("THREAD_CACHE_MAX_CONVERSATIONS", 50))  # full records cached per thread; MongoDB keeps the rest
+
+    # Natural-language -> SQL translation cache
+    SQL_CACHE_ENABLED = os.getenv("SQL_CACHE_ENABLED", "true").lower() == "true"
+    SQL_CACHE_TTL = int(os.getenv("SQL_CACHE_TTL", 3600))  # seconds
+    SQL_CACHE_LRU_SIZE = int(os.getenv("SQL_CACHE_LRU_SIZE", 512))  # in-process entries
+    SQL_CACHE_FUZZY = os.getenv("SQL_CACHE_FUZZY", "false").lower() == "true"  # token-normalized matching
+
+    # Query result cache
+    RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+    RESULT_CACHE_DEFAULT_TTL = int(os.getenv("RESULT_CACHE_DEFAULT_TTL", 300))  # seconds
+    RESULT_CACHE_TABLE_TTLS = os.getenv("RESULT_CACHE_TABLE_TTLS", "loan=300,emi=120,users=900,user_information=900")
+    RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", 1024 * 1024))  # larger results are not cached
 
     MONGO_URI = os.getenv("MONGO_URI")
     MONGO_DB_NAME = os.getenv("MONGO_DB_NAME")
+    MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 50))  # connections in the shared Motor pool
+    MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 0))  # connections kept open while idle
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000))
+    MONGO_ENSURE_INDEXES = os.getenv("MONGO_ENSURE_INDEXES", "true").lower() == "true"  # create indexes at startup
+    MONGO_COUNT_CACHE_TTL = float(os.getenv("MONGO_COUNT_CACHE_TTL", 30))  # seconds a pagination total is reused
+    MONGO_COUNT_CACHE_SIZE = int(os.getenv("MONGO_COUNT_CACHE_SIZE", 10000))  # pagination totals kept per process
+    MONGO_WRITE_BUFFER_ENABLED = os.getenv("MONGO_WRITE_BUFFER_ENABLED", "true").lower() == "true"  # batch thread/conversation writes
+    MONGO_WRITE_FLUSH_INTERVAL = float(os.getenv("MONGO_WRITE_FLUSH_INTERVAL", 0.05))  # seconds between buffer flushes
+    MONGO_WRITE_MAX_BATCH = int(os.getenv("MONGO_WRITE_MAX_BATCH", 500))  # buffered writes that trigger an early flush
+    MONGO_WRITE_WAIT_FOR_FLUSH = os.getenv("MONGO_WRITE_WAIT_FOR_FLUSH", "true").lower() == "true"  # requests await the flush; off drops failed writes
+
+    # Thread/conversation IDs
+    ID_NODE = int(os.environ["ID_NODE"]) if os.getenv("ID_NODE") else None  # 0-1023 per worker; leased from Redis if unset
+    ID_NODE_LEASE_TTL = int(os.getenv("ID_NODE_LEASE_TTL", 60))  # seconds a leased node outlives a dead worker
+
+    # Auth token verification
+    JWT_VERIFY_BACKEND = os.getenv("JWT_VERIFY_BACKEND", "jose")  # jose, or native (stdlib HMAC, HS* only)
+    JWT_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", 4096))  # verified tokens kept until their exp; 0 disables
+    JWT_REVOCATION_ENABLED = os.getenv("JWT_REVOCATION_ENABLED", "true").lower() == "true"  # check revoked_token:* in Redis
+
+    # Password hashing and login throttling
+    BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))  # cost of new hashes; existing hashes keep their own
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))  # threads running bcrypt off the event loop
+    LOGIN_RATE_WINDOW = int(os.getenv("LOGIN_RATE_WINDOW", 300))  # seconds per login attempt window
+    LOGIN_MAX_ATTEMPTS_PER_EMAIL = int(os.getenv("LOGIN_MAX_ATTEMPTS_PER_EMAIL", 5))
+    LOGIN_MAX_ATTEMPTS_PER_IP = int(os.getenv("LOGIN_MAX_ATTEMPTS_PER_IP", 20))
 
     # Email configuration
     ADMIN_EMAIL = os.getenv("ADMIN_EMAIL")  # Hardcoded admin email
@@ -41,5 +132,11 @@ class Config:
     EMAIL_PORT = os.getenv("EMAIL_PORT")
     EMAIL_USER = os.getenv("EMAIL_USER") # Your Gmail address
     EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD") # Your Gmail app password
+    MAIL_TRANSPORT = os.getenv("MAIL_TRANSPORT", "smtp")  # smtp, or file to write .eml files to MAIL_FILE_DIR
+    MAIL_FILE_DIR = os.getenv("MAIL_FILE_DIR", "mail_outbox")
+    MAIL_MAX_ATTEMPTS = int(os.getenv("MAIL_MAX_ATTEMPTS", 3))  # sends before an email is given up on
+    MAIL_RETRY_BACKOFF = float(os.getenv("MAIL_RETRY_BACKOFF", 2))  # seconds before the first retry, doubled each time
+    MAIL_QUEUE_SIZE = int(os.getenv("MAIL_QUEUE_SIZE", 1000))  # queued emails before new ones are dropped
+    SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", 10))  # seconds per SMTP connect/command
 
 config = Config()
\ No newline at end of file
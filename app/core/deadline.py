@@ -0,0 +1,78 @@
+import time
+import asyncio
+
+
+class StageTimeoutError(TimeoutError):
+    """Raised when a pipeline stage or the overall request runs past its deadline"""
+
+    def __init__(self, stage: str, timeout: float, request_deadline: bool = False):
+        reason = "request deadline" if request_deadline else "stage deadline"
+        super().__init__(f"{stage} exceeded the {reason} of {timeout:.1f}s")
+        self.stage = stage
+        self.timeout = timeout
+        self.request_deadline = request_deadline
+
+    def to_dict(self):
+        """Structured body for timeout responses"""
+        return {
+            "error": "timeout",
+            "stage": self.stage,
+            "timeout_seconds": round(self.timeout, 3),
+            "deadline": "request" if self.request_deadline else "stage",
+            "detail": "The request took too long and was cancelled. Please try again or narrow down your question.",
+        }
+
+
+class Deadline:
+    """
+    Overall request deadline with per-stage budgets.
+
+    Each stage gets min(stage timeout, time left on the request). When the budget runs
+    out the stage is cancelled and StageTimeoutError names the stage that overran.
+    """
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    def _budget(self, stage: str, timeout: float = None):
+        remaining = self.remaining()
+        if timeout is not None and timeout < remaining:
+            return timeout, False
+        if remaining <= 0:
+            raise StageTimeoutError(stage, self.seconds, request_deadline=True)
+        return remaining, True
+
+    async def run(self, stage: str, awaitable, timeout: float = None):
+        """Await a stage within its budget"""
+        try:
+            budget, request_bound = self._budget(stage, timeout)
+        except StageTimeoutError:
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()  # never started; avoid the "never awaited" warning
+            raise
+        try:
+            return await asyncio.wait_for(awaitable, budget)
+        except asyncio.TimeoutError:
+            raise StageTimeoutError(stage, self.seconds if request_bound else budget, request_bound) from None
+
+    async def iterate(self, stage: str, iterator, timeout: float = None):
+        """Yield from an async iterator until it ends or the stage budget is spent"""
+        budget, request_bound = self._budget(stage, timeout)
+        stage_expires_at = time.monotonic() + budget
+        iterator = iterator.__aiter__()
+        try:
+            while True:
+                try:
+                    item = await asyncio.wait_for(iterator.__anext__(), max(stage_expires_at - time.monotonic(), 0))
+                except StopAsyncIteration:
+                    return
+                except asyncio.TimeoutError:
+                    raise StageTimeoutError(stage, self.seconds if request_bound else budget, request_bound) from None
+                yield item
+        finally:
+            if hasattr(iterator, "aclose"):
+                await iterator.aclose()
@@ -1,11 +1,10 @@
-import time
 import random
 import string
 from app.core.config import config
-import smtplib
+from app.core.id_generator import id_generator
+from app.services.mail_service import mail_sender
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from app.services.database import client, db
 import logging
 import traceback
 
@@ -13,19 +12,16 @@ import traceback
 logger = logging.getLogger(__name__)
 
 def generate_id():
-    """Generate a unique string ID based on timestamp and random number"""
-    timestamp = int(time.time() * 1000)  # Milliseconds since epoch
-    random_part = random.randint(1000, 9999)
-    return f"{timestamp}_{random_part}"
+    """Generate a unique, time-ordered string ID (`<ms>_<node><sequence>`); see app/core/id_generator.py"""
+    return id_generator.next_id()
 
 def generate_otp(length=6):
     """Generate a random numeric OTP of specified length for verification purposes"""
     digits = string.digits
     return ''.join(random.choice(digits) for _ in range(length))
 
-otp_collection = db["otp"]
 async def send_email(email, otp):
-    """Send OTP verification email using configured SMTP settings"""
+    """Queue the OTP verification email on the mail sender; returns False if it could not be queued"""
     try:
         logger.info(f"Preparing to send OTP email to {email}")
         message = MIMEMultipart()
@@ -44,19 +40,8 @@ async def send_email(email, otp):
         """
         
         message.attach(MIMEText(body, "html"))
-        
-        server = smtplib.SMTP(config.EMAIL_HOST, config.EMAIL_PORT)
-        server.starttls()
-        server.login(config.EMAIL_USER, config.EMAIL_PASSWORD)
-        server.sendmail(config.EMAIL_USER, email, message.as_string())
-        server.quit()
-        logger.info(f"OTP email sent successfully to {email}")
-        return True
-    except smtplib.SMTPException as e:
-        logger.error(f"SMTP error sending email to {email}: {str(e)}")
-        logger.debug(traceback.format_exc())
-        return False
+        return await mail_sender.send(message)
     except Exception as e:
         logger.error(f"Failed to send email to {email}: {str(e)}")
         logger.debug(traceback.format_exc())
-        return False
\ No newline at end of file
+        return False
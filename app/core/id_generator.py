@@ -0,0 +1,142 @@
+"""
+Snowflake-style IDs for threads and conversations.
+
+An ID is `<unix ms>_<node:4><sequence:4>`, e.g. `1792265930914_00070012`: the same
+`<timestamp>_<digits>` shape as the IDs generate_id produced before, but unique and
+ordered. Within one process the sequence makes every ID unique (4096 per millisecond,
+after which generation waits for the next millisecond) and strictly increasing, even if
+the wall clock steps back. Across processes the node ID keeps them apart: set ID_NODE
+per worker, or let the lifespan lease one from Redis so uvicorn workers never share a
+node. A lease is a key with a TTL that the worker keeps renewing, so a dead worker's
+node is freed for the next one.
+"""
+import os
+import time
+import uuid
+import asyncio
+import logging
+import threading
+from app.core.config import config
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+NODE_BITS = 10
+SEQUENCE_BITS = 12
+MAX_NODE = (1 << NODE_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+NODE_COUNTER_KEY = "id_generator:node"
+NODE_LEASE_KEY = "id_generator:node:{}"
+
+
+class IdGenerator:
+    def __init__(self, node_id: int = None):
+        self._configured_node = node_id
+        self._reset()
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        # Until a node is configured or leased, fall back to the pid (distinct among one host's workers)
+        self.node_id = self._configured_node if self._configured_node is not None else os.getpid() & MAX_NODE
+        self._last_ms = -1
+        self._sequence = 0
+        self.generated = 0
+        self.sequence_waits = 0
+        self._owner = uuid.uuid4().hex  # Identifies this process's lease
+        self._redis = None
+        self._lease_ttl = None
+        self._renew_task = None
+
+    def set_node(self, node_id: int):
+        if not 0 <= node_id <= MAX_NODE:
+            raise ValueError(f"Node ID must be between 0 and {MAX_NODE}")
+        with self._lock:
+            self.node_id = node_id
+
+    async def lease_node(self, redis_client, ttl: int = 60):
+        """
+        Claim a free node ID (SET NX EX on its lease key) unless one was configured, and
+        renew the lease every ttl/3 seconds until release_node()
+        """
+        if self._configured_node is not None:
+            return self.node_id
+        self._redis = redis_client
+        self._lease_ttl = ttl
+        node_id = await self._claim_node()
+        self.set_node(node_id)
+        self._renew_task = asyncio.create_task(self._renew_loop())
+        return node_id
+
+    async def _claim_node(self):
+        # The counter only picks where to start probing, so workers rarely race for one slot
+        start = await self._redis.incr(NODE_COUNTER_KEY)
+        for offset in range(MAX_NODE + 1):
+            node_id = (start + offset) & MAX_NODE
+            if await self._redis.set(NODE_LEASE_KEY.format(node_id), self._owner, nx=True, ex=self._lease_ttl):
+                logger.info(f"Leased ID generator node {node_id}")
+                return node_id
+        raise RuntimeError("Every ID generator node is leased")
+
+    async def renew_lease(self):
+        """Extend this worker's lease, claiming another node if it expired and was taken"""
+        key = NODE_LEASE_KEY.format(self.node_id)
+        owner = await self._redis.get(key)
+        if owner == self._owner:
+            await self._redis.expire(key, self._lease_ttl)
+            return
+        if owner is None and await self._redis.set(key, self._owner, nx=True, ex=self._lease_ttl):
+            return
+        logger.warning(f"Lost the lease on ID generator node {self.node_id}; leasing another")
+        self.set_node(await self._claim_node())
+
+    async def _renew_loop(self):
+        while True:
+            await asyncio.sleep(self._lease_ttl / 3)
+            try:
+                await self.renew_lease()
+            except Exception as e:
+                logger.warning(f"Failed to renew ID generator node lease: {str(e)}")
+
+    async def release_node(self):
+        """Stop renewing and free the leased node for other workers"""
+        if self._renew_task is None:
+            return
+        self._renew_task.cancel()
+        await asyncio.gather(self._renew_task, return_exceptions=True)
+        self._renew_task = None
+        key = NODE_LEASE_KEY.format(self.node_id)
+        try:
+            if await self._redis.get(key) == self._owner:
+                await self._redis.delete(key)
+        except Exception as e:
+            # The lease expires on its own after the TTL
+            logger.warning(f"Failed to release ID generator node {self.node_id}: {str(e)}")
+
+    def next_id(self) -> str:
+        with self._lock:
+            now = int(time.time() * 1000)
+            if now > self._last_ms:
+                self._last_ms = now
+                self._sequence = 0
+            else:
+                # Same millisecond, or the clock stepped back: keep counting on the last one
+                self._sequence += 1
+                if self._sequence > MAX_SEQUENCE:
+                    self.sequence_waits += 1
+                    while now == self._last_ms:  # Sequence spent: wait out the millisecond
+                        now = int(time.time() * 1000)
+                    self._last_ms = max(now, self._last_ms + 1)  # A clock behind borrows the next one
+                    self._sequence = 0
+            self.generated += 1
+            return f"{self._last_ms}_{self.node_id:04d}{self._sequence:04d}"
+
+    def stats(self):
+        return {"node_id": self.node_id, "leased": self._renew_task is not None, "generated": self.generated,
+                "sequence_waits": self.sequence_waits}
+
+
+id_generator = IdGenerator(node_id=config.ID_NODE)
+
+# A forked worker must not continue the parent's sequence under the same node
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=id_generator._reset)
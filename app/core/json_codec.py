@@ -0,0 +1,26 @@
+"""
+JSON codec for Redis payloads: orjson when it is installed, the standard library otherwise.
+
+Both paths produce compact JSON text that the other can read, so records written
+before or after installing orjson stay interchangeable.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:  # Optional speedup
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+
+def dumps(value) -> str:
+    if orjson is not None:
+        return orjson.dumps(value).decode()
+    return json.dumps(value, separators=(",", ":"))
+
+
+def loads(payload):
+    if orjson is not None:
+        return orjson.loads(payload)
+    return json.loads(payload)
@@ -0,0 +1,64 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from fastapi import FastAPI
+from app.core.config import config
+from app.services.export_jobs import export_worker_pool
+from app.services.database import connect_mongo, close_mongo, mysql_pool, mysql_executor
+from app.services.mongo_service import ensure_indexes, mongo_write_buffer
+from app.services.mail_service import mail_sender
+from app.services.auth_services import password_executor
+from app.services.redis_service import async_redis_client
+from app.core.id_generator import id_generator
+from app.services.query_generator import sql_prompt_model
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Lease this worker's ID generator node, open the shared MongoDB client and provision its
+    indexes, open the MySQL pool's minimum connections, start background workers, the
+    MongoDB write buffer and the mail sender, and cache the SQL schema prompt with Gemini;
+    then undo all of it on shutdown, also closing the MySQL pool and the MySQL and bcrypt
+    thread pools.
+    """
+    try:
+        await id_generator.lease_node(async_redis_client, ttl=config.ID_NODE_LEASE_TTL)
+    except Exception as e:
+        # IDs stay unique per process; only workers whose pids collide in the low 10 bits could clash
+        logger.warning(f"Failed to lease an ID generator node, using {id_generator.node_id}: {str(e)}")
+    await connect_mongo()
+    if config.MONGO_ENSURE_INDEXES:
+        try:
+            await ensure_indexes()
+        except Exception as e:
+            # Queries still work without the indexes, only slower; don't block startup on it
+            logger.error(f"Failed to ensure MongoDB indexes: {str(e)}")
+    try:
+        # Open DB_POOL_MIN_SIZE connections now so the first requests don't pay for the handshakes
+        await asyncio.to_thread(mysql_pool.warm_up)
+    except Exception as e:
+        # The pool opens connections on demand, so a MySQL outage only fails the queries that need it
+        logger.error(f"Failed to warm up the MySQL connection pool: {str(e)}")
+    await export_worker_pool.start()
+    if config.MONGO_WRITE_BUFFER_ENABLED:
+        await mongo_write_buffer.start()
+    await mail_sender.start()
+    sql_prompt_model.refresh_in_background()  # Requests use the plain system instruction until the cache exists
+    try:
+        yield
+    finally:
+        await export_worker_pool.stop()
+        await mail_sender.stop()
+        await mongo_write_buffer.stop()  # Flushes buffered writes before the client goes away
+        await sql_prompt_model.close()
+        await id_generator.release_node()
+        close_mongo()
+        # Let in-flight queries and hashes finish before their connections and threads go away
+        mysql_executor.shutdown(wait=True)
+        password_executor.shutdown(wait=True)
+        mysql_pool.close_all()
+        logger.info("Closed MySQL connection pool")
@@ -1,21 +1,9 @@
-from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from jose import jwt
 from app.core.config import JWT_SECRET_KEY, JWT_ALGORITHM
 from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
-from jose import jwt, JWTError
-from app.core.config import JWT_SECRET_KEY, JWT_ALGORITHM
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-# Hash Password
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
-
-# Verify Password
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+from app.core.token_verifier import token_verifier, InvalidTokenError
 
 # Create JWT Token
 def create_access_token(data: dict, expires_delta: timedelta = None):
@@ -28,15 +16,12 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/admin/login/")
 
 async def get_current_admin(token: str = Depends(oauth2_scheme)):
-    print("Token received:", token)  # Debugging
     try:
-        payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
-        email: str = payload.get("sub")
-        admin_id: str = payload.get("admin_id")
-        if not email:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        return {"email": email, "admin_id": admin_id}
-    except JWTError:
+        payload = await token_verifier.verify(token)
+    except InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
-
-
+    email: str = payload.get("sub")
+    admin_id: str = payload.get("admin_id")
+    if not email:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    return {"email": email, "admin_id": admin_id}
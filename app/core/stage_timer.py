@@ -0,0 +1,48 @@
+import time
+import threading
+
+
+class StageTimer:
+    """
+    Records wall time per named pipeline stage.
+
+    `run` awaits a stage and records how long it took, both in the process-wide
+    aggregates returned by `stats` and, when given, in a per-request dict so the
+    caller can log where a single request spent its time.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def record(self, name: str, seconds: float):
+        with self._lock:
+            stage = self._stages.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0})
+            stage["count"] += 1
+            stage["total"] += seconds
+            stage["max"] = max(stage["max"], seconds)
+
+    async def run(self, name: str, awaitable, timings: dict = None):
+        start = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            elapsed = time.perf_counter() - start
+            self.record(name, elapsed)
+            if timings is not None:
+                timings[name] = round(elapsed * 1000, 1)
+
+    def stats(self):
+        """Per-stage call count, mean and max latency in milliseconds"""
+        with self._lock:
+            return {
+                name: {
+                    "count": stage["count"],
+                    "avg_ms": round(stage["total"] / stage["count"] * 1000, 1),
+                    "max_ms": round(stage["max"] * 1000, 1),
+                }
+                for name, stage in self._stages.items()
+            }
+
+
+pipeline_timer = StageTimer()
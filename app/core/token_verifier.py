@@ -0,0 +1,164 @@
+import hmac
+import time
+import base64
+import hashlib
+import logging
+import binascii
+from collections import OrderedDict
+from jose import jwt, JWTError
+from app.core import json_codec
+from app.core.config import config, JWT_SECRET_KEY, JWT_ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
+from app.services.redis_service import async_redis_client
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+REVOKED_PREFIX = "revoked_token:"
+
+_HMAC_DIGESTS = {"HS256": hashlib.sha256, "HS384": hashlib.sha384, "HS512": hashlib.sha512}
+
+
+class InvalidTokenError(ValueError):
+    """The token is malformed, badly signed, expired or revoked"""
+
+
+def token_hash(token: str) -> str:
+    """Stable identifier for a token, used as the cache and revocation key instead of the token itself"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _b64decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+def decode_jose(token: str, secret: str, algorithm: str) -> dict:
+    try:
+        return jwt.decode(token, secret, algorithms=[algorithm])
+    except JWTError as e:
+        raise InvalidTokenError(str(e)) from e
+
+
+def decode_native(token: str, secret: str, algorithm: str) -> dict:
+    """
+    Verify an HMAC-signed (HS256/384/512) token with the standard library: signature,
+    `alg` header, `exp` and `nbf`. Skips python-jose's generic claim machinery.
+    """
+    digest = _HMAC_DIGESTS.get(algorithm)
+    if digest is None:
+        raise InvalidTokenError(f"Native verification does not support {algorithm}")
+    try:
+        signing_input, _, signature_segment = token.rpartition(".")
+        header_segment, _, payload_segment = signing_input.partition(".")
+        header = json_codec.loads(_b64decode(header_segment))
+        payload = json_codec.loads(_b64decode(payload_segment))
+        signature = _b64decode(signature_segment)
+    except (ValueError, TypeError, binascii.Error) as e:
+        raise InvalidTokenError("Malformed token") from e
+    if not isinstance(header, dict) or not isinstance(payload, dict) or header.get("alg") != algorithm:
+        raise InvalidTokenError("Unexpected token header")
+    expected = hmac.new(secret.encode(), signing_input.encode(), digest).digest()
+    if not hmac.compare_digest(expected, signature):
+        raise InvalidTokenError("Signature verification failed")
+    now = time.time()
+    for claim in ("exp", "nbf"):
+        if claim in payload and not isinstance(payload[claim], (int, float)):
+            raise InvalidTokenError(f"Invalid {claim} claim")
+    if "exp" in payload and now >= payload["exp"]:
+        raise InvalidTokenError("Signature has expired")
+    if "nbf" in payload and now < payload["nbf"]:
+        raise InvalidTokenError("The token is not yet valid")
+    return payload
+
+
+BACKENDS = {"jose": decode_jose, "native": decode_native}
+
+
+class TokenVerifier:
+    """
+    Verifies bearer tokens for the auth dependency.
+
+    Verified claims are kept in a bounded LRU keyed by the token's SHA-256, each entry
+    expiring at the token's own `exp`, so repeat requests skip signature verification.
+    Revocation is an O(1) EXISTS on `revoked_token:<hash>`, a key that expires with the
+    token; it is checked on every request, cached or not. If Redis is unreachable the
+    check is skipped with a warning rather than locking every admin out.
+    """
+
+    def __init__(self, secret: str, algorithm: str, backend: str = "jose", cache_size: int = 4096,
+                 check_revocation: bool = True, redis_client=None):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown token verification backend: {backend}")
+        self.secret = secret
+        self.algorithm = algorithm
+        self.backend = backend
+        self.cache_size = cache_size
+        self.check_revocation = check_revocation
+        self.redis_client = redis_client or async_redis_client
+        self._decode = BACKENDS[backend]
+        self._cache = OrderedDict()  # token hash -> (exp, claims)
+        self._counters = {"hits": 0, "misses": 0, "rejected": 0, "revoked": 0, "revocation_check_errors": 0}
+
+    def _claims(self, token: str, key: str) -> dict:
+        now = time.time()
+        cached = self._cache.get(key)
+        if cached and cached[0] > now:
+            self._cache.move_to_end(key)
+            self._counters["hits"] += 1
+            return cached[1]
+        self._counters["misses"] += 1
+        try:
+            claims = self._decode(token, self.secret, self.algorithm)
+        except InvalidTokenError:
+            self._cache.pop(key, None)
+            self._counters["rejected"] += 1
+            raise
+        exp = claims.get("exp")
+        if isinstance(exp, (int, float)) and self.cache_size > 0:  # Tokens without exp are never cached
+            self._cache[key] = (exp, claims)
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return claims
+
+    async def verify(self, token: str) -> dict:
+        """Return the token's claims; raises InvalidTokenError if it is invalid, expired or revoked"""
+        key = token_hash(token)
+        claims = self._claims(token, key)
+        if self.check_revocation:
+            try:
+                revoked = await self.redis_client.exists(REVOKED_PREFIX + key)
+            except Exception as e:
+                self._counters["revocation_check_errors"] += 1
+                logger.warning(f"Token revocation check failed: {str(e)}")
+                revoked = False
+            if revoked:
+                self._cache.pop(key, None)
+                self._counters["revoked"] += 1
+                raise InvalidTokenError("Token has been revoked")
+        return claims
+
+    async def revoke(self, token: str):
+        """Revoke a token until it would have expired anyway; returns its claims"""
+        key = token_hash(token)
+        claims = self._claims(token, key)
+        ttl = int(claims.get("exp", time.time() + ACCESS_TOKEN_EXPIRE_MINUTES * 60) - time.time()) + 1
+        await self.redis_client.set(REVOKED_PREFIX + key, 1, ex=max(ttl, 1))
+        self._cache.pop(key, None)
+        return claims
+
+    def stats(self):
+        """Cache and revocation counters for monitoring"""
+        return {
+            **self._counters,
+            "size": len(self._cache),
+            "max_size": self.cache_size,
+            "backend": self.backend,
+        }
+
+
+token_verifier = TokenVerifier(
+    JWT_SECRET_KEY,
+    JWT_ALGORITHM,
+    backend=config.JWT_VERIFY_BACKEND,
+    cache_size=config.JWT_CACHE_SIZE,
+    check_revocation=config.JWT_REVOCATION_ENABLED
+)
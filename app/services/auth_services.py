@@ -1,23 +1,34 @@
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
-from jose import jwt, JWTError
-from app.services.database import admins_collection
+from jose import jwt
+from app.services.database import get_collection
 from app.models.admin import AdminSignup, AdminLogin
 from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
-from app.core.config import JWT_SECRET_KEY, JWT_ALGORITHM
+from app.core.config import config, JWT_SECRET_KEY, JWT_ALGORITHM
+from app.core.token_verifier import token_verifier, InvalidTokenError
+import asyncio
 import logging
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
 # Configure password context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=config.BCRYPT_ROUNDS)
+
+# bcrypt releases the GIL, so hashing on a small dedicated pool keeps it off the event loop
+# without letting a burst of logins take over the default executor
+password_executor = ThreadPoolExecutor(max_workers=config.PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
 
 # Configure OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/admin/login/")
 
+def admins_collection():
+    """Admins collection on the shared MongoDB client"""
+    return get_collection("admins")
+
 def hash_password(password: str) -> str:
     """Hash a plaintext password using bcrypt algorithm"""
     try:
@@ -54,6 +65,16 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
         logger.debug(traceback.format_exc())
         raise ValueError("Failed to create access token") from e
 
+async def hash_password_async(password: str) -> str:
+    """hash_password on the bcrypt pool"""
+    return await asyncio.get_running_loop().run_in_executor(password_executor, hash_password, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password on the bcrypt pool"""
+    return await asyncio.get_running_loop().run_in_executor(
+        password_executor, verify_password, plain_password, hashed_password
+    )
+
 async def admin_signup(admin: AdminSignup):
     """Register a new admin in the database with hashed password"""
     try:
@@ -61,7 +82,7 @@ async def admin_signup(admin: AdminSignup):
         
         # Check if admin already exists
         try:
-            existing_admin = admins_collection.find_one({"email": admin.email})
+            existing_admin = await admins_collection().find_one({"email": admin.email})
             if existing_admin:
                 logger.warning(f"Signup failed: Admin {admin.email} already exists")
                 return {"error": "Admin already exists!"}
@@ -72,14 +93,14 @@ async def admin_signup(admin: AdminSignup):
 
         # Hash password and create admin record
         try:
-            hashed_password = hash_password(admin.password)
+            hashed_password = await hash_password_async(admin.password)
             admin_data = {
                 "email": admin.email, 
                 "password": hashed_password, 
                 "name": admin.name, 
                 "created_at": datetime.utcnow()
             }
-            result = admins_collection.insert_one(admin_data)
+            result = await admins_collection().insert_one(admin_data)
             if not result.acknowledged:
                 logger.error("Database insertion failed for new admin")
                 raise ValueError("Failed to insert new admin record")
@@ -108,7 +129,7 @@ async def admin_login(email, password):
         
         # Find admin in database
         try:
-            admin = admins_collection.find_one({"email": email})
+            admin = await admins_collection().find_one({"email": email})
             if not admin:
                 logger.warning(f"Login failed: Admin {email} not found")
                 return None
@@ -119,7 +140,7 @@ async def admin_login(email, password):
 
         # Verify password
         try:
-            if not verify_password(password, admin["password"]):
+            if not await verify_password_async(password, admin["password"]):
                 logger.warning(f"Login failed: Invalid password for {email}")
                 return None
         except Exception as verify_error:
@@ -153,7 +174,7 @@ async def get_current_admin(token: str = Depends(oauth2_scheme)):
         logger.debug("Validating authentication token")
         
         try:
-            payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
+            payload = await token_verifier.verify(token)  # Cached until exp, checked against revocations
             email: str = payload.get("sub")
             admin_id: str = payload.get("admin_id")
             
@@ -163,7 +184,7 @@ async def get_current_admin(token: str = Depends(oauth2_scheme)):
                 
             logger.debug(f"Token validation successful for admin: {email}")
             return {"email": email, "admin_id": admin_id}
-        except JWTError as jwt_error:
+        except InvalidTokenError as jwt_error:
             logger.warning(f"JWT validation failed: {str(jwt_error)}")
             raise HTTPException(status_code=401, detail="Invalid token")
         except Exception as e:
@@ -1,8 +1,14 @@
 import pymysql
+import asyncio
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from app.core.config import config
-from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient
 from app.core.config import *
+from app.services.mysql_pool import MySQLConnectionPool
+from app.services.redis_service import async_redis_client
+from app.services.result_cache import QueryResultCache, parse_table_ttls
 
 # Set up logging
 logging.basicConfig(
@@ -11,29 +17,54 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# MongoDB Connection
-try:
+# MongoDB: one Motor client (and connection pool) shared by auth, threads and conversations.
+# The FastAPI lifespan opens it with connect_mongo() and closes it with close_mongo().
+mongo_client = None
+
+def get_mongo_client():
+    """Returns the shared Motor client, creating it on first use (it connects lazily)"""
+    global mongo_client
+    if mongo_client is None:
+        mongo_client = AsyncIOMotorClient(
+            config.MONGO_URI,
+            maxPoolSize=config.MONGO_MAX_POOL_SIZE,
+            minPoolSize=config.MONGO_MIN_POOL_SIZE,
+            serverSelectionTimeoutMS=config.MONGO_SERVER_SELECTION_TIMEOUT_MS
+        )
+    return mongo_client
+
+async def connect_mongo():
+    """Create the shared client and check the server is reachable; called once at startup"""
     logger.info("Establishing MongoDB connection")
-    client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)  # Added timeout
-    # Test connection
-    client.server_info()
-    db = client[MONGO_DB_NAME]
-    admins_collection = db["admins"]
+    try:
+        await get_mongo_client().admin.command("ping")
+    except Exception as e:
+        logger.error(f"Failed to connect to MongoDB: {str(e)}")
+        raise
     logger.info("MongoDB connection established successfully")
-except Exception as e:
-    logger.error(f"Failed to connect to MongoDB: {str(e)}")
-    raise
+
+def close_mongo():
+    """Close the shared client and its pool; called at shutdown"""
+    global mongo_client
+    if mongo_client is not None:
+        mongo_client.close()
+        mongo_client = None
+        logger.info("MongoDB connection closed")
 
 def get_database():
     """Returns the MongoDB database instance for use in application routes and services"""
     try:
-        return db
+        return get_mongo_client()[config.MONGO_DB_NAME]
     except Exception as e:
         logger.error(f"Error accessing MongoDB database: {str(e)}")
         raise RuntimeError(f"Database access error: {str(e)}")
 
-def get_db_connection():
-    """Establish a MySQL database connection with configured credentials and return the connection object"""
+def get_collection(name: str):
+    """Returns a collection on the shared MongoDB client"""
+    return get_database()[name]
+
+def _create_mysql_connection():
+    """Open a new MySQL connection with configured credentials; used by the connection pool"""
     try:
         logger.info("Establishing MySQL connection")
         connection = pymysql.connect(
@@ -42,7 +73,8 @@ def get_db_connection():
             password=config.DB_PASSWORD,
             database=config.DB_NAME,
             port=config.DB_PORT,
-            cursorclass=pymysql.cursors.DictCursor
+            cursorclass=pymysql.cursors.DictCursor,
+            autocommit=True  # Pooled connections must not hold a stale read snapshot between queries
         )
         logger.debug("MySQL connection established successfully")
         return connection
@@ -53,24 +85,238 @@ def get_db_connection():
         logger.error(f"Unexpected error establishing MySQL connection: {str(e)}")
         raise
 
-def execute_sql_query(query: str):
-    """Executes the provided SQL query on MySQL database and returns results as dictionary objects"""
+# MySQL connection pool (connections are opened lazily on first use)
+mysql_pool = MySQLConnectionPool(
+    _create_mysql_connection,
+    min_size=config.DB_POOL_MIN_SIZE,
+    max_size=config.DB_POOL_MAX_SIZE,
+    idle_timeout=config.DB_POOL_IDLE_TIMEOUT,
+    max_lifetime=config.DB_POOL_MAX_LIFETIME,
+    acquire_timeout=config.DB_POOL_ACQUIRE_TIMEOUT,
+    health_check=config.DB_POOL_HEALTH_CHECK
+)
+
+# Bounded executor for blocking pymysql calls; sized to the pool so queries never queue on both
+mysql_executor = ThreadPoolExecutor(max_workers=config.DB_POOL_MAX_SIZE, thread_name_prefix="mysql")
+
+# Cache of SELECT results in front of execute_sql_query_async
+query_result_cache = QueryResultCache(
+    async_redis_client,
+    table_ttls=parse_table_ttls(config.RESULT_CACHE_TABLE_TTLS),
+    default_ttl=config.RESULT_CACHE_DEFAULT_TTL,
+    max_bytes=config.RESULT_CACHE_MAX_BYTES,
+    enabled=config.RESULT_CACHE_ENABLED
+)
+
+def get_db_connection():
+    """Borrow a MySQL connection from the pool; hand it back with release_db_connection()"""
+    return mysql_pool.acquire()
+
+def release_db_connection(connection, broken: bool = False):
+    """Return a borrowed MySQL connection to the pool, or close it if it may be broken"""
+    if broken:
+        mysql_pool.discard(connection)
+    else:
+        mysql_pool.release(connection)
+
+def get_pool_stats():
+    """Return MySQL connection pool statistics for monitoring"""
+    return mysql_pool.stats()
+
+class SQLRowStream:
+    """
+    Iterates over a query's rows in batches using an unbuffered server-side cursor (SSDictCursor),
+    so only one batch is held in memory at a time. At most `max_rows` rows are produced; if the
+    query has more, `truncated` is set and the connection is discarded instead of draining the rest.
+    """
+
+    def __init__(self, query: str, batch_size: int = None, max_rows: int = None):
+        self.query = query
+        self.batch_size = batch_size or config.SQL_STREAM_BATCH_SIZE
+        self.max_rows = max_rows
+        self.row_count = 0
+        self.truncated = False
+        self._conn = None
+        self._cursor = None
+        self._exhausted = False
+        self._broken = False
+        self._cancelled = False
+        self._state_lock = threading.Lock()
+        self.connection_id = None  # MySQL thread id, for KILL
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _open(self):
+        logger.info(f"Streaming SQL query: {self.query[:50]}...")
+        conn = get_db_connection()
+        with self._state_lock:
+            self._conn = conn
+            self.connection_id = conn.thread_id()
+            if self._cancelled:
+                raise RuntimeError("Query cancelled before it started")
+        self._cursor = self._conn.cursor(pymysql.cursors.SSDictCursor)
+        self._cursor.execute(self.query)
+        self._check_cancelled()
+
+    def _check_cancelled(self):
+        # A cancel() that lands between _open and execute() kills an idle connection; stop here instead
+        if self._cancelled:
+            raise RuntimeError("Query cancelled")
+
+    def batches(self):
+        """Yield lists of row dictionaries until the result or the row cap is exhausted"""
+        try:
+            if self._conn is None:
+                self._open()
+            while True:
+                self._check_cancelled()
+                size = self.batch_size
+                if self.max_rows is not None:
+                    size = min(size, self.max_rows - self.row_count)
+                if size <= 0:
+                    # Cap reached: peek one row to learn whether the result was cut short
+                    if self._cursor.fetchone() is not None:
+                        self.truncated = True
+                    else:
+                        self._exhausted = True
+                    return
+                batch = self._cursor.fetchmany(size)
+                if not batch:
+                    self._exhausted = True
+                    return
+                self.row_count += len(batch)
+                yield list(batch)
+        except Exception:
+            self._broken = True
+            raise
+        finally:
+            self.close()
+
+    def __iter__(self):
+        for batch in self.batches():
+            yield from batch
+
+    def close(self):
+        """Release the connection; an unfinished unbuffered result makes it unusable, so it is discarded"""
+        with self._state_lock:
+            if self._conn is None:
+                return
+            conn, self._conn = self._conn, None
+        if self._cancelled:
+            self._broken = True  # A KILL may be in flight; never hand this connection to another query
+        if self._exhausted and not self._broken:
+            try:
+                self._cursor.close()
+            except Exception:
+                self._broken = True
+        release_db_connection(conn, broken=self._broken or not self._exhausted)
+        logger.info(f"Streamed {self.row_count} rows{' (truncated)' if self.truncated else ''}")
+
+    def cancel(self):
+        """
+        Mark the stream cancelled and return the MySQL thread id to KILL, or None if the query
+        already finished. A cancelled stream discards its connection instead of returning it to
+        the pool, so the KILL can never hit another query on a reused connection.
+        """
+        with self._state_lock:
+            self._cancelled = True
+            return self.connection_id if self._conn is not None else None
+
+def explain_sql_query(query: str):
+    """Runs EXPLAIN for a query and returns the plan rows"""
     conn = None
+    broken = False
     try:
-        logger.info(f"Executing SQL query: {query[:50]}...")
         conn = get_db_connection()
         with conn.cursor() as cursor:
-            cursor.execute(query)
-            results = cursor.fetchall()
-            logger.info(f"Query executed successfully, returned {len(results)} rows")
-            return results
+            cursor.execute(f"EXPLAIN {query}")
+            return cursor.fetchall()
+    except Exception:
+        broken = True
+        raise
+    finally:
+        if conn:
+            release_db_connection(conn, broken=broken)
+
+async def explain_sql_query_async(query: str):
+    """Async variant of explain_sql_query, run on the bounded MySQL executor"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(mysql_executor, explain_sql_query, query)
+
+def kill_connection(connection_id: int):
+    """
+    KILL a MySQL connection from a dedicated side connection (the pool may be exhausted by the
+    stuck query). Unlike KILL QUERY this also covers a statement that has not been sent yet:
+    it fails on the dead connection instead of running to completion.
+    """
+    conn = _create_mysql_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("KILL %s", (connection_id,))
+        logger.warning(f"Killed MySQL connection {connection_id}")
+    finally:
+        conn.close()
+
+async def cancel_sql_stream(stream):
+    """Cancel a running SQLRowStream, killing its query server-side"""
+    connection_id = stream.cancel()
+    if connection_id is None:
+        return
+    try:
+        await asyncio.to_thread(kill_connection, connection_id)
+    except Exception as e:
+        logger.error(f"Failed to kill MySQL query on connection {connection_id}: {str(e)}")
+
+def stream_sql_query(query: str, batch_size: int = None, max_rows: int = None):
+    """Returns a SQLRowStream over the query's rows; iterate it or its batches()"""
+    return SQLRowStream(query, batch_size=batch_size, max_rows=max_rows)
+
+def fetch_sql_query(query: str, max_rows: int = None, stream: SQLRowStream = None):
+    """
+    Executes the query with a server-side cursor and returns (rows, truncated), keeping at most
+    max_rows rows (SQL_MAX_ROWS by default). Errors are returned as {"error": ...}.
+    Pass a pre-built `stream` to be able to cancel it from another thread.
+    """
+    max_rows = config.SQL_MAX_ROWS if max_rows is None else max_rows
+    try:
+        stream = stream or stream_sql_query(query, max_rows=max_rows)
+        rows = []
+        for batch in stream.batches():
+            rows.extend(batch)
+        if stream.truncated:
+            logger.warning(f"Query result truncated to {max_rows} rows")
+        return rows, stream.truncated
     except pymysql.MySQLError as e:
         logger.error(f"MySQL query error: {str(e)}")
-        return {"error": f"Database query error: {str(e)}"}
+        return {"error": f"Database query error: {str(e)}"}, False
     except Exception as e:
         logger.error(f"Unexpected error executing query: {str(e)}")
-        return {"error": f"Query execution error: {str(e)}"}
-    finally:
-        if conn:
-            conn.close()
-            logger.debug("MySQL connection closed")
\ No newline at end of file
+        return {"error": f"Query execution error: {str(e)}"}, False
+
+async def execute_sql_query_async(query: str, max_rows: int = None):
+    """
+    Runs the query on the bounded MySQL executor with a row cap, serving repeated SELECTs from the
+    result cache. Returns (rows, truncated).
+
+    If the awaiting task is cancelled (e.g. by a deadline), the running query is killed server-side.
+    """
+    max_rows = config.SQL_MAX_ROWS if max_rows is None else max_rows
+    cached = await query_result_cache.get(query, max_rows)
+    if cached is not None:
+        logger.info(f"Result cache hit for SQL query: {query[:50]}...")
+        return cached
+
+    loop = asyncio.get_running_loop()
+    stream = stream_sql_query(query, max_rows=max_rows)
+    try:
+        results, truncated = await loop.run_in_executor(mysql_executor, fetch_sql_query, query, max_rows, stream)
+    except asyncio.CancelledError:
+        await cancel_sql_stream(stream)
+        raise
+    if isinstance(results, list):
+        await query_result_cache.set(query, results, truncated, max_rows)
+    return results, truncated
@@ -1,22 +1,129 @@
-import pandas as pd
 import os
-from app.core.config import EXCEL_STORAGE_PATH
+import csv
+import gzip
+import asyncio
+import datetime
+import itertools
+from openpyxl import Workbook
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from app.core.config import EXCEL_STORAGE_PATH, config
 from app.services.redis_service import store_excel_path, get_excel_path
+from app.services.database import stream_sql_query
 import logging
 
 # Ensure the storage directory exists
 os.makedirs(EXCEL_STORAGE_PATH, exist_ok=True)
 
-async def generate_excel(conversation_id: str, data: list):
-    """
-    Asynchronously generate an Excel file from query results.
-    """
-    df = pd.DataFrame(data)  
-    file_path = os.path.join(EXCEL_STORAGE_PATH, f"{conversation_id}.xlsx")
-    
+# Supported export formats -> (file extension, download media type)
+EXPORT_FORMATS = {
+    "xlsx": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "csv": ("csv", "text/csv"),
+    "csv.gz": ("csv.gz", "application/gzip"),
+}
+
+def media_type_for(file_path: str) -> str:
+    """Return the download media type for an exported file based on its extension."""
+    for extension, media_type in sorted(EXPORT_FORMATS.values(), key=lambda item: -len(item[0])):
+        if file_path.endswith(f".{extension}"):
+            return media_type
+    return "application/octet-stream"
+
+def _decode_bytes(value):
+    """BLOB/BINARY values: text if they are valid UTF-8, otherwise hex."""
+    try:
+        return bytes(value).decode("utf-8")
+    except UnicodeDecodeError:
+        return bytes(value).hex()
+
+def _cell_value(value):
+    """Convert MySQL values openpyxl cannot store (bytes, tz-aware datetimes, control characters)."""
+    if isinstance(value, (bytes, bytearray)):
+        value = _decode_bytes(value)
+    if isinstance(value, datetime.datetime) and value.tzinfo is not None:
+        return value.replace(tzinfo=None)
+    if isinstance(value, str):
+        return ILLEGAL_CHARACTERS_RE.sub("", value)
+    return value
+
+def _split_header(rows):
+    """Peek the first row to get the column names; returns (header, rows iterator)."""
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return [], iter(())
+    return list(first.keys()), itertools.chain([first], rows)
+
+def write_rows_xlsx(file_path: str, rows) -> int:
+    """Write row dictionaries with openpyxl's write-only mode, which streams to disk in constant memory."""
+    header, rows = _split_header(rows)
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Sheet1")
+    count = 0
+    if header:
+        sheet.append(header)
+        for row in rows:
+            sheet.append([_cell_value(row.get(column)) for column in header])
+            count += 1
+    workbook.save(file_path)
+    return count
+
+def write_rows_csv(file_path: str, rows, compress: bool = False) -> int:
+    """Write row dictionaries as CSV (optionally gzip-compressed), one row at a time."""
+    header, rows = _split_header(rows)
+    opener = gzip.open if compress else open
+    count = 0
+    with opener(file_path, "wt", newline="", encoding="utf-8") as handle:
+        writer = csv.writer(handle)
+        if header:
+            writer.writerow(header)
+            for row in rows:
+                writer.writerow([_decode_bytes(value) if isinstance(value, (bytes, bytearray)) else value
+                                 for value in (row.get(column) for column in header)])
+                count += 1
+    return count
+
+def write_export(conversation_id: str, rows, fmt: str = "xlsx"):
+    """Write rows to the export file and record its path; blocking, runs in a worker thread."""
+    extension, _ = EXPORT_FORMATS[fmt]
+    file_path = os.path.join(EXCEL_STORAGE_PATH, f"{conversation_id}.{extension}")
+    temp_path = f"{file_path}.part"
+
     try:
-        df.to_excel(file_path, index=False)
+        if fmt == "xlsx":
+            row_count = write_rows_xlsx(temp_path, rows)
+        else:
+            row_count = write_rows_csv(temp_path, rows, compress=fmt == "csv.gz")
+        os.replace(temp_path, file_path)  # Never expose a half-written file
+        size = os.path.getsize(file_path)
         store_excel_path(conversation_id, file_path)  # Store path in Redis
-        logging.info(f"Excel generated: {file_path}")
+        logging.info(f"Excel generated: {file_path} ({row_count} rows, {size} bytes)")
+        return {"path": file_path, "format": fmt, "rows": row_count, "bytes": size}
     except Exception as e:
         logging.error(f"Excel generation failed: {e}")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return None
+
+async def generate_excel(conversation_id: str, data, fmt: str = "xlsx"):
+    """
+    Asynchronously write query results (a list or any iterator of row dicts) to an export file.
+    Returns {"path", "format", "rows", "bytes"}, or None if the export failed.
+    """
+    return await asyncio.to_thread(write_export, conversation_id, data, fmt)
+
+def export_query_to_file(conversation_id: str, sql_query: str, fmt: str, max_rows: int, stream=None):
+    """Stream a query's rows from a server-side cursor into the export file; blocking."""
+    with stream or stream_sql_query(sql_query, max_rows=max_rows) as stream:
+        result = write_export(conversation_id, stream, fmt)
+    if result is not None:
+        result["truncated"] = stream.truncated
+    return result
+
+async def export_query(conversation_id: str, sql_query: str, fmt: str = None, max_rows: int = None):
+    """
+    Re-run a query with a server-side cursor and stream its rows straight into the export file,
+    so results larger than SQL_MAX_ROWS can be exported without holding them in memory.
+    """
+    fmt = fmt or config.EXPORT_LARGE_FORMAT
+    max_rows = config.EXPORT_MAX_ROWS if max_rows is None else max_rows
+    return await asyncio.to_thread(export_query_to_file, conversation_id, sql_query, fmt, max_rows)
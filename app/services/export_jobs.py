@@ -0,0 +1,310 @@
+import os
+import time
+import uuid
+import socket
+import asyncio
+import logging
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from app.core.config import config
+from app.services.redis_service import async_redis_client
+from app.services.result_cache import encode_results, decode_results
+from app.services.database import stream_sql_query, cancel_sql_stream
+from app.services.excel_service import write_export, export_query_to_file
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+QUEUE_KEY = "export_jobs:queue"
+DELAYED_KEY = "export_jobs:delayed"  # sorted set of job ids scored by retry time
+PROCESSING_KEY = "export_jobs:processing"  # prefix of each pool's list of jobs taken off the queue
+CONSUMER_KEY = "export_jobs:consumer"  # prefix of each pool's heartbeat key
+
+
+def _job_key(conversation_id: str) -> str:
+    return f"export_job:{conversation_id}"
+
+
+def _payload_key(conversation_id: str) -> str:
+    return f"export_job:{conversation_id}:payload"
+
+
+async def enqueue_export(conversation_id: str, rows=None, sql_query: str = None, fmt: str = "xlsx",
+                         redis_client=None, ttl: int = 10800):
+    """
+    Queue an export job for a conversation.
+
+    Small in-memory results are embedded in the job payload; larger ones (or jobs given only
+    `sql_query`) are re-read from MySQL by the worker with a streaming cursor.
+    """
+    redis_client = redis_client or async_redis_client
+    payload = None
+    if rows is not None:
+        encoded = encode_results(rows)
+        if len(encoded) <= config.EXPORT_INLINE_MAX_BYTES or not sql_query:
+            payload = encoded
+    if payload is None and not sql_query:
+        raise ValueError("An export job needs either rows or a SQL query")
+
+    now = time.time()
+    job = {
+        "conversation_id": conversation_id,
+        "state": QUEUED,
+        "format": fmt,
+        "source": "rows" if payload is not None else "query",
+        "attempts": 0,
+        "error": "",
+        "created_at": now,
+        "updated_at": now,
+    }
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.hset(_job_key(conversation_id), mapping=job)
+        pipe.expire(_job_key(conversation_id), ttl)
+        pipe.set(_payload_key(conversation_id), payload if payload is not None else sql_query, ex=ttl)
+        pipe.rpush(QUEUE_KEY, conversation_id)
+        await pipe.execute()
+    logger.info(f"Queued {fmt} export for conversation {conversation_id} ({job['source']})")
+    return job
+
+
+async def get_export_status(conversation_id: str, redis_client=None):
+    """Return the job record for a conversation's export, or None if no job exists"""
+    redis_client = redis_client or async_redis_client
+    job = await redis_client.hgetall(_job_key(conversation_id))
+    if not job:
+        return None
+    job["attempts"] = int(job.get("attempts", 0))
+    for field in ("rows", "bytes"):
+        if field in job:
+            job[field] = int(job[field])
+    return job
+
+
+class ExportWorkerPool:
+    """
+    Local pool of asyncio workers consuming the Redis export queue.
+
+    Each worker runs one export at a time on a dedicated thread pool of `concurrency`
+    threads, so exports never compete with API requests for the default executor.
+    Failed jobs are retried with exponential backoff up to `max_attempts`.
+
+    Jobs move atomically from the queue onto this pool's processing list (BLMOVE) and
+    leave it once their outcome is recorded. The pool keeps a heartbeat key alive for
+    `heartbeat_ttl` seconds; a processing list whose heartbeat has expired belongs to a
+    pool that died mid-job, and its jobs are put back on the queue at startup and on
+    every heartbeat after.
+    """
+
+    def __init__(self, redis_client=None, concurrency: int = 2, max_attempts: int = 3,
+                 retry_backoff: float = 5.0, poll_timeout: int = 1, job_timeout: float = 900,
+                 heartbeat_ttl: int = 30):
+        self.redis_client = redis_client or async_redis_client
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.poll_timeout = poll_timeout
+        self.job_timeout = job_timeout
+        self.heartbeat_ttl = heartbeat_ttl
+        self.consumer_id = self._new_consumer_id()
+        self._executor = None
+        self._tasks = []
+        self._heartbeat_task = None
+        self._stopping = False
+        self._counters = {"completed": 0, "failed": 0, "retried": 0, "timed_out": 0, "requeued": 0}
+        self._running = 0
+
+    @staticmethod
+    def _new_consumer_id() -> str:
+        # Unique per start, so a restarted process (same host and pid in a container) is a new consumer
+        return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    @property
+    def processing_key(self) -> str:
+        return f"{PROCESSING_KEY}:{self.consumer_id}"
+
+    @property
+    def consumer_key(self) -> str:
+        return f"{CONSUMER_KEY}:{self.consumer_id}"
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._stopping = False
+        self.consumer_id = self._new_consumer_id()
+        try:
+            await self.redis_client.set(self.consumer_key, 1, ex=self.heartbeat_ttl)
+            await self.requeue_stale()
+        except Exception as e:
+            logger.warning(f"Could not recover export jobs from stopped workers: {str(e)}")
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="export")
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.concurrency)]
+        self._heartbeat_task = asyncio.create_task(self._heartbeat())
+        logger.info(f"Started {self.concurrency} export workers")
+
+    async def stop(self):
+        """Stop taking new jobs and wait for running exports to finish"""
+        self._stopping = True
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._heartbeat_task:
+            self._heartbeat_task.cancel()
+            await asyncio.gather(self._heartbeat_task, return_exceptions=True)
+            self._heartbeat_task = None
+            try:
+                await self.redis_client.delete(self.consumer_key)
+            except Exception as e:
+                logger.warning(f"Failed to remove export worker heartbeat: {str(e)}")
+        if self._executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        logger.info("Export workers stopped")
+
+    async def _heartbeat(self):
+        """Keep this pool's consumer key alive and recover jobs left behind by dead pools"""
+        while True:
+            await asyncio.sleep(self.heartbeat_ttl / 3)
+            try:
+                await self.redis_client.set(self.consumer_key, 1, ex=self.heartbeat_ttl)
+                await self.requeue_stale()
+            except Exception as e:
+                logger.warning(f"Export worker heartbeat failed: {str(e)}")
+
+    async def requeue_stale(self) -> int:
+        """Put the jobs of processing lists without a live heartbeat back at the head of the queue"""
+        requeued = 0
+        async for key in self.redis_client.scan_iter(match=f"{PROCESSING_KEY}:*"):
+            consumer_id = key[len(PROCESSING_KEY) + 1:]
+            if consumer_id == self.consumer_id or await self.redis_client.exists(f"{CONSUMER_KEY}:{consumer_id}"):
+                continue
+            # LMOVE is atomic, so a job recovered by two pools at once is still queued only once
+            while await self.redis_client.lmove(key, QUEUE_KEY, "RIGHT", "LEFT") is not None:
+                requeued += 1
+        if requeued:
+            logger.warning(f"Requeued {requeued} export jobs left running by stopped workers")
+            self._counters["requeued"] += requeued
+        return requeued
+
+    async def _promote_due_retries(self):
+        """Move retry-delayed jobs whose backoff has elapsed back onto the queue"""
+        due = await self.redis_client.zrangebyscore(DELAYED_KEY, 0, time.time())
+        for conversation_id in due:
+            # zrem succeeds for exactly one worker, so a job is never requeued twice
+            if await self.redis_client.zrem(DELAYED_KEY, conversation_id):
+                await self.redis_client.rpush(QUEUE_KEY, conversation_id)
+
+    async def _worker(self, index: int):
+        while not self._stopping:
+            try:
+                await self._promote_due_retries()
+                conversation_id = await self.redis_client.blmove(QUEUE_KEY, self.processing_key, self.poll_timeout,
+                                                                 "LEFT", "RIGHT")
+                if conversation_id is None:
+                    continue
+                await self.process_job(conversation_id)
+                # The outcome is recorded; a job still listed here when the pool dies is requeued
+                await self.redis_client.lrem(self.processing_key, 1, conversation_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Export worker {index} error: {str(e)}")
+                logger.debug(traceback.format_exc())
+                await asyncio.sleep(self.poll_timeout)
+
+    def _run_export(self, conversation_id: str, job: dict, payload: str, stream=None):
+        """Blocking export body; runs on the export thread pool"""
+        fmt = job.get("format", "xlsx")
+        if job.get("source") == "rows":
+            return write_export(conversation_id, decode_results(payload), fmt)
+        return export_query_to_file(conversation_id, payload, fmt, config.EXPORT_MAX_ROWS, stream)
+
+    async def process_job(self, conversation_id: str):
+        """Run a single export job and record its outcome"""
+        job_key = _job_key(conversation_id)
+        job = await self.redis_client.hgetall(job_key)
+        payload = await self.redis_client.get(_payload_key(conversation_id))
+        if not job or payload is None:
+            logger.warning(f"Export job {conversation_id} expired before it could run")
+            return
+
+        attempts = int(job.get("attempts", 0)) + 1
+        await self.redis_client.hset(job_key, mapping={"state": RUNNING, "attempts": attempts,
+                                                       "updated_at": time.time()})
+        # Query-backed exports get a stream handle so an overrunning query can be killed
+        stream = stream_sql_query(payload, max_rows=config.EXPORT_MAX_ROWS) if job.get("source") == "query" else None
+        self._running += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result = await asyncio.wait_for(
+                loop.run_in_executor(self._executor, self._run_export, conversation_id, job, payload, stream),
+                self.job_timeout
+            )
+            if result is None:
+                raise RuntimeError("Export writer failed")
+        except asyncio.TimeoutError:
+            if stream is not None:
+                await cancel_sql_stream(stream)
+            # Not retried: the timed-out writer thread may still be finishing the same file
+            await self._mark_failed(conversation_id, attempts, f"Export timed out after {self.job_timeout}s")
+            self._counters["timed_out"] += 1
+            return
+        except Exception as e:
+            await self._handle_failure(conversation_id, attempts, str(e))
+            return
+        finally:
+            self._running -= 1
+
+        await self.redis_client.hset(job_key, mapping={
+            "state": DONE,
+            "path": result["path"],
+            "rows": result["rows"],
+            "bytes": result["bytes"],
+            "error": "",
+            "updated_at": time.time(),
+        })
+        await self.redis_client.delete(_payload_key(conversation_id))
+        self._counters["completed"] += 1
+        logger.info(f"Export job {conversation_id} done: {result['rows']} rows, {result['bytes']} bytes")
+
+    async def _handle_failure(self, conversation_id: str, attempts: int, error: str):
+        job_key = _job_key(conversation_id)
+        if attempts < self.max_attempts:
+            delay = self.retry_backoff * (2 ** (attempts - 1))
+            logger.warning(f"Export job {conversation_id} failed (attempt {attempts}), retrying in {delay}s: {error}")
+            await self.redis_client.hset(job_key, mapping={"state": QUEUED, "error": error,
+                                                           "updated_at": time.time()})
+            await self.redis_client.zadd(DELAYED_KEY, {conversation_id: time.time() + delay})
+            self._counters["retried"] += 1
+            return
+
+        await self._mark_failed(conversation_id, attempts, error)
+
+    async def _mark_failed(self, conversation_id: str, attempts: int, error: str):
+        logger.error(f"Export job {conversation_id} failed after {attempts} attempts: {error}")
+        await self.redis_client.hset(_job_key(conversation_id), mapping={"state": FAILED, "error": error,
+                                                                         "updated_at": time.time()})
+        await self.redis_client.delete(_payload_key(conversation_id))
+        self._counters["failed"] += 1
+
+    def stats(self):
+        """Worker counters for monitoring"""
+        return {
+            **self._counters,
+            "running": self._running,
+            "workers": len(self._tasks),
+            "concurrency": self.concurrency,
+        }
+
+
+export_worker_pool = ExportWorkerPool(
+    concurrency=config.EXPORT_WORKERS,
+    max_attempts=config.EXPORT_MAX_ATTEMPTS,
+    retry_backoff=config.EXPORT_RETRY_BACKOFF,
+    job_timeout=config.EXPORT_TIMEOUT
+)
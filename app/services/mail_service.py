@@ -0,0 +1,225 @@
+import os
+import time
+import asyncio
+import smtplib
+import logging
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from app.core.config import config
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class SMTPTransport:
+    """
+    Sends over one persistent SMTP connection: STARTTLS and login happen once, then every
+    message reuses the session. A connection the server has dropped is reopened and the
+    message resent once. Not thread-safe; MailSender calls it from a single thread.
+    """
+
+    def __init__(self, host: str, port: int, user: str = None, password: str = None,
+                 starttls: bool = True, timeout: float = 10):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self._server = None
+        self.connections = 0  # Sessions opened, for monitoring
+
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            server.starttls()
+        if self.user:
+            server.login(self.user, self.password)
+        self._server = server
+        self.connections += 1
+
+    def send(self, message):
+        if self._server is None:
+            self._connect()
+        try:
+            self._server.send_message(message)
+        except smtplib.SMTPServerDisconnected:
+            logger.info("SMTP connection was closed by the server; reconnecting")
+            self._server = None
+            self._connect()
+            self._server.send_message(message)
+
+    def close(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass  # Already gone
+            self._server = None
+
+
+class FileTransport:
+    """Writes each message to `directory` as an .eml file instead of sending it; for local runs and tests"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._sequence = 0
+
+    def send(self, message):
+        os.makedirs(self.directory, exist_ok=True)
+        self._sequence += 1
+        path = os.path.join(self.directory, f"{int(time.time() * 1000)}_{self._sequence}.eml")
+        with open(path, "wb") as f:
+            f.write(message.as_bytes())
+        logger.info(f"Wrote email for {message['To']} to {path}")
+
+    def close(self):
+        pass
+
+
+def build_transport():
+    """Transport selected by MAIL_TRANSPORT: smtp (default) or file"""
+    if config.MAIL_TRANSPORT == "file":
+        return FileTransport(config.MAIL_FILE_DIR)
+    if config.MAIL_TRANSPORT != "smtp":
+        raise ValueError(f"Unknown mail transport: {config.MAIL_TRANSPORT}")
+    return SMTPTransport(
+        config.EMAIL_HOST,
+        int(config.EMAIL_PORT or 587),
+        config.EMAIL_USER,
+        config.EMAIL_PASSWORD,
+        timeout=config.SMTP_TIMEOUT
+    )
+
+
+class MailSender:
+    """
+    Background mail queue in front of a transport.
+
+    `send` only queues the message; a worker task hands it to the transport on a single
+    dedicated thread, so blocking SMTP I/O never runs on the event loop and the
+    transport's connection is reused across messages. Failed sends are retried with
+    exponential backoff up to `max_attempts`. stop() delivers what is queued (within
+    `shutdown_timeout`) and closes the transport.
+    """
+
+    def __init__(self, transport=None, max_attempts: int = 3, retry_backoff: float = 2.0,
+                 queue_size: int = 1000, shutdown_timeout: float = 10):
+        self.transport = transport
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.queue_size = queue_size
+        self.shutdown_timeout = shutdown_timeout
+        self._queue = None
+        self._task = None
+        self._retries = set()
+        self._executor = None
+        self._counters = {"queued": 0, "sent": 0, "failed": 0, "retried": 0, "dropped": 0}
+        self._last_send_ms = 0.0
+
+    @property
+    def running(self):
+        return self._task is not None
+
+    async def start(self):
+        if self._task:
+            return
+        self.transport = self.transport or build_transport()
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mail")
+        self._task = asyncio.create_task(self._worker())
+        logger.info(f"Started mail sender ({type(self.transport).__name__})")
+
+    async def stop(self):
+        """Deliver queued mail, then stop the worker and close the transport"""
+        if not self._task:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), self.shutdown_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Mail sender stopped with {self._queue.qsize()} messages undelivered")
+        if self._retries:
+            logger.warning(f"Mail sender stopped with {len(self._retries)} retries pending")
+        for task in [self._task, *self._retries]:
+            task.cancel()
+        await asyncio.gather(self._task, *self._retries, return_exceptions=True)
+        self._task = None
+        self._retries.clear()
+        await asyncio.get_running_loop().run_in_executor(self._executor, self.transport.close)
+        self._executor.shutdown(wait=True)
+        self._executor = None
+        logger.info("Mail sender stopped")
+
+    async def send(self, message) -> bool:
+        """
+        Queue a message; returns False if it could not be queued. While the sender is not
+        running the message is delivered directly (off the event loop) instead.
+        """
+        if not self.running:
+            transport = self.transport or build_transport()
+            try:
+                await asyncio.to_thread(transport.send, message)
+            except Exception as e:
+                logger.error(f"Failed to send email to {message['To']}: {str(e)}")
+                return False
+            finally:
+                await asyncio.to_thread(transport.close)
+            return True
+        try:
+            self._queue.put_nowait((message, 1))
+        except asyncio.QueueFull:
+            self._counters["dropped"] += 1
+            logger.error(f"Mail queue full; dropping email to {message['To']}")
+            return False
+        self._counters["queued"] += 1
+        return True
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            message, attempt = await self._queue.get()
+            start = time.perf_counter()
+            try:
+                await loop.run_in_executor(self._executor, self.transport.send, message)
+                self._counters["sent"] += 1
+                self._last_send_ms = round((time.perf_counter() - start) * 1000, 1)
+                logger.info(f"Email sent to {message['To']}")
+            except Exception as e:
+                logger.error(f"Failed to send email to {message['To']} (attempt {attempt}): {str(e)}")
+                logger.debug(traceback.format_exc())
+                self._handle_failure(message, attempt)
+            finally:
+                self._queue.task_done()
+
+    def _handle_failure(self, message, attempt: int):
+        # Drop the connection so the retry starts a fresh session
+        self._executor.submit(self.transport.close)
+        if attempt >= self.max_attempts:
+            self._counters["failed"] += 1
+            return
+        self._counters["retried"] += 1
+        task = asyncio.create_task(self._retry(message, attempt + 1, self.retry_backoff * 2 ** (attempt - 1)))
+        self._retries.add(task)
+        task.add_done_callback(self._retries.discard)
+
+    async def _retry(self, message, attempt: int, delay: float):
+        await asyncio.sleep(delay)
+        await self._queue.put((message, attempt))
+
+    def stats(self):
+        """Send counters for monitoring"""
+        return {
+            **self._counters,
+            "depth": self._queue.qsize() if self._queue else 0,
+            "pending_retries": len(self._retries),
+            "connections": getattr(self.transport, "connections", None),
+            "last_send_ms": self._last_send_ms,
+            "running": self.running,
+        }
+
+
+mail_sender = MailSender(
+    max_attempts=config.MAIL_MAX_ATTEMPTS,
+    retry_backoff=config.MAIL_RETRY_BACKOFF,
+    queue_size=config.MAIL_QUEUE_SIZE
+)
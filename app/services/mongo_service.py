@@ -1,36 +1,130 @@
-from pymongo import MongoClient
+import json
+import time
+import base64
+import asyncio
+import logging
+from collections import OrderedDict
+from bson import ObjectId
+from pymongo import IndexModel, InsertOne, UpdateOne, ASCENDING, DESCENDING
 from app.core.config import config  
+from app.services.database import get_collection
 from datetime import datetime
 
-# Initialize MongoDB connection
-mongo_client = MongoClient(config.MONGO_URI)
-db = mongo_client[config.MONGO_DB_NAME]
+# Configure logging
+logger = logging.getLogger(__name__)
 
-threads_collection = db["threads"]
-conversations_collection = db["conversations"]
 
-def get_conversations_by_thread(admin_id: str, thread_id: str, page: int = 1, limit: int = 10):
+def threads_collection():
+    return get_collection("threads")
+
+
+def conversations_collection():
+    return get_collection("conversations")
+
+
+# Indexes backing the thread/conversation queries below; created at startup by ensure_indexes
+CONVERSATION_INDEXES = [
+    IndexModel([("admin_id", ASCENDING), ("thread_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)],
+               name="admin_thread_timestamp"),
+]
+THREAD_INDEXES = [
+    IndexModel([("admin_id", ASCENDING), ("end_timestamp", DESCENDING), ("_id", DESCENDING)],
+               name="admin_end_timestamp"),
+    IndexModel([("thread_id", ASCENDING)], name="thread_id"),  # end_timestamp updates on every insert
+]
+
+# (collection, admin_id, thread_id) -> (expires_at, count); entries share one TTL and are
+# re-inserted on refresh, so insertion order is expiry order
+_count_cache = OrderedDict()
+
+
+async def ensure_indexes():
+    """Create the pagination indexes if they are missing; a no-op when they already exist"""
+    await conversations_collection().create_indexes(CONVERSATION_INDEXES)
+    await threads_collection().create_indexes(THREAD_INDEXES)
+
+
+def encode_cursor(doc: dict, field: str) -> str:
+    """Opaque keyset token for the page after `doc`: its sort value and _id"""
+    payload = json.dumps({"v": doc.get(field), "id": str(doc["_id"])}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """Return (sort value, _id) from a token made by encode_cursor; raises ValueError if it is malformed"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return payload["v"], ObjectId(payload["id"])
+    except Exception as e:
+        raise ValueError("Invalid pagination cursor") from e
+
+
+def _after_cursor(field: str, cursor: str):
+    """
+    Filter for documents after the cursor in (field desc, _id desc) order. Nulls sort last in
+    descending order, and range operators never match null, so they get their own branch.
+    """
+    value, last_id = decode_cursor(cursor)
+    if value is None:
+        return {field: None, "_id": {"$lt": last_id}}
+    return {"$or": [
+        {field: {"$lt": value}},
+        {field: value, "_id": {"$lt": last_id}},
+        {field: None},
+    ]}
+
+
+async def _cached_count(collection, query_filter: dict, key: tuple):
+    """count_documents, reused for MONGO_COUNT_CACHE_TTL seconds so paging does not recount every page"""
+    now = time.monotonic()
+    cached = _count_cache.get(key)
+    if cached and cached[0] > now:
+        return cached[1]
+    count = await collection.count_documents(query_filter)
+    _count_cache.pop(key, None)
+    _count_cache[key] = (now + config.MONGO_COUNT_CACHE_TTL, count)
+    # Drop expired entries from the front, and the oldest ones past MONGO_COUNT_CACHE_SIZE
+    while _count_cache and (len(_count_cache) > config.MONGO_COUNT_CACHE_SIZE or
+                            next(iter(_count_cache.values()))[0] <= now):
+        _count_cache.popitem(last=False)
+    return count
+
+
+def _invalidate_counts(*keys):
+    for key in keys:
+        _count_cache.pop(key, None)
+
+
+async def _page(cursor, limit: int, field: str):
+    """Fetch limit+1 documents and split them into the page and the token for the next one"""
+    docs = await cursor.limit(limit + 1).to_list(length=limit + 1)
+    next_cursor = encode_cursor(docs[limit - 1], field) if len(docs) > limit else None
+    docs = docs[:limit]
+    for doc in docs:
+        doc.pop("_id", None)
+    return docs, next_cursor
+
+
+async def get_conversations_by_thread(admin_id: str, thread_id: str, page: int = 1, limit: int = 10, cursor: str = None):
     """
     Retrieve paginated conversations for a given thread_id and admin_id, sorted from latest to earliest.
+    Pass the previous page's `next_cursor` to seek straight to the next page on the index
+    instead of skipping past every earlier conversation.
     """
     query_filter = {"admin_id": admin_id, "thread_id": thread_id}  # Ensure correct filtering
+    page_filter = {**query_filter, **_after_cursor("timestamp", cursor)} if cursor else query_filter
 
-    # Calculate how many documents to skip based on page number
-    skip_count = (page - 1) * limit  
-
-    # Fetch paginated conversations sorted by timestamp (latest first)
-    conversations = list(
-        conversations_collection.find(
-            query_filter, 
-            {"_id": 0, "thread_id": 0, "admin_id": 0, "data_type": 0}
-        )
-        .sort("timestamp", -1)  # Sort by latest first
-        .skip(skip_count)       # Skip past pages
-        .limit(limit)           # Limit per page
-    )
+    # Fetch one extra conversation to learn whether another page follows
+    conversations_cursor = conversations_collection().find(
+        page_filter,
+        {"thread_id": 0, "admin_id": 0, "data_type": 0}
+    ).sort([("timestamp", DESCENDING), ("_id", DESCENDING)])  # Sort by latest first
+    if not cursor and page > 1:
+        conversations_cursor = conversations_cursor.skip((page - 1) * limit)  # Offset paging for old clients
+    conversations, next_cursor = await _page(conversations_cursor, limit, "timestamp")
 
     # Get total count for pagination metadata
-    total_count = conversations_collection.count_documents(query_filter)
+    total_count = await _cached_count(conversations_collection(), query_filter, ("conversations", admin_id, thread_id))
     total_pages = (total_count + limit - 1) // limit  # Calculate total pages
 
     return {
@@ -38,48 +132,72 @@ def get_conversations_by_thread(admin_id: str, thread_id: str, page: int = 1, li
         "limit": limit,
         "total_pages": total_pages,
         "total_conversations": total_count,
-        "conversations": conversations
+        "conversations": conversations,
+        "next_cursor": next_cursor
     }
 
 
-def get_threads_by_admin(admin_id: str, page: int = 1, limit: int = 10):
+async def get_threads_by_admin(admin_id: str, page: int = 1, limit: int = 10, cursor: str = None):
     """
-    Retrieve paginated thread IDs and chat names for a given admin.
+    Retrieve paginated thread IDs and chat names for a given admin, most recently active first.
+    Accepts the previous page's `next_cursor` like get_conversations_by_thread.
     """
-    skip = (page - 1) * limit  # Calculate offset for pagination
+    query_filter = {"admin_id": admin_id}
+    page_filter = {**query_filter, **_after_cursor("end_timestamp", cursor)} if cursor else query_filter
 
-    total_threads = threads_collection.count_documents({"admin_id": admin_id})  # Total count
+    threads_cursor = threads_collection().find(
+        page_filter,
+        {"thread_id": 1, "chat_name": 1, "end_timestamp": 1}
+    ).sort([("end_timestamp", DESCENDING), ("_id", DESCENDING)])
+    if not cursor and page > 1:
+        threads_cursor = threads_cursor.skip((page - 1) * limit)
+    threads, next_cursor = await _page(threads_cursor, limit, "end_timestamp")
+    for thread in threads:
+        thread.pop("end_timestamp", None)  # Only needed for the cursor
 
-    threads_cursor = threads_collection.find(
-        {"admin_id": admin_id}, 
-        {"thread_id": 1, "chat_name": 1, "_id": 0}
-    ).skip(skip).limit(limit)
-
-    threads = list(threads_cursor)  # Convert cursor to list
+    total_threads = await _cached_count(threads_collection(), query_filter, ("threads", admin_id, None))  # Total count
 
     return {
         "threads": threads,
         "page": page,
         "limit": limit,
         "total_threads": total_threads,
-        "total_pages": (total_threads // limit) + (1 if total_threads % limit else 0)
+        "total_pages": (total_threads // limit) + (1 if total_threads % limit else 0),
+        "next_cursor": next_cursor
     }
 
-# ✅ Function to insert a new thread
-def insert_into_threads(thread_id: str, admin_id: str, chat_name: str):
-    thread_doc = {
+
+async def get_thread_snapshot(admin_id: str, thread_id: str, limit: int):
+    """
+    A thread as insert_into_redis_async takes it, for re-caching one whose Redis entry expired:
+    its newest `limit` conversations (oldest first) and the full conversation count. None if
+    the thread does not exist.
+    """
+    thread = await threads_collection().find_one({"admin_id": admin_id, "thread_id": thread_id}, {"chat_name": 1})
+    if thread is None:
+        return None
+    page = await get_conversations_by_thread(admin_id, thread_id, limit=limit)
+    return {
+        "thread_id": thread_id,
+        "admin_id": admin_id,
+        "chat_name": thread.get("chat_name"),
+        "conversations": list(reversed(page["conversations"])),
+        "conversation_count": page["total_conversations"],
+    }
+
+
+def _build_thread_doc(thread_id: str, admin_id: str, chat_name: str):
+    return {
         "thread_id": str(thread_id),
         "admin_id": admin_id,
         "chat_name": chat_name,
         "start_timestamp": datetime.utcnow().isoformat(),
         "end_timestamp": None  # Will be updated on new messages
     }
-    threads_collection.insert_one(thread_doc)
 
 
-# ✅ Function to insert a conversation and update the thread's end_timestamp
-def insert_into_conversations(thread_id: str, admin_id: str, conversation: dict):
-    conversation_doc = {
+def _build_conversation_doc(thread_id: str, admin_id: str, conversation: dict):
+    return {
         "conversation_id": str(conversation["conversation_id"]),
         "thread_id": thread_id,
         "admin_id": admin_id,
@@ -90,12 +208,200 @@ def insert_into_conversations(thread_id: str, admin_id: str, conversation: dict)
         "data_type": conversation.get("data_type"),
         "cols": conversation.get("cols"),
         "rows": conversation.get("rows"),
+        "truncated": conversation.get("truncated", False),
         "excel_path": conversation["excel_path"]
     }
-    conversations_collection.insert_one(conversation_doc)
+
+
+class MongoWriteBuffer:
+    """
+    Write-behind buffer for thread and conversation writes.
+
+    Writes queue in memory and a background task flushes them every `flush_interval`
+    seconds, or as soon as `max_batch` are waiting, as one unordered bulk_write on
+    `conversations` and one ordered bulk_write on `threads` (new threads first, then a
+    single end_timestamp update per thread). Every write gets a future that resolves once
+    its flush is acknowledged by MongoDB; a write is only durable from that point, so
+    callers that need durability await it. stop() flushes whatever is still queued.
+    """
+
+    def __init__(self, flush_interval: float = 0.05, max_batch: int = 500):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._pending = []  # (kind, doc, future)
+        self._wake = asyncio.Event()
+        self._task = None
+        self._stopping = False
+        self._counters = {"flushes": 0, "threads_written": 0, "conversations_written": 0, "failed": 0}
+        self._max_depth = 0
+        self._last_flush_ms = 0.0
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        if self._task:
+            return
+        self._stopping = False
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Started MongoDB write buffer (flush every {self.flush_interval}s or {self.max_batch} writes)")
+
+    async def stop(self):
+        """Flush everything still buffered, then stop the background task"""
+        if not self._task:
+            return
+        self._stopping = True
+        self._wake.set()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        logger.info("MongoDB write buffer stopped")
+
+    def add_thread(self, doc: dict):
+        return self._add("thread", doc)
+
+    def add_conversation(self, doc: dict):
+        return self._add("conversation", doc)
+
+    def _add(self, kind: str, doc: dict):
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((kind, doc, future))
+        self._max_depth = max(self._max_depth, len(self._pending))
+        if len(self._pending) >= self.max_batch:
+            self._wake.set()
+        return future
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            while self._pending:
+                try:
+                    await self.flush()
+                except Exception as e:
+                    # flush() has failed its batch's futures; keep the task alive for later writes
+                    logger.error(f"MongoDB write buffer flush failed: {str(e)}")
+            if self._stopping:
+                return
+
+    async def flush(self):
+        """Write up to max_batch buffered writes: two round trips at most, whatever the batch size"""
+        batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+        if not batch:
+            return
+        try:
+            await self._write_batch(batch)
+        except Exception as e:
+            # e.g. a malformed document; without this its callers would wait forever
+            for _, _, future in batch:
+                self._settle(future, e)
+            raise
+
+    async def _write_batch(self, batch):
+        start = time.perf_counter()
+        thread_inserts = [(doc, future) for kind, doc, future in batch if kind == "thread"]
+        conversations = [(doc, future) for kind, doc, future in batch if kind == "conversation"]
+
+        # New threads go before the end_timestamp updates so a thread created in this batch gets its update
+        end_timestamps = {}
+        for doc, _ in conversations:
+            end_timestamps[doc["thread_id"]] = max(doc["timestamp"], end_timestamps.get(doc["thread_id"], doc["timestamp"]))
+        thread_ops = [InsertOne(doc) for doc, _ in thread_inserts] + [
+            UpdateOne({"thread_id": thread_id}, {"$set": {"end_timestamp": timestamp}})
+            for thread_id, timestamp in end_timestamps.items()
+        ]
+        try:
+            writes = []
+            if conversations:
+                writes.append(conversations_collection().bulk_write([InsertOne(doc) for doc, _ in conversations],
+                                                                    ordered=False))
+            if thread_ops:
+                writes.append(threads_collection().bulk_write(thread_ops, ordered=True))
+            results = await asyncio.gather(*writes, return_exceptions=True)
+            conversations_error = results.pop(0) if conversations else None
+            threads_error = results.pop(0) if thread_ops else None
+        except Exception as e:
+            conversations_error = threads_error = e
+
+        for doc, future in thread_inserts:
+            self._settle(future, threads_error)
+            if not isinstance(threads_error, Exception):
+                self._counters["threads_written"] += 1
+                _invalidate_counts(("threads", doc["admin_id"], None))
+        for doc, future in conversations:
+            # The end_timestamp update rides on the threads write; the conversation itself is durable
+            self._settle(future, conversations_error)
+            if not isinstance(conversations_error, Exception):
+                self._counters["conversations_written"] += 1
+                _invalidate_counts(("conversations", doc["admin_id"], doc["thread_id"]))
+
+        self._counters["flushes"] += 1
+        self._last_flush_ms = round((time.perf_counter() - start) * 1000, 2)
+        logger.debug(f"Flushed {len(batch)} MongoDB writes in {self._last_flush_ms} ms")
+
+    def _settle(self, future, error):
+        if future.done():
+            return
+        if isinstance(error, Exception):
+            logger.error(f"Buffered MongoDB write failed: {str(error)}")
+            self._counters["failed"] += 1
+            future.set_exception(error)
+            future.exception()  # Callers that did not wait for the flush have had the error logged above
+        else:
+            future.set_result(True)
+
+    def stats(self):
+        """Buffer depth and flush counters for monitoring"""
+        return {
+            **self._counters,
+            "depth": len(self._pending),
+            "max_depth": self._max_depth,
+            "last_flush_ms": self._last_flush_ms,
+            "running": self.running,
+        }
+
+
+mongo_write_buffer = MongoWriteBuffer(
+    flush_interval=config.MONGO_WRITE_FLUSH_INTERVAL,
+    max_batch=config.MONGO_WRITE_MAX_BATCH
+)
+
+
+# ✅ Function to insert a new thread
+async def insert_into_threads_async(thread_id: str, admin_id: str, chat_name: str, wait: bool = None):
+    """
+    Insert a new thread. While the write buffer runs the insert is queued and awaited
+    until flushed, so failures reach the caller; with `wait` (default
+    MONGO_WRITE_WAIT_FOR_FLUSH) off the call returns at once and a failed write is only logged.
+    """
+    doc = _build_thread_doc(thread_id, admin_id, chat_name)
+    if mongo_write_buffer.running:
+        flushed = mongo_write_buffer.add_thread(doc)
+        if config.MONGO_WRITE_WAIT_FOR_FLUSH if wait is None else wait:
+            await flushed
+        return
+    await threads_collection().insert_one(doc)
+    _invalidate_counts(("threads", admin_id, None))
+
+
+# ✅ Function to insert a conversation and update the thread's end_timestamp
+async def insert_into_conversations_async(thread_id: str, admin_id: str, conversation: dict, wait: bool = None):
+    """Insert a conversation and move its thread's end_timestamp; buffered like insert_into_threads_async"""
+    doc = _build_conversation_doc(thread_id, admin_id, conversation)
+    if mongo_write_buffer.running:
+        flushed = mongo_write_buffer.add_conversation(doc)
+        if config.MONGO_WRITE_WAIT_FOR_FLUSH if wait is None else wait:
+            await flushed
+        return
+    await conversations_collection().insert_one(doc)
+    _invalidate_counts(("conversations", admin_id, thread_id))
 
     # ✅ Update thread's end_timestamp when a new conversation is added
-    threads_collection.update_one(
+    await threads_collection().update_one(
         {"thread_id": thread_id},
         {"$set": {"end_timestamp": conversation["timestamp"]}}
     )
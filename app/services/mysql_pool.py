@@ -0,0 +1,234 @@
+import threading
+import time
+import logging
+from collections import deque
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(RuntimeError):
+    """Raised when no connection becomes available within the acquire timeout"""
+
+
+class _PooledConnection:
+    """Bookkeeping for a single connection owned by the pool"""
+
+    __slots__ = ("connection", "created_at", "last_used")
+
+    def __init__(self, connection):
+        now = time.monotonic()
+        self.connection = connection
+        self.created_at = now
+        self.last_used = now
+
+
+class MySQLConnectionPool:
+    """
+    Bounded, thread-safe pool of MySQL connections.
+
+    Connections are created lazily through `connect` up to `max_size`. Idle connections
+    older than `idle_timeout` (beyond the `min_size` kept warm) or older than
+    `max_lifetime` are closed instead of being handed out, and every borrowed
+    connection is pinged first when `health_check` is enabled.
+    """
+
+    def __init__(self, connect, min_size=1, max_size=10, idle_timeout=300,
+                 max_lifetime=3600, acquire_timeout=10, health_check=True):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self._connect = connect
+        self.min_size = max(0, min(min_size, max_size))
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+        self.acquire_timeout = acquire_timeout
+        self.health_check = health_check
+
+        self._cond = threading.Condition()
+        self._idle = deque()
+        self._in_use = {}
+        self._pending = 0  # connections being opened outside the lock
+
+        # Monitoring counters
+        self._created = 0
+        self._closed = 0
+        self._health_check_failures = 0
+        self._acquired = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    @property
+    def size(self):
+        """Total connections owned by the pool (idle + in use + being opened)"""
+        return len(self._idle) + len(self._in_use) + self._pending
+
+    def _is_expired(self, entry, now):
+        return bool(self.max_lifetime) and now - entry.created_at >= self.max_lifetime
+
+    def _close(self, connection):
+        try:
+            connection.close()
+        except Exception as e:
+            logger.debug(f"Error closing pooled MySQL connection: {str(e)}")
+        with self._cond:
+            self._closed += 1
+
+    def _is_healthy(self, connection):
+        try:
+            connection.ping(reconnect=False)
+            return True
+        except Exception as e:
+            logger.warning(f"Discarding unhealthy pooled MySQL connection: {str(e)}")
+            with self._cond:
+                self._health_check_failures += 1
+            return False
+
+    def _reap_idle(self, now):
+        """Pop idle connections past their idle timeout or lifetime; caller holds the lock"""
+        stale = []
+        keep = deque()
+        # Walk from most to least recently used so the warm `min_size` set survives
+        while self._idle:
+            entry = self._idle.pop()
+            idle_for = now - entry.last_used
+            too_idle = (self.idle_timeout and idle_for >= self.idle_timeout
+                        and len(keep) + len(self._in_use) >= self.min_size)
+            if self._is_expired(entry, now) or too_idle:
+                stale.append(entry.connection)
+            else:
+                keep.appendleft(entry)
+        self._idle = keep
+        return stale
+
+    def acquire(self):
+        """Borrow a connection, opening a new one if the pool has room"""
+        start = time.monotonic()
+        deadline = start + self.acquire_timeout if self.acquire_timeout else None
+        waited = False
+
+        while True:
+            entry = None
+            create = False
+            with self._cond:
+                stale = self._reap_idle(time.monotonic())
+                while True:
+                    if self._idle:
+                        # Most recently used first keeps the warm set small
+                        entry = self._idle.pop()
+                        break
+                    if self.size < self.max_size:
+                        self._pending += 1
+                        create = True
+                        break
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        self._timeouts += 1
+                        self._record_wait(time.monotonic() - start, waited)
+                        raise PoolTimeoutError(
+                            f"Timed out after {self.acquire_timeout}s waiting for a MySQL connection "
+                            f"(pool size {self.max_size})"
+                        )
+                    waited = True
+                    self._cond.wait(remaining)
+
+            for connection in stale:
+                self._close(connection)
+
+            if create:
+                try:
+                    connection = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._pending -= 1
+                        self._cond.notify()
+                    raise
+                entry = _PooledConnection(connection)
+                with self._cond:
+                    self._pending -= 1
+                    self._created += 1
+            elif self.health_check and not self._is_healthy(entry.connection):
+                self._close(entry.connection)
+                continue
+
+            with self._cond:
+                self._in_use[id(entry.connection)] = entry
+                self._acquired += 1
+                self._record_wait(time.monotonic() - start, waited)
+            return entry.connection
+
+    def _record_wait(self, elapsed, waited):
+        """Track time spent blocked on a full pool; caller holds the lock"""
+        if not waited:
+            return
+        self._waits += 1
+        self._total_wait += elapsed
+        self._max_wait = max(self._max_wait, elapsed)
+
+    def release(self, connection):
+        """Return a borrowed connection to the pool"""
+        with self._cond:
+            entry = self._in_use.pop(id(connection), None)
+            if entry is None:
+                logger.warning("Attempted to release a connection not owned by the pool")
+                return
+            now = time.monotonic()
+            if not self._is_expired(entry, now):
+                entry.last_used = now
+                self._idle.append(entry)
+                self._cond.notify()
+                return
+            self._cond.notify()
+        self._close(connection)
+
+    def discard(self, connection):
+        """Close a borrowed connection instead of returning it (e.g. after a MySQL error)"""
+        with self._cond:
+            self._in_use.pop(id(connection), None)
+            self._cond.notify()
+        self._close(connection)
+
+    def warm_up(self):
+        """Open connections until `min_size` are available"""
+        with self._cond:
+            missing = self.min_size - self.size
+        opened = []
+        try:
+            for _ in range(max(0, missing)):
+                opened.append(self.acquire())
+        finally:
+            for connection in opened:
+                self.release(connection)
+
+    def close_all(self):
+        """Close every idle connection and forget borrowed ones"""
+        with self._cond:
+            idle = [entry.connection for entry in self._idle]
+            in_use = [entry.connection for entry in self._in_use.values()]
+            self._idle.clear()
+            self._in_use.clear()
+            self._cond.notify_all()
+        for connection in idle + in_use:
+            self._close(connection)
+
+    def stats(self):
+        """Snapshot of pool usage for monitoring"""
+        with self._cond:
+            return {
+                "size": self.size,
+                "in_use": len(self._in_use),
+                "idle": len(self._idle),
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "created": self._created,
+                "closed": self._closed,
+                "acquired": self._acquired,
+                "health_check_failures": self._health_check_failures,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+                "total_wait_seconds": round(self._total_wait, 6),
+                "avg_wait_seconds": round(self._total_wait / self._waits, 6) if self._waits else 0.0,
+                "max_wait_seconds": round(self._max_wait, 6),
+            }
@@ -0,0 +1,297 @@
+"""
+Gemini prompt templates split into a static prefix and a per-call dynamic part.
+
+The static part (instructions and schema) is compiled once and handed to the model as its
+system instruction, or, where the API accepts it, stored server-side as Gemini cached
+content, so each call sends only the dynamic part: the thread history and the question.
+Token usage reported by Gemini is recorded per call in `prompt_metrics`.
+"""
+import time
+import asyncio
+import logging
+import threading
+from datetime import timedelta
+import google.generativeai as genai
+from google.generativeai import caching
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Static instructions and schema; identical for every request, so sent once as the system instruction
+SQL_SCHEMA_PROMPT = (
+    "You are an AI assistant that converts user queries into SQL queries. "
+    "You must follow these rules:\n"
+    "- Return 'unwanted' if the query is not about loans, banking, or EMIs.\n"
+    "- Return 'restricted' if the query tries to generate non-SELECT queries.\n"
+    "- Return 'sensitive' if it asks for CVV,password,pan and aadhar details or database structure and other database structure related questions.\n"
+    "- Otherwise, generate a SQL query for the 'loan', 'emi', 'users' and 'user_information' table.\n\n"
+    "you are supposed to understand the schema and return the columns which wll be used for plotting graph later on"
+    "UNDERSTAND ALL THE REQUIRED COLUMNS FROM THE TABLES TO GENERATE A PERFECT SQL QUERY PLEASE"
+
+    """We have four tables: loan, emi, user_information, users.
+
+The loan table contains the following columns:
+
+- loan_id (Primary Key)
+- disbursed_date (Only populated if status is 'DISBURSED', otherwise NULL)
+- interest (Interest rate in percentage)
+- principal (Principal loan amount)
+- status (ENUM: 'DISBURSED', 'PENDING', 'REJECTED')
+- tenure (Loan tenure in months)
+- type (ENUM: 'HOME_LOAN', 'CAR_LOAN', 'PERSONAL_LOAN', 'EDUCATION_LOAN', 'PROFESSIONAL_LOAN')
+- user_id (Should never be disclosed)
+
+The emi table contains the following columns:
+
+- emi_id (Primary Key)
+- due_date (Date when EMI is due)
+- emi_amount (EMI amount for that month)
+- late_fee (Late fee applicable if status is 'OVERDUE', otherwise NULL)
+- status (ENUM: 'PAID', 'OVERDUE', 'PENDING')
+- loan_id (Foreign Key referencing loan.loan_id)
+
+The users table has the following
+ - user_id (Primary key)
+ -address (address of the user)
+ -email (email of the user)
+ - is_active (whether his account is active or not, id is_active =1 then it is active)
+ - name  (name of the user)
+ - phone_number (phone number of the user)
+
+ The user_information table has the following
+ -id (user_information id , no need to disclose this)
+ -aadhar (aadhar number)
+ -cibil (CIBIL SCORE of the user)
+ -income_type ('UNEMPLOYED','SALARIED','SELF_EMPLOYED',)
+ -pan (pan number of the user)
+ -salary (salary of the user)
+ -user_id (foreign key referencing users.users.user_id)
+
+The loan table and emi table are connected through loan_id.
+If anything to do with disbursed_date or emi_date is asked, use MONTH(), YEAR(), DAY() etc and MySQL specific syntax and not other SQL formats. Always give in one line only even if it has multiple lines.
+
+Now, generate an SQL query based on this schema. Ensure that user_id is never disclosed in the query results and only the sql query is given with ; at the end. 
+"""
+)
+
+
+class PromptTemplate:
+    """A static prefix plus a str.format template for the fields that change per call"""
+
+    def __init__(self, static_prefix: str, dynamic_template: str):
+        self.static_prefix = static_prefix
+        self.dynamic_template = dynamic_template
+        self._render = dynamic_template.format  # Bound once; rendering touches only the dynamic part
+
+    def render(self, **fields) -> str:
+        return self._render(**fields)
+
+
+SQL_PROMPT = PromptTemplate(
+    SQL_SCHEMA_PROMPT,
+    "## Previous User Queries:\n"
+    "{context}\n\n"
+    "## New User Query:\n"
+    "{question}\n"
+)
+
+
+def render_sql_prompt(user_input: str, previous_queries: list) -> str:
+    """The per-call part of the SQL generation prompt: thread history and the new question"""
+    context_text = "\n".join(previous_queries) if previous_queries else "No previous queries."
+    return SQL_PROMPT.render(context=context_text, question=user_input)
+
+
+class CachedPromptModel:
+    """
+    Gemini model bound to a static system instruction.
+
+    `model` carries the instruction as system_instruction and always works. prepare()
+    additionally stores the instruction as Gemini cached content on `cache_model_name`, a
+    pinned model version as context caching requires; while that cache is live, current()
+    returns a model reading from it, so the prefix is neither re-sent nor billed at the full
+    input rate. The cache is recreated in the background shortly before it expires. A
+    prefix shorter than `min_cache_tokens` (the model's minimum for cached content) turns
+    caching off for good on the first prepare(); if the API refuses the cache otherwise,
+    the system-instruction model is used and creation is retried after `retry_interval`
+    seconds, doubling on each failure up to `cache_ttl`.
+    """
+
+    def __init__(self, model_name: str, system_instruction: str, use_context_cache: bool = True,
+                 cache_ttl: float = 3600, refresh_margin: float = 60, create_timeout: float = 10,
+                 cache_model_name: str = None, retry_interval: float = 60, min_cache_tokens: int = 4096):
+        self.model_name = model_name
+        self.cache_model_name = cache_model_name or model_name
+        self.system_instruction = system_instruction
+        self.use_context_cache = use_context_cache
+        self.cache_ttl = cache_ttl
+        self.refresh_margin = refresh_margin
+        self.create_timeout = create_timeout
+        self.retry_interval = retry_interval
+        self.min_cache_tokens = min_cache_tokens
+        self.prefix_tokens = None
+        self.model = genai.GenerativeModel(model_name, system_instruction=system_instruction)
+        self._cache = None
+        self._cached_model = None
+        self._expires_at = 0.0
+        self._refreshing = None
+        self._failures = 0
+        self._retry_at = 0.0
+
+    def _create_cache(self):
+        cache = caching.CachedContent.create(
+            model=self.cache_model_name,
+            display_name="adminbot-sql-schema",
+            system_instruction=self.system_instruction,
+            ttl=timedelta(seconds=self.cache_ttl)
+        )
+        return cache, genai.GenerativeModel.from_cached_content(cache)
+
+    def _count_prefix_tokens(self) -> int:
+        return genai.GenerativeModel(self.cache_model_name).count_tokens(self.system_instruction).total_tokens
+
+    async def prepare(self):
+        """Create (or recreate) the context cache; returns whether cached content is in use"""
+        if not self.use_context_cache:
+            return False
+        try:
+            if self.prefix_tokens is None:
+                self.prefix_tokens = await asyncio.wait_for(asyncio.to_thread(self._count_prefix_tokens),
+                                                            self.create_timeout)
+                if self.prefix_tokens < self.min_cache_tokens:
+                    self.use_context_cache = False
+                    logger.info(f"Prompt prefix is {self.prefix_tokens} tokens, below the {self.min_cache_tokens} "
+                                f"{self.cache_model_name} caches; sending it as a system instruction")
+                    return False
+            cache, cached_model = await self._create_within_timeout()
+        except Exception as e:
+            # A cache that is still live keeps serving; either way, try again later
+            delay = min(self.retry_interval * 2 ** self._failures, self.cache_ttl)
+            self._failures += 1
+            self._retry_at = time.time() + delay
+            logger.warning(f"Gemini context caching unavailable for {self.cache_model_name}, "
+                           f"sending the prompt prefix as a system instruction; retrying in {delay:.0f}s: {str(e)}")
+            return False
+        previous, self._cache = self._cache, cache
+        self._cached_model = cached_model
+        self._expires_at = time.time() + self.cache_ttl
+        self._failures = 0
+        self._retry_at = 0.0
+        logger.info(f"Created Gemini context cache {cache.name} for {self.cache_model_name}")
+        if previous is not None:
+            await asyncio.to_thread(self._delete, previous)
+        return True
+
+    async def _create_within_timeout(self):
+        """
+        _create_cache bounded by create_timeout. The SDK call cannot be interrupted, so a create
+        that finishes after the timeout (or after close() cancelled it) has its cache deleted
+        rather than left billing until its TTL.
+        """
+        create = asyncio.ensure_future(asyncio.to_thread(self._create_cache))
+        try:
+            return await asyncio.wait_for(asyncio.shield(create), self.create_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            create.add_done_callback(self._discard_late_cache)
+            raise
+
+    def _discard_late_cache(self, create):
+        if create.cancelled() or create.exception() is not None:
+            return
+        cache, _ = create.result()
+        logger.info(f"Deleting Gemini context cache {cache.name} created after the timeout")
+        asyncio.get_running_loop().run_in_executor(None, self._delete, cache)
+
+    def current(self):
+        """The model to call: the cached-content one while its cache is live, else `model`"""
+        if self._cached_model is not None:
+            remaining = self._expires_at - time.time()
+            if remaining > 0:
+                if remaining < self.refresh_margin:
+                    self.refresh_in_background()
+                return self._cached_model
+            self._cached_model = None
+        if self.use_context_cache:
+            self.refresh_in_background()
+        return self.model
+
+    def refresh_in_background(self):
+        """Start prepare() as a task unless one is running or the retry backoff has not elapsed"""
+        if not self.use_context_cache or time.time() < self._retry_at:
+            return
+        if self._refreshing is not None and not self._refreshing.done():
+            return
+        try:
+            self._refreshing = asyncio.get_running_loop().create_task(self.prepare())
+        except RuntimeError:
+            pass  # No event loop (sync caller); the next async call refreshes it
+
+    @staticmethod
+    def _delete(cache):
+        try:
+            cache.delete()
+        except Exception as e:
+            logger.warning(f"Failed to delete Gemini context cache {cache.name}: {str(e)}")
+
+    async def close(self):
+        """Delete the server-side cache so it stops accruing storage"""
+        if self._refreshing is not None:
+            self._refreshing.cancel()
+        if self._cache is not None:
+            await asyncio.to_thread(self._delete, self._cache)
+        self._cache = None
+        self._cached_model = None
+
+    def stats(self):
+        return {
+            "model": self.model_name,
+            "cache_model": self.cache_model_name,
+            "context_cache": self._cached_model is not None,
+            "cache_failures": self._failures,
+            "prefix_tokens": self.prefix_tokens,
+            "cache_expires_in": max(0, round(self._expires_at - time.time())) if self._cached_model else 0,
+        }
+
+
+class PromptMetrics:
+    """Per-call Gemini token usage (prompt, cached prefix, output) aggregated by call site"""
+
+    FIELDS = ("prompt_token_count", "cached_content_token_count", "candidates_token_count", "total_token_count")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def record(self, name: str, response):
+        """Record a response's usage_metadata; returns the counts, or None if it has none"""
+        usage = getattr(response, "usage_metadata", None)
+        if usage is None:
+            return None
+        counts = {}
+        for field in self.FIELDS:
+            value = getattr(usage, field, 0)
+            counts[field] = value if isinstance(value, int) else 0
+        with self._lock:
+            call = self._calls.setdefault(name, {"calls": 0, "last": {}, **{field: 0 for field in self.FIELDS}})
+            call["calls"] += 1
+            call["last"] = counts
+            for field in self.FIELDS:
+                call[field] += counts[field]
+        logger.debug(f"{name} token usage: {counts}")
+        return counts
+
+    def stats(self):
+        """Totals, per-call means and the latest call's counts per call site"""
+        with self._lock:
+            return {
+                name: {
+                    "calls": call["calls"],
+                    "last": call["last"],
+                    **{f"{field}_total": call[field] for field in self.FIELDS},
+                    **{f"{field}_mean": round(call[field] / call["calls"], 1) for field in self.FIELDS},
+                }
+                for name, call in self._calls.items()
+            }
+
+
+prompt_metrics = PromptMetrics()
@@ -1,95 +1,65 @@
 import logging
 import google.generativeai as genai
 from app.core.config import config
-from app.services.redis_service import get_last_n_conversations
+from app.services.redis_service import get_last_n_conversations_async, async_redis_client
+from app.services.sql_cache import SQLTranslationCache
+from app.services.prompt_templates import SQL_SCHEMA_PROMPT, CachedPromptModel, render_sql_prompt, prompt_metrics
 
 # Configure Gemini API
 genai.configure(api_key=config.GEMINI_API_KEY)
-model = genai.GenerativeModel("gemini-2.0-flash")
+
+# The schema prompt goes out once as a system instruction / cached content; calls send only history + question
+sql_prompt_model = CachedPromptModel(
+    "gemini-2.0-flash",
+    SQL_SCHEMA_PROMPT,
+    use_context_cache=config.GEMINI_CONTEXT_CACHE,
+    cache_ttl=config.GEMINI_CONTEXT_CACHE_TTL,
+    cache_model_name=config.GEMINI_CACHE_MODEL,
+    retry_interval=config.GEMINI_CONTEXT_CACHE_RETRY,
+    min_cache_tokens=config.GEMINI_CACHE_MIN_TOKENS
+)
+model = sql_prompt_model.model
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-def generate_sql(user_input: str, thread_id: str = None) -> str:
-    """Generates SQL query using Gemini AI with context from previous user queries."""
-
-    # Fetch last 5 user queries from Redis (if available)
-    previous_queries = get_last_n_conversations(thread_id, n=5) if thread_id else []
-
-    # Construct context string
-    context_text = "\n".join(previous_queries) if previous_queries else "No previous queries."
-
-    # Instruction for Gemini
-    system_instruction = (
-        "You are an AI assistant that converts user queries into SQL queries. "
-        "You must follow these rules:\n"
-        "- Return 'unwanted' if the query is not about loans, banking, or EMIs.\n"
-        "- Return 'restricted' if the query tries to generate non-SELECT queries.\n"
-        "- Return 'sensitive' if it asks for CVV,password,pan and aadhar details or database structure and other database structure related questions.\n"
-        "- Otherwise, generate a SQL query for the 'loan', 'emi', 'users' and 'user_information' table.\n\n"
-        "you are supposed to understand the schema and return the columns which wll be used for plotting graph later on"
-        "UNDERSTAND ALL THE REQUIRED COLUMNS FROM THE TABLES TO GENERATE A PERFECT SQL QUERY PLEASE"
-
-        """We have four tables: loan, emi, user_information, users.
+# Cache of question -> SQL translations; keys embed a hash of SQL_SCHEMA_PROMPT
+sql_translation_cache = SQLTranslationCache(
+    async_redis_client,
+    SQL_SCHEMA_PROMPT,
+    ttl=config.SQL_CACHE_TTL,
+    max_local_entries=config.SQL_CACHE_LRU_SIZE,
+    fuzzy=config.SQL_CACHE_FUZZY,
+    enabled=config.SQL_CACHE_ENABLED
+)
 
-The loan table contains the following columns:
+def clean_sql_output(text: str) -> str:
+    """Strips markdown fences and the sql language tag from a Gemini response."""
+    return text.strip().strip("`").strip("sql").strip()
 
-- loan_id (Primary Key)
-- disbursed_date (Only populated if status is 'DISBURSED', otherwise NULL)
-- interest (Interest rate in percentage)
-- principal (Principal loan amount)
-- status (ENUM: 'DISBURSED', 'PENDING', 'REJECTED')
-- tenure (Loan tenure in months)
-- type (ENUM: 'HOME_LOAN', 'CAR_LOAN', 'PERSONAL_LOAN', 'EDUCATION_LOAN', 'PROFESSIONAL_LOAN')
-- user_id (Should never be disclosed)
+async def generate_sql_async(user_input: str, thread_id: str = None) -> str:
+    """Generates a SQL query with Gemini, using the thread's previous queries as context."""
 
-The emi table contains the following columns:
+    previous_queries = await get_last_n_conversations_async(thread_id, n=5) if thread_id else []
 
-- emi_id (Primary Key)
-- due_date (Date when EMI is due)
-- emi_amount (EMI amount for that month)
-- late_fee (Late fee applicable if status is 'OVERDUE', otherwise NULL)
-- status (ENUM: 'PAID', 'OVERDUE', 'PENDING')
-- loan_id (Foreign Key referencing loan.loan_id)
+    cached_sql = await sql_translation_cache.get(user_input, previous_queries)
+    if cached_sql is not None:
+        logging.info(f"SQL cache hit for user input: {user_input}")
+        return cached_sql
 
-The users table has the following
- - user_id (Primary key)
- -address (address of the user)
- -email (email of the user)
- - is_active (whether his account is active or not, id is_active =1 then it is active)
- - name  (name of the user)
- - phone_number (phone number of the user)
+    prompt = render_sql_prompt(user_input, previous_queries)
 
- The user_information table has the following
- -id (user_information id , no need to disclose this)
- -aadhar (aadhar number)
- -cibil (CIBIL SCORE of the user)
- -income_type ('UNEMPLOYED','SALARIED','SELF_EMPLOYED',)
- -pan (pan number of the user)
- -salary (salary of the user)
- -user_id (foreign key referencing users.users.user_id)
-
-The loan table and emi table are connected through loan_id.
-If anything to do with disbursed_date or emi_date is asked, use MONTH(), YEAR(), DAY() etc and MySQL specific syntax and not other SQL formats. Always give in one line only even if it has multiple lines.
-
-Now, generate an SQL query based on this schema. Ensure that user_id is never disclosed in the query results and only the sql query is given with ; at the end. 
-"""
-        "## Previous User Queries:\n"
-        f"{context_text}\n\n"
-        "## New User Query:\n"
-        f"{user_input}\n"
-    )
-
-    # Log the context being sent to Gemini
     logging.info(f"Thread ID: {thread_id}")
     logging.info(f"User Input: {user_input}")
     logging.info(f"Previous Queries (Context): {previous_queries}")
 
-    # Generate SQL query using Gemini
-    response = model.generate_content([system_instruction])
-    output = response.text.strip().strip("`").strip("sql").strip()
+    response = await sql_prompt_model.current().generate_content_async([prompt])
+    prompt_metrics.record("sql_generation", response)
+    output = clean_sql_output(response.text)
 
-    # Log the generated SQL query
     logging.info(f"Generated SQL: {output}")
 
+    # Cached once the caller confirms the query passed the guard and ran
+    sql_translation_cache.hold(user_input, previous_queries, output)
+
     return output
@@ -0,0 +1,82 @@
+import logging
+from app.core.config import config
+from app.services.redis_service import async_redis_client
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "login_attempts:"
+
+
+class RateLimitExceeded(Exception):
+    """Too many login attempts; retry_after is the number of seconds until the window resets"""
+
+    def __init__(self, scope: str, retry_after: int):
+        super().__init__(f"Too many login attempts for this {scope}")
+        self.scope = scope
+        self.retry_after = retry_after
+
+
+class LoginRateLimiter:
+    """
+    Fixed-window login attempt counters in Redis, one per email and one per client IP.
+
+    Every attempt is counted before the password is checked, so a login storm is turned
+    away before it reaches bcrypt. Both counters are bumped in one MULTI/EXEC round trip;
+    a successful login clears the email's counter. If Redis is unreachable attempts are
+    let through with a warning, as with the other Redis-backed checks.
+    """
+
+    def __init__(self, max_per_email: int = 5, max_per_ip: int = 20, window: int = 300, redis_client=None):
+        self.max_per_email = max_per_email
+        self.max_per_ip = max_per_ip
+        self.window = window
+        self.redis_client = redis_client or async_redis_client
+        self._counters = {"attempts": 0, "limited": 0, "errors": 0}
+
+    @staticmethod
+    def _email_key(email: str) -> str:
+        return f"{KEY_PREFIX}email:{email.strip().lower()}"
+
+    @staticmethod
+    def _ip_key(ip: str) -> str:
+        return f"{KEY_PREFIX}ip:{ip}"
+
+    async def hit(self, email: str, ip: str):
+        """Count an attempt; raises RateLimitExceeded if either counter is over its limit"""
+        self._counters["attempts"] += 1
+        checks = ((self._email_key(email), self.max_per_email, "email"), (self._ip_key(ip), self.max_per_ip, "IP"))
+        try:
+            async with self.redis_client.pipeline(transaction=True) as pipe:
+                for key, _, _ in checks:
+                    pipe.set(key, 0, ex=self.window, nx=True)  # Opens the window on the first attempt
+                    pipe.incr(key)
+                    pipe.ttl(key)
+                results = await pipe.execute()
+        except Exception as e:
+            self._counters["errors"] += 1
+            logger.warning(f"Login rate limit check failed: {str(e)}")
+            return
+        for i, (_, limit, scope) in enumerate(checks):
+            attempts, ttl = results[3 * i + 1], results[3 * i + 2]
+            if attempts > limit:
+                self._counters["limited"] += 1
+                raise RateLimitExceeded(scope, ttl if ttl > 0 else self.window)
+
+    async def reset(self, email: str):
+        """Forget an email's attempts after it logs in successfully"""
+        try:
+            await self.redis_client.delete(self._email_key(email))
+        except Exception as e:
+            logger.warning(f"Failed to reset login attempts: {str(e)}")
+
+    def stats(self):
+        """Attempt counters for monitoring"""
+        return {**self._counters, "window": self.window}
+
+
+login_rate_limiter = LoginRateLimiter(
+    max_per_email=config.LOGIN_MAX_ATTEMPTS_PER_EMAIL,
+    max_per_ip=config.LOGIN_MAX_ATTEMPTS_PER_IP,
+    window=config.LOGIN_RATE_WINDOW
+)
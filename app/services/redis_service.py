@@ -1,5 +1,6 @@
 import redis
-import json
+import redis.asyncio as aioredis
+from app.core import json_codec
 from app.core.config import config
 
 # Initialize Redis client using values from config
@@ -10,64 +11,70 @@ redis_client = redis.Redis(
     decode_responses=True
 )
 
-def insert_into_redis(data,ttl=10800):
-    thread_id = data["thread_id"]
-    thread_key = f"admin_thread:{thread_id}"
+# Async client used by the request pipeline so Redis I/O never blocks the event loop
+async_redis_client = aioredis.Redis(
+    host=config.REDIS_HOST,
+    port=config.REDIS_PORT,
+    db=config.REDIS_DB,
+    decode_responses=True
+)
 
-    # Store thread details in a hash
+# Key patterns covered by the memory report
+MEMORY_REPORT_PATTERNS = ("admin_thread:*", "excel:*", "otp:*", "revoked_token:*", "login_attempts:*")
+
+def _queue_bounded_push(pipe, key, values, max_length, ttl):
+    """Queue RPUSH + LTRIM so the list keeps only its newest max_length entries"""
+    if values:
+        pipe.rpush(key, *values)
+        pipe.ltrim(key, -max_length, -1)
+    pipe.expire(key, ttl)
+
+def _queue_thread_insert(pipe, data, ttl):
+    """
+    Queue the commands that write a thread on a pipeline: the thread hash, the newest
+    THREAD_CACHE_MAX_CONVERSATIONS full records, and the query-only context window.
+    """
+    thread_key = f"admin_thread:{data['thread_id']}"
+    conversations = data.get("conversations", [])
+
+    # Store thread details in a hash; the count covers conversations trimmed from the list
     thread_data = {
         "thread_id": data["thread_id"],
         "admin_id": data["admin_id"],
         "chat_name": data["chat_name"],
+        "conversation_count": data.get("conversation_count", len(conversations)),
     }
-    redis_client.hset(thread_key, mapping=thread_data)
-    redis_client.expire(thread_key, ttl)  # Set TTL
-
-    # Store conversations in a list
-    for conversation in data.get("conversations", []):
-        redis_client.rpush(f"{thread_key}:conversations", json.dumps(conversation))
-    redis_client.expire(f"{thread_key}:conversations", ttl)  # Set TTL for conversations list
-
-    return {"message": "Chat thread inserted successfully", "thread_id": thread_id}
-
-def append_conversation(thread_id: str, conversation: dict, ttl=10800):
-    key = f"admin_thread:{thread_id}:conversations"
-
-    # Convert dictionary to JSON string before storing in Redis
-    conversation_json = json.dumps(conversation)
-
-    # Append the conversation to the Redis list
-    redis_client.rpush(key, conversation_json)
-
-    # Refresh TTL when a new conversation is added
-    redis_client.expire(key, ttl)  
-    redis_client.expire(f"admin_thread:{thread_id}", ttl)  
-
-    # Get updated conversation count
-    conversation_count = redis_client.llen(key)
-
-    return {
-        "status": "success",
-        "message": f"Conversation appended successfully to thread {thread_id}.",
-        "total_conversations": conversation_count
-    }
-
-# Function to get a record from Redis based on thread_id
-def get_from_redis(thread_id):
+    pipe.hset(thread_key, mapping=thread_data)
+    pipe.expire(thread_key, ttl)  # Set TTL
+
+    _queue_bounded_push(pipe, f"{thread_key}:conversations",
+                        [json_codec.dumps(conversation) for conversation in conversations],
+                        config.THREAD_CACHE_MAX_CONVERSATIONS, ttl)
+    _queue_bounded_push(pipe, f"{thread_key}:context",
+                        [conversation["query"] for conversation in conversations if "query" in conversation],
+                        config.THREAD_CONTEXT_SIZE, ttl)
+
+def _queue_conversation_append(pipe, thread_id, conversation, ttl):
+    """Queue the writes for an appended conversation; the first reply is the thread's conversation count"""
     thread_key = f"admin_thread:{thread_id}"
-
-    # Check if the key exists
-    if not redis_client.exists(thread_key):
-        return {"message": "Thread not found"}, 404
-
-    thread_details = redis_client.hgetall(f"admin_thread:{thread_id}")
-    conversations = redis_client.lrange(f"admin_thread:{thread_id}:conversations", 0, -1)
-
-
+    pipe.hincrby(thread_key, "conversation_count", 1)
+    # Refresh TTL when a new conversation is added
+    pipe.expire(thread_key, ttl)
+    _queue_bounded_push(pipe, f"{thread_key}:conversations", [json_codec.dumps(conversation)],
+                        config.THREAD_CACHE_MAX_CONVERSATIONS, ttl)
+    _queue_bounded_push(pipe, f"{thread_key}:context",
+                        [conversation["query"]] if "query" in conversation else [],
+                        config.THREAD_CONTEXT_SIZE, ttl)
+
+def _conversation_window(page: int = None, limit: int = None):
+    """LRANGE bounds for a page of conversations, newest first; the whole list when not paging"""
+    if page is None or limit is None:
+        return 0, -1
+    return -(page * limit), -((page - 1) * limit) - 1
+
+def _build_thread_data(thread_details, total, raw_conversations, excel_paths, page=None, limit=None):
     conversations_list = []
-    for conv in conversations:
-        conv_data = json.loads(conv)
-        excel_path = get_excel_path(conv_data["conversation_id"])
+    for conv_data, excel_path in zip(raw_conversations, excel_paths):
         if excel_path:
             conv_data["excel_path"] = excel_path
         conversations_list.append(conv_data)
@@ -76,6 +83,14 @@ def get_from_redis(thread_id):
         "thread_details": thread_details,
         "conversations": conversations_list
     }
+    if page is not None and limit is not None:
+        conversations_list.reverse()  # Latest first, like get_conversations_by_thread
+        thread_data.update({
+            "page": page,
+            "limit": limit,
+            "total_pages": (total + limit - 1) // limit,
+            "total_conversations": total
+        })
     return thread_data
 
 # Function to store Excel file path in Redis
@@ -90,12 +105,110 @@ def get_excel_path(conversation_id: str):
     """Retrieve the Excel file path from Redis."""
     return redis_client.get(f"excel:{conversation_id}")
 
-def get_last_n_conversations(thread_id: str, n: int = 5):
-    """Fetch last N user queries from Redis for a given thread."""
-    key = f"admin_thread:{thread_id}:conversations"
+def _queries_from_records(conversations):
+    records = (json_codec.loads(conv) for conv in conversations)
+    return [record["query"] for record in records if "query" in record]
+
+async def insert_into_redis_async(data, ttl=10800):
+    """Write a thread and its conversations in one MULTI/EXEC, so readers never see a thread without them"""
+    thread_id = data["thread_id"]
+
+    async with async_redis_client.pipeline(transaction=True) as pipe:
+        _queue_thread_insert(pipe, data, ttl)
+        await pipe.execute()
+
+    return {"message": "Chat thread inserted successfully", "thread_id": thread_id}
+
+async def append_conversation_async(thread_id: str, conversation: dict, ttl=10800):
+    """
+    Append a conversation to a cached thread; returns the thread's new conversation count.
+    The thread hash is WATCHed so the append only lands while it exists: once it has expired,
+    nothing is written (HINCRBY would start a count at 1) and the count comes back as None,
+    meaning the thread has to be re-cached from MongoDB.
+    """
+    thread_key = f"admin_thread:{thread_id}"
 
-    # Get last `n` conversations from Redis
-    conversations = redis_client.lrange(key, -n, -1)
+    async def queue_append(pipe):
+        if await pipe.exists(thread_key):
+            pipe.multi()
+            _queue_conversation_append(pipe, thread_id, conversation, ttl)
+
+    replies = await async_redis_client.transaction(queue_append, thread_key)
+    if not replies:
+        return {
+            "status": "missing",
+            "message": f"Thread {thread_id} is not cached.",
+            "total_conversations": None
+        }
+    return {
+        "status": "success",
+        "message": f"Conversation appended successfully to thread {thread_id}.",
+        "total_conversations": replies[0]
+    }
+
+async def get_last_n_conversations_async(thread_id: str, n: int = 5):
+    """
+    Fetch last N user queries from Redis for a given thread (at most THREAD_CONTEXT_SIZE).
+    Reads the query-only context window; threads cached before it existed fall back to the full records.
+    """
+    queries = await async_redis_client.lrange(f"admin_thread:{thread_id}:context", -n, -1)
+    if queries:
+        return queries
+    return _queries_from_records(await async_redis_client.lrange(f"admin_thread:{thread_id}:conversations", -n, -1))
+
+async def get_from_redis_async(thread_id, page: int = None, limit: int = None):
+    """
+    Fetch a thread and its conversations in two round trips: one pipeline for the hash,
+    list length and LRANGE window, and one MGET for the conversations' Excel paths.
+    Pass page/limit to read a window of the list (newest first) instead of all of it.
+    """
+    thread_key = f"admin_thread:{thread_id}"
+    start, end = _conversation_window(page, limit)
+
+    async with async_redis_client.pipeline(transaction=False) as pipe:
+        pipe.hgetall(thread_key)
+        pipe.llen(f"{thread_key}:conversations")
+        pipe.lrange(f"{thread_key}:conversations", start, end)
+        thread_details, total, conversations = await pipe.execute()
+
+    # A missing hash comes back empty, so this doubles as the existence check
+    if not thread_details:
+        return {"message": "Thread not found"}, 404
 
-    # Extract only user questions (queries) from conversations
-    return [json.loads(conv)["query"] for conv in conversations if "query" in json.loads(conv)]
+    conversations = [json_codec.loads(conv) for conv in conversations]
+    excel_paths = await async_redis_client.mget([f"excel:{conv['conversation_id']}" for conv in conversations]) if conversations else []
+    return _build_thread_data(thread_details, total, conversations, excel_paths, page, limit)
+
+async def memory_report(patterns=MEMORY_REPORT_PATTERNS, batch_size: int = 500, redis_client=None):
+    """
+    Memory used per key pattern, from SCAN + pipelined MEMORY USAGE. Walks the whole keyspace
+    matching each pattern, so it is meant for occasional diagnostics, not per-request use.
+    """
+    redis_client = redis_client or async_redis_client
+    report = {}
+    for pattern in patterns:
+        stats = {"keys": 0, "bytes": 0, "largest_key": None, "largest_bytes": 0}
+        batch = []
+
+        async def flush():
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for key in batch:
+                    pipe.memory_usage(key)
+                sizes = await pipe.execute()
+            for key, size in zip(batch, sizes):
+                if size is None:
+                    continue  # Expired between SCAN and MEMORY USAGE
+                stats["keys"] += 1
+                stats["bytes"] += size
+                if size > stats["largest_bytes"]:
+                    stats["largest_key"], stats["largest_bytes"] = key, size
+            batch.clear()
+
+        async for key in redis_client.scan_iter(match=pattern, count=batch_size):
+            batch.append(key)
+            if len(batch) >= batch_size:
+                await flush()
+        if batch:
+            await flush()
+        report[pattern] = stats
+    return report
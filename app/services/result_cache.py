@@ -0,0 +1,210 @@
+import re
+import json
+import base64
+import hashlib
+import logging
+import datetime
+import threading
+from decimal import Decimal
+from app.services.extract_tables_service import extract_tables_and_columns
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Tables the generated SQL may read; results touching anything else are not cached
+CACHEABLE_TABLES = ("loan", "emi", "users", "user_information")
+
+# Quoted literals/identifiers are kept verbatim; everything else is case- and whitespace-folded
+_SQL_QUOTED = re.compile(r"""('(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.|"")*"|`[^`]*`)""")
+_WHITESPACE = re.compile(r"\s+")
+_PUNCT_SPACING = re.compile(r"\s*([(),=<>])\s*")
+
+
+def canonicalize_sql(sql: str) -> str:
+    """Normalize SQL text so formatting-only differences map to the same cache key"""
+    parts = []
+    for i, part in enumerate(_SQL_QUOTED.split(sql.strip().rstrip(";").strip())):
+        if i % 2:
+            parts.append(part)
+        else:
+            part = _WHITESPACE.sub(" ", part.lower())
+            parts.append(_PUNCT_SPACING.sub(r"\1", part))
+    return "".join(parts).strip()
+
+
+def parse_table_ttls(spec: str) -> dict:
+    """Parse a "table=seconds,table=seconds" TTL specification"""
+    ttls = {}
+    for item in (spec or "").split(","):
+        if "=" not in item:
+            continue
+        table, seconds = item.split("=", 1)
+        ttls[table.strip().lower()] = int(seconds)
+    return ttls
+
+
+def _encode_value(obj):
+    """Tag MySQL types that JSON cannot represent so they round-trip exactly"""
+    if isinstance(obj, Decimal):
+        return {"__decimal__": str(obj)}
+    if isinstance(obj, datetime.datetime):
+        return {"__datetime__": obj.isoformat()}
+    if isinstance(obj, datetime.date):
+        return {"__date__": obj.isoformat()}
+    if isinstance(obj, datetime.time):
+        return {"__time__": obj.isoformat()}
+    if isinstance(obj, datetime.timedelta):
+        return {"__timedelta__": obj.total_seconds()}
+    if isinstance(obj, (bytes, bytearray)):
+        return {"__bytes__": base64.b64encode(bytes(obj)).decode("ascii")}
+    raise TypeError(f"Type not serializable: {type(obj)}")
+
+
+def _decode_value(obj):
+    if len(obj) == 1:
+        (tag, value), = obj.items()
+        if tag == "__decimal__":
+            return Decimal(value)
+        if tag == "__datetime__":
+            return datetime.datetime.fromisoformat(value)
+        if tag == "__date__":
+            return datetime.date.fromisoformat(value)
+        if tag == "__time__":
+            return datetime.time.fromisoformat(value)
+        if tag == "__timedelta__":
+            return datetime.timedelta(seconds=value)
+        if tag == "__bytes__":
+            return base64.b64decode(value)
+    return obj
+
+
+def encode_results(results) -> str:
+    return json.dumps(results, default=_encode_value, separators=(",", ":"))
+
+
+def decode_results(payload: str):
+    return json.loads(payload, object_hook=_decode_value)
+
+
+class QueryResultCache:
+    """
+    Redis cache of SELECT results keyed on canonicalized SQL.
+
+    Each entry records which of CACHEABLE_TABLES it was read from (via
+    extract_tables_and_columns) in a per-table index set, so `invalidate_table`
+    can drop every result that depends on a table. An entry lives for the
+    shortest TTL among its tables, and results whose encoded size exceeds
+    `max_bytes` are never stored.
+    """
+
+    def __init__(self, redis_client, table_ttls=None, default_ttl: int = 300, max_bytes: int = 1048576,
+                 enabled: bool = True, prefix: str = "result_cache"):
+        self.redis_client = redis_client
+        self.table_ttls = dict(table_ttls or {})
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.prefix = prefix
+
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "stores": 0, "skipped_oversize": 0,
+                          "skipped_uncacheable": 0, "invalidations": 0, "errors": 0}
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def make_key(self, sql: str, max_rows: int = None) -> str:
+        digest = hashlib.sha256(canonicalize_sql(sql).encode("utf-8")).hexdigest()
+        return f"{self.prefix}:{digest}:{max_rows or 'all'}"
+
+    def _table_index_key(self, table: str) -> str:
+        return f"{self.prefix}:table:{table}"
+
+    def tables_for(self, sql: str):
+        """Return the cacheable tables a query reads, or None if it must not be cached"""
+        try:
+            tables, _ = extract_tables_and_columns(sql)
+        except Exception as e:
+            logger.debug(f"Could not extract tables for result cache: {str(e)}")
+            return None
+        tables = [table.split(".")[-1].strip("`") for table in tables]
+        if not tables or any(table not in CACHEABLE_TABLES for table in tables):
+            return None
+        return tables
+
+    def ttl_for(self, tables) -> int:
+        return min(self.table_ttls.get(table, self.default_ttl) for table in tables)
+
+    async def get(self, sql: str, max_rows: int = None):
+        """Return cached (rows, truncated) for a query, or None on a miss"""
+        if not self.enabled:
+            return None
+        try:
+            payload = await self.redis_client.get(self.make_key(sql, max_rows))
+        except Exception as e:
+            logger.warning(f"Result cache lookup failed: {str(e)}")
+            self._count("errors")
+            return None
+        if payload is None:
+            self._count("misses")
+            return None
+        self._count("hits")
+        entry = decode_results(payload)
+        return entry["rows"], entry["truncated"]
+
+    async def set(self, sql: str, results, truncated: bool = False, max_rows: int = None) -> bool:
+        """Cache query rows (capped at max_rows); returns False when the result is not cacheable"""
+        if not self.enabled:
+            return False
+        tables = self.tables_for(sql)
+        if tables is None:
+            self._count("skipped_uncacheable")
+            return False
+
+        payload = encode_results({"rows": results, "truncated": truncated})
+        if len(payload.encode("utf-8")) > self.max_bytes:
+            logger.info(f"Result too large to cache ({len(payload)} bytes > {self.max_bytes})")
+            self._count("skipped_oversize")
+            return False
+
+        key = self.make_key(sql, max_rows)
+        ttl = self.ttl_for(tables)
+        try:
+            async with self.redis_client.pipeline(transaction=True) as pipe:
+                pipe.set(key, payload, ex=ttl)
+                for table in tables:
+                    index_key = self._table_index_key(table)
+                    pipe.sadd(index_key, key)
+                    pipe.expire(index_key, self.table_ttls.get(table, self.default_ttl))
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Result cache store failed: {str(e)}")
+            self._count("errors")
+            return False
+        self._count("stores")
+        return True
+
+    async def invalidate_table(self, table: str) -> int:
+        """Drop every cached result that depends on `table`; returns the number of entries removed"""
+        index_key = self._table_index_key(table.lower())
+        keys = await self.redis_client.smembers(index_key)
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            if keys:
+                pipe.delete(*keys)
+            pipe.delete(index_key)
+            await pipe.execute()
+        self._count("invalidations", len(keys))
+        logger.info(f"Invalidated {len(keys)} cached results for table {table}")
+        return len(keys)
+
+    def stats(self):
+        """Hit/miss counters for monitoring"""
+        with self._lock:
+            counters = dict(self._counters)
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            **counters,
+            "hit_ratio": round(counters["hits"] / lookups, 4) if lookups else 0.0,
+            "max_bytes": self.max_bytes,
+        }
@@ -1,7 +1,10 @@
 import logging
 import json
 import google.generativeai as genai
+from google.api_core.exceptions import GoogleAPIError
 from app.core.config import config
+from app.services.result_summary import needs_summary, summarize_results
+from app.services.prompt_templates import prompt_metrics
 import datetime
 from decimal import Decimal
 
@@ -20,35 +23,66 @@ def serialize_dates(obj):
     raise TypeError(f"Type not serializable: {type(obj)}")
 
 
-<<<<<<< HEAD
-def format_results(results):
-=======
-def format_results(results,user_inp):
->>>>>>> 0459ae63127c91fd90e7a1fde195160c91d537d6
-    # logging.info(results)
+def build_format_prompt(results, user_inp=None, truncated=False):
+    """Build the Gemini prompt that turns query results into a readable insight."""
+    if needs_summary(results, config.FORMAT_SUMMARY_THRESHOLD):
+        # Describe large results by column statistics and a sample instead of every row
+        summary = summarize_results(results, config.FORMAT_SAMPLE_ROWS, config.FORMAT_TOP_K)
+        formatted_data = (
+            f"(The result has {len(results)} rows, summarized as per-column statistics over all of them "
+            f"plus a sample of representative rows in columnar form. Base totals and averages on the "
+            f"statistics, not the sample.)\n\n{json.dumps(summary, separators=(',', ':'), default=serialize_dates)}"
+        )
+    else:
+        formatted_data = json.dumps(results, indent=2, default=serialize_dates)  # Convert non-serializable types
+    if truncated:
+        formatted_data = (
+            f"(Only the first {len(results)} rows are shown; the full result has more rows. "
+            f"Mention that the data is partial.)\n\n{formatted_data}"
+        )
+    if user_inp:
+        return f"Based on the user question \n\n {user_inp} Format the following database query results into a readable sentence with insights which help to grow their business :\n\n{formatted_data}"
+    return f"Format the following database query results into a readable sentence with insights:\n\n{formatted_data}"
+
+
+async def format_results_async(results, user_inp=None, truncated=False):
     """Formats SQL results into readable text using Gemini."""
     try:
-        formatted_data = json.dumps(results, indent=2, default=serialize_dates)  # Convert non-serializable types
-        # logging.info(formatted_data)
-<<<<<<< HEAD
-        prompt = f"Format the following database query results into a readable sentence with insights:\n\n{formatted_data}"
-        response = model.generate_content(prompt)
+        prompt = build_format_prompt(results, user_inp, truncated)
+        response = await model.generate_content_async(prompt)
+        prompt_metrics.record("format", response)
         logging.info(f"Chatbot response: {response.text.strip()}")
-=======
-        prompt = f"Based on the user question \n\n {user_inp} Format the following database query results into a readable sentence with insights which help to grow their business :\n\n{formatted_data}"
-        response = model.generate_content(prompt)
-        logging.info(f"Chatbot response: {response.text.strip()}")
-        
->>>>>>> 0459ae63127c91fd90e7a1fde195160c91d537d6
         return response.text.strip()
     except json.JSONDecodeError as e:
         logging.error(f"JSON formatting error: {e}")
         return "Error processing data for insights."
 
-    except genai.types.APIError as e:
+    except GoogleAPIError as e:
         logging.error(f"Gemini API error: {e}")
         return "AI service is currently unavailable. Please try again later."
 
     except Exception as e:
         logging.error(f"Unexpected error formatting results: {e}", exc_info=True)
         return "An unexpected error occurred while generating insights."
+
+
+async def stream_format_results(results, user_inp=None, truncated=False):
+    """Yield the formatted insight chunk by chunk as Gemini streams it."""
+    try:
+        prompt = build_format_prompt(results, user_inp, truncated)
+        response = await model.generate_content_async(prompt, stream=True)
+        async for chunk in response:
+            if chunk.parts:  # .text raises on chunks without parts (e.g. the final usage-only chunk)
+                yield chunk.text
+        prompt_metrics.record("format", response)  # Usage arrives with the last chunk
+    except json.JSONDecodeError as e:
+        logging.error(f"JSON formatting error: {e}")
+        yield "Error processing data for insights."
+
+    except GoogleAPIError as e:
+        logging.error(f"Gemini API error: {e}")
+        yield "AI service is currently unavailable. Please try again later."
+
+    except Exception as e:
+        logging.error(f"Unexpected error formatting results: {e}", exc_info=True)
+        yield "An unexpected error occurred while generating insights."
@@ -0,0 +1,87 @@
+import datetime
+from decimal import Decimal
+from collections import Counter
+
+# Text columns with more distinct values than this are reported as high-cardinality
+_MAX_TRACKED_DISTINCT = 10000
+
+
+def _kind(value):
+    if isinstance(value, bool):
+        return "text"
+    if isinstance(value, (int, float, Decimal)):
+        return "numeric"
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return "date"
+    return "text"
+
+
+def _number(value):
+    """Keep integers exact and round everything else for a compact prompt"""
+    if isinstance(value, int) or (isinstance(value, Decimal) and value == value.to_integral_value()):
+        return int(value)
+    return round(float(value), 4)
+
+
+def column_stats(results, column, top_k: int = 5):
+    """Compute count/null/min/max/mean (numeric), min/max (dates) or top-k values (text) for a column"""
+    values = [row.get(column) for row in results]
+    present = [value for value in values if value is not None]
+    stats = {"count": len(present), "nulls": len(values) - len(present)}
+    if not present:
+        stats["type"] = "empty"
+        return stats
+
+    kind = _kind(present[0])
+    typed = [value for value in present if _kind(value) == kind]
+    stats["type"] = kind
+    if kind == "numeric":
+        total = sum(float(value) for value in typed)
+        stats.update(min=_number(min(typed)), max=_number(max(typed)),
+                     mean=round(total / len(typed), 4), sum=_number(total))
+    elif kind == "date":
+        # Dates and datetimes are not mutually comparable; compare as ISO strings
+        ordered = sorted(value.isoformat() for value in typed)
+        stats.update(min=ordered[0], max=ordered[-1])
+    else:
+        counts = Counter()
+        for value in typed:
+            counts[value if isinstance(value, str) else str(value)] += 1
+            if len(counts) > _MAX_TRACKED_DISTINCT:
+                break
+        stats["distinct"] = len(counts) if len(counts) <= _MAX_TRACKED_DISTINCT else f">{_MAX_TRACKED_DISTINCT}"
+        stats["top"] = [[value, count] for value, count in counts.most_common(top_k)]
+    return stats
+
+
+def sample_rows(results, size: int = 20):
+    """Pick evenly spaced rows, always including the first and last"""
+    if len(results) <= size:
+        return list(results)
+    if size <= 1:
+        return [results[0]]
+    step = (len(results) - 1) / (size - 1)
+    return [results[round(i * step)] for i in range(size)]
+
+
+def to_columnar(rows, columns):
+    """Encode row dictionaries as {"columns": [...], "rows": [[...], ...]} to avoid repeating keys"""
+    return {"columns": columns, "rows": [[row.get(column) for column in columns] for row in rows]}
+
+
+def summarize_results(results, sample_size: int = 20, top_k: int = 5):
+    """
+    Describe a result set in bounded size: row count, per-column statistics and a
+    columnar sample of representative rows.
+    """
+    columns = list(results[0].keys()) if results else []
+    return {
+        "row_count": len(results),
+        "column_stats": {column: column_stats(results, column, top_k) for column in columns},
+        "sample": to_columnar(sample_rows(results, sample_size), columns),
+    }
+
+
+def needs_summary(results, max_rows: int = 50) -> bool:
+    """Small result sets are sent to the model verbatim"""
+    return isinstance(results, list) and len(results) > max_rows and isinstance(results[0], dict)
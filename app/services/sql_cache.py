@@ -0,0 +1,195 @@
+import re
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+_NON_WORD = re.compile(r"[^a-z0-9_]+")
+_WHITESPACE = re.compile(r"\s+")
+
+# Words that do not change which SQL a question maps to; only dropped in fuzzy mode
+FUZZY_STOPWORDS = frozenset({
+    "a", "an", "the", "of", "for", "in", "on", "me", "us", "my", "our", "please", "kindly",
+    "show", "give", "get", "tell", "display", "fetch", "find", "what", "whats", "is", "are",
+    "was", "were", "can", "could", "you", "i", "want", "to", "know", "s",
+})
+
+# Words ending in "s" that are not plurals
+_NOT_PLURAL = frozenset({"this", "his", "has", "does", "status", "basis", "analysis", "bonus", "previous", "various"})
+
+
+def normalize_question(question: str, fuzzy: bool = False) -> str:
+    """
+    Normalize a natural-language question for cache lookups.
+
+    Exact mode only lowercases, collapses whitespace and drops trailing punctuation.
+    Fuzzy mode additionally strips punctuation and filler words and singularizes simple
+    plurals, so "Show me total disbursed loans this month?" and "total disbursed loan this
+    month" share a key. Token order and repeats are kept, since they change the query
+    ("loans after 2023 before 2024" is not "loans before 2023 after 2024").
+    """
+    text = _WHITESPACE.sub(" ", question.lower()).strip().rstrip("?.! ")
+    if not fuzzy:
+        return text
+
+    tokens = []
+    for token in _NON_WORD.split(text):
+        if not token or token in FUZZY_STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss") and token not in _NOT_PLURAL:
+            token = token[:-1]
+        tokens.append(token)
+    return " ".join(tokens)
+
+
+def _hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class SQLTranslationCache:
+    """
+    Two-tier cache of natural-language question -> generated SQL.
+
+    An in-process LRU sits in front of Redis; both tiers expire entries after `ttl`
+    seconds. Keys combine the normalized question, a hash of the thread context
+    (previous queries) and a hash of the schema prompt, so editing the prompt
+    automatically invalidates every cached translation.
+
+    Freshly generated SQL is only held until `confirm` reports that it passed the
+    guard and ran, so a translation that fails validation or execution is never served.
+    """
+
+    def __init__(self, redis_client, schema_prompt: str, ttl: int = 3600, max_local_entries: int = 512,
+                 fuzzy: bool = False, enabled: bool = True, prefix: str = "nl2sql"):
+        self.redis_client = redis_client
+        self.ttl = ttl
+        self.max_local_entries = max_local_entries
+        self.fuzzy = fuzzy
+        self.enabled = enabled
+        self.prefix = prefix
+        self.schema_version = _hash(schema_prompt)[:16]
+
+        self._local = OrderedDict()
+        self._pending = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"local_hits": 0, "redis_hits": 0, "misses": 0, "stores": 0, "errors": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def make_key(self, question: str, previous_queries=None) -> str:
+        """Build the cache key for a question asked with the given thread context"""
+        normalized = normalize_question(question, self.fuzzy)
+        context = "\n".join(normalize_question(q, self.fuzzy) for q in previous_queries or [])
+        mode = "fuzzy" if self.fuzzy else "exact"
+        return f"{self.prefix}:{self.schema_version}:{mode}:{_hash(context)[:16]}:{_hash(normalized)}"
+
+    def _get_local(self, key):
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+            return value
+
+    def _set_local(self, key, value, ttl):
+        with self._lock:
+            self._local[key] = (value, time.monotonic() + ttl)
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_local_entries:
+                self._local.popitem(last=False)
+
+    async def get(self, question: str, previous_queries=None):
+        """Return the cached SQL for a question, or None on a miss"""
+        if not self.enabled:
+            return None
+        key = self.make_key(question, previous_queries)
+
+        value = self._get_local(key)
+        if value is not None:
+            self._count("local_hits")
+            return value
+
+        try:
+            value = await self.redis_client.get(key)
+        except Exception as e:
+            logger.warning(f"SQL cache lookup failed: {str(e)}")
+            self._count("errors")
+            value = None
+
+        if value is None:
+            self._count("misses")
+            return None
+
+        self._count("redis_hits")
+        self._set_local(key, value, self.ttl)
+        return value
+
+    async def set(self, question: str, previous_queries, sql: str):
+        """Store a generated SQL translation in both tiers"""
+        if not self.enabled or not sql:
+            return
+        await self._store(self.make_key(question, previous_queries), sql)
+
+    def hold(self, question: str, previous_queries, sql: str):
+        """Remember a generated translation until `confirm(sql)`; held entries are never served"""
+        if not self.enabled or not sql:
+            return
+        key = self.make_key(question, previous_queries)
+        with self._lock:
+            keys = self._pending.pop(sql, set())
+            keys.add(key)
+            self._pending[sql] = keys
+            while len(self._pending) > self.max_local_entries:
+                self._pending.popitem(last=False)
+
+    async def confirm(self, sql: str):
+        """Cache the translations held for `sql` now that it is known to be good"""
+        with self._lock:
+            keys = self._pending.pop(sql, None)
+        for key in keys or ():
+            await self._store(key, sql)
+
+    async def _store(self, key, sql):
+        self._set_local(key, sql, self.ttl)
+        try:
+            await self.redis_client.set(key, sql, ex=self.ttl)
+            self._count("stores")
+        except Exception as e:
+            logger.warning(f"SQL cache store failed: {str(e)}")
+            self._count("errors")
+
+    async def clear(self):
+        """Drop every cached translation for the current schema version"""
+        with self._lock:
+            self._local.clear()
+            self._pending.clear()
+        async for key in self.redis_client.scan_iter(match=f"{self.prefix}:{self.schema_version}:*"):
+            await self.redis_client.delete(key)
+
+    def stats(self):
+        """Hit/miss counters for monitoring"""
+        with self._lock:
+            counters = dict(self._counters)
+            local_entries = len(self._local)
+            pending = len(self._pending)
+        hits = counters["local_hits"] + counters["redis_hits"]
+        lookups = hits + counters["misses"]
+        return {
+            **counters,
+            "hits": hits,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "local_entries": local_entries,
+            "pending": pending,
+            "fuzzy": self.fuzzy,
+            "schema_version": self.schema_version,
+        }
@@ -0,0 +1,231 @@
+import logging
+import threading
+from dataclasses import dataclass
+from app.core.config import config
+from app.services.sql_parser import tokenize
+from app.services.database import explain_sql_query_async
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Statements and clauses that write, lock or touch the filesystem; never allowed in generated SQL
+FORBIDDEN_KEYWORDS = frozenset({
+    "update", "delete", "drop", "alter", "create", "truncate", "grant", "revoke", "rename", "call",
+    "handler", "load", "lock", "unlock", "into", "outfile", "dumpfile", "shutdown", "kill", "set",
+})
+# Keywords that are only forbidden as statements, not when called as functions (REPLACE(str, ...))
+FORBIDDEN_STATEMENTS = frozenset({"insert", "replace"})
+FORBIDDEN_FUNCTIONS = frozenset({"sleep", "benchmark", "load_file", "get_lock", "release_lock"})
+SET_OPERATORS = frozenset({"union", "intersect", "except"})
+
+
+class UnsafeQueryError(ValueError):
+    """Raised when generated SQL is not a single read-only SELECT"""
+
+
+class QueryTooExpensiveError(UnsafeQueryError):
+    """Raised when EXPLAIN estimates more rows examined than the configured budget"""
+
+    def __init__(self, estimated_rows: int, budget: int):
+        super().__init__(f"Query would examine ~{estimated_rows} rows (budget {budget})")
+        self.estimated_rows = estimated_rows
+        self.budget = budget
+
+
+@dataclass(frozen=True)
+class GuardedQuery:
+    sql: str  # statement to execute, with LIMIT and MAX_EXECUTION_TIME applied
+    validated: str  # the validated statement without guard additions
+    max_rows: int  # row cap to execute with; the injected LIMIT is one more so truncation is detectable
+    estimated_rows: int = None
+    limit_added: bool = False
+    downgraded: bool = False
+
+
+def estimate_rows_examined(plan) -> int:
+    """
+    Estimate rows examined from EXPLAIN output. Tables within one SELECT are joined as
+    nested loops: each is probed once per row surviving the tables before it (rows x
+    filtered%). Separate SELECTs (subqueries, derived tables, unions) add up.
+    """
+    total = 0
+    probes = {}
+    for row in plan:
+        select_id = row.get("id")
+        examined = probes.get(select_id, 1) * max(int(row.get("rows") or 1), 1)
+        total += examined
+        filtered = row.get("filtered")
+        probes[select_id] = max(examined * (float(filtered) / 100 if filtered is not None else 1), 1)
+    return int(total)
+
+
+def _top_level(tokens):
+    """Yield (index, token) for tokens outside parentheses"""
+    depth = 0
+    for index, token in enumerate(tokens):
+        if token.kind == "punct" and token.value == "(":
+            depth += 1
+        elif token.kind == "punct" and token.value == ")":
+            depth -= 1
+        elif depth == 0:
+            yield index, token
+
+
+class SQLGuard:
+    """
+    Pre-execution checks for generated SQL.
+
+    `validate` rejects anything but a single read-only SELECT. `prepare` also adds or
+    clamps the LIMIT and adds a MAX_EXECUTION_TIME optimizer hint, then runs
+    EXPLAIN; queries estimated to examine more than `max_rows_examined` rows are
+    rejected, or in "downgrade" mode run with a smaller LIMIT and a shorter time limit.
+    """
+
+    def __init__(self, max_rows: int = 10000, max_rows_examined: int = 5000000, mode: str = "reject",
+                 max_execution_ms: int = 30000, downgrade_rows: int = 1000, downgrade_execution_ms: int = 5000,
+                 explain: bool = True, explain_fn=None):
+        if mode not in ("reject", "downgrade"):
+            raise ValueError(f"Unknown SQL guard mode: {mode}")
+        self.max_rows = max_rows
+        self.max_rows_examined = max_rows_examined
+        self.mode = mode
+        self.max_execution_ms = max_execution_ms
+        self.downgrade_rows = downgrade_rows
+        self.downgrade_execution_ms = downgrade_execution_ms
+        self.explain = explain
+        self.explain_fn = explain_fn or explain_sql_query_async
+
+        self._lock = threading.Lock()
+        self._counters = {"checked": 0, "rejected_unsafe": 0, "rejected_cost": 0, "downgraded": 0,
+                          "limits_added": 0, "explain_errors": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def validate(self, sql: str) -> str:
+        """Return the statement without trailing semicolons or comments, or raise UnsafeQueryError"""
+        all_tokens = tokenize(sql, comments=True)
+        # MySQL executes /*! ... */ and applies /*+ ... */, so the checks below would not see
+        # what runs; generated SQL has no use for block comments, and hints are the guard's to add
+        if any(t.kind == "comment" and t.value.startswith("/*") for t in all_tokens):
+            raise UnsafeQueryError("Block comments are not allowed")
+        all_tokens = [t for t in all_tokens if t.kind != "comment"]
+        end = next((i for i, t in enumerate(all_tokens) if t.kind == "punct" and t.value == ";"), len(all_tokens))
+        if any(not (t.kind == "punct" and t.value == ";") for t in all_tokens[end:]):
+            raise UnsafeQueryError("Multiple statements are not allowed")
+        tokens = all_tokens[:end]
+
+        first = next((t for t in tokens if not (t.kind == "punct" and t.value == "(")), None)
+        if first is None:
+            raise UnsafeQueryError("Empty query")
+        if not (first.kind == "ident" and first.value in ("select", "with")):
+            raise UnsafeQueryError(f"Only SELECT statements are allowed, got {first.value.upper()}")
+        if first.value == "with" and not any(t.kind == "ident" and t.value == "select" for _, t in _top_level(tokens)):
+            raise UnsafeQueryError("WITH must be followed by a SELECT")
+
+        for index, token in enumerate(tokens):
+            if token.kind != "ident":
+                continue
+            nxt = tokens[index + 1] if index + 1 < len(tokens) else None
+            is_call = nxt is not None and nxt.kind == "punct" and nxt.value == "("
+            if token.value in FORBIDDEN_KEYWORDS or (token.value in FORBIDDEN_STATEMENTS and not is_call):
+                raise UnsafeQueryError(f"{token.value.upper()} is not allowed")
+            if token.value in FORBIDDEN_FUNCTIONS and is_call:
+                raise UnsafeQueryError(f"{token.value.upper()}() is not allowed")
+
+        # Cut after the last token so trailing comments cannot swallow an appended LIMIT
+        return sql[tokens[0].start:tokens[-1].end]
+
+    def apply_limits(self, sql: str, limit: int, execution_ms: int):
+        """
+        Add a MAX_EXECUTION_TIME hint and append a LIMIT, or clamp the existing one to `limit`.
+        Parenthesised and UNION/INTERSECT/EXCEPT queries are wrapped in an outer SELECT first,
+        so the hint and the LIMIT cover the whole statement. Returns (sql, limit_added)
+        """
+        tokens = tokenize(sql)
+        parenthesised = bool(tokens) and tokens[0].kind == "punct" and tokens[0].value == "("
+        if parenthesised or any(t.kind == "ident" and t.value in SET_OPERATORS for _, t in _top_level(tokens)):
+            sql = f"SELECT * FROM ({sql}) AS guarded_query"
+            tokens = tokenize(sql)
+        top = list(_top_level(tokens))
+
+        limit_added = False
+        limit_at = next((i for i, t in top if t.kind == "ident" and t.value == "limit"), None)
+        if limit and limit_at is None:
+            sql = f"{sql} LIMIT {int(limit)}"
+            limit_added = True
+        elif limit:
+            # LIMIT count, LIMIT offset, count or LIMIT count OFFSET offset
+            count_at = limit_at + 1
+            if count_at + 1 < len(tokens) and tokens[count_at + 1].kind == "punct" and tokens[count_at + 1].value == ",":
+                count_at += 2
+            count = tokens[count_at] if count_at < len(tokens) else None
+            if count is not None and not (count.kind == "number" and count.value.isdigit() and int(count.value) <= limit):
+                sql = f"{sql[:count.start]}{int(limit)}{sql[count.end:]}"
+
+        # The SELECT precedes the LIMIT, so its offset is unchanged by the edits above
+        select = next((t for _, t in top if t.kind == "ident" and t.value == "select"), None)
+        if select is not None and execution_ms:
+            position = select.start + len("select")
+            sql = f"{sql[:position]} /*+ MAX_EXECUTION_TIME({int(execution_ms)}) */{sql[position:]}"
+        elif execution_ms:
+            logger.debug("No top-level SELECT to attach MAX_EXECUTION_TIME to")
+        return sql, limit_added
+
+    async def prepare(self, sql: str) -> GuardedQuery:
+        """Validate, bound and cost-check a generated query before it is executed"""
+        self._count("checked")
+        try:
+            validated = self.validate(sql)
+        except UnsafeQueryError:
+            self._count("rejected_unsafe")
+            raise
+
+        max_rows = self.max_rows
+        execution_ms = self.max_execution_ms
+        estimated = None
+        downgraded = False
+        if self.explain:
+            try:
+                estimated = estimate_rows_examined(await self.explain_fn(validated))
+            except Exception as e:
+                # The query itself will surface the same error when it runs
+                logger.warning(f"EXPLAIN failed, skipping cost check: {str(e)}")
+                self._count("explain_errors")
+            if estimated is not None and estimated > self.max_rows_examined:
+                if self.mode == "reject":
+                    logger.warning(f"Rejected query estimated at {estimated} rows examined: {validated[:100]}")
+                    self._count("rejected_cost")
+                    raise QueryTooExpensiveError(estimated, self.max_rows_examined)
+                logger.warning(f"Downgrading query estimated at {estimated} rows examined: {validated[:100]}")
+                self._count("downgraded")
+                max_rows = min(max_rows, self.downgrade_rows)
+                execution_ms = self.downgrade_execution_ms
+                downgraded = True
+
+        guarded_sql, limit_added = self.apply_limits(validated, max_rows + 1, execution_ms)
+        if limit_added:
+            self._count("limits_added")
+        return GuardedQuery(guarded_sql, validated, max_rows, estimated, limit_added, downgraded)
+
+    def for_export(self, validated: str) -> str:
+        """Bound a validated statement for a background export, which may read up to EXPORT_MAX_ROWS"""
+        sql, _ = self.apply_limits(validated, config.EXPORT_MAX_ROWS + 1, config.EXPORT_MAX_EXECUTION_MS)
+        return sql
+
+    def stats(self):
+        """Guard counters for monitoring"""
+        with self._lock:
+            return {**self._counters, "mode": self.mode, "max_rows_examined": self.max_rows_examined}
+
+
+sql_guard = SQLGuard(
+    max_rows=config.SQL_MAX_ROWS,
+    max_rows_examined=config.SQL_GUARD_MAX_ROWS_EXAMINED,
+    mode=config.SQL_GUARD_MODE,
+    max_execution_ms=config.SQL_MAX_EXECUTION_MS,
+    downgrade_rows=config.SQL_GUARD_DOWNGRADE_ROWS,
+    downgrade_execution_ms=config.SQL_GUARD_DOWNGRADE_EXECUTION_MS,
+    explain=config.SQL_GUARD_EXPLAIN
+)
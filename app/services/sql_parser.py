@@ -0,0 +1,419 @@
+import re
+from functools import lru_cache
+from dataclasses import dataclass
+from app.core.config import config
+
+
+class SQLParseError(ValueError):
+    """Raised when a query cannot be tokenized or its parentheses do not balance"""
+
+
+# MySQL lexical grammar, most frequent alternatives first; comments must precede the
+# operators they start with. "--" only opens a comment when followed by whitespace, as in
+# MySQL. Double-quoted text is a string literal (ANSI_QUOTES is off)
+_TOKEN_RE = re.compile(r"""
+    (?P<ws>\s+)
+  | (?P<ident>[A-Za-z_@$][A-Za-z0-9_$@]*)
+  | (?P<number>(?:\d+\.\d*|\.\d+|\d+)(?:[eE][+-]?\d+)?)
+  | (?P<comment>--(?=\s|$)[^\n]*|\#[^\n]*|/\*.*?\*/)
+  | (?P<string>'(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.|"")*")
+  | (?P<quoted>`(?:[^`]|``)*`)
+  | (?P<op><=>|<=|>=|<>|!=|:=|\|\||&&|[-+*/%=<>!~^&|])
+  | (?P<punct>[(),.;?])
+  | (?P<other>.)
+""", re.VERBOSE | re.DOTALL)
+
+# Reserved words that are never column references when unquoted
+KEYWORDS = frozenset({
+    "select", "from", "where", "and", "or", "not", "null", "is", "in", "like", "between", "case",
+    "when", "then", "else", "end", "as", "distinct", "all", "exists", "interval", "true", "false",
+    "asc", "desc", "on", "using", "join", "inner", "left", "right", "outer", "cross", "natural",
+    "straight_join", "group", "by", "order", "having", "limit", "offset", "union", "intersect",
+    "except", "div", "mod", "xor", "regexp", "rlike", "escape", "collate", "binary", "separator",
+    "over", "partition", "rows", "range", "preceding", "following", "unbounded", "current", "row",
+    "with", "recursive", "rollup", "window", "for", "into", "unknown", "current_date", "current_time",
+    "current_timestamp", "localtime", "localtimestamp", "utc_date", "utc_time", "utc_timestamp",
+    "sql_calc_found_rows", "sql_no_cache", "high_priority", "use", "force", "ignore", "index", "key",
+})
+
+# Aggregate and window functions; a select item that calls one is reported as an aggregate
+AGGREGATE_FUNCTIONS = frozenset({
+    "count", "sum", "avg", "min", "max", "std", "stddev", "stddev_pop", "stddev_samp", "stdev",
+    "variance", "var_pop", "var_samp", "bit_and", "bit_or", "bit_xor", "first", "last",
+    "group_concat", "string_agg", "array_agg", "json_arrayagg", "json_objectagg", "listagg",
+    "median", "percentile", "mode", "rank", "dense_rank", "row_number", "ntile", "lead", "lag",
+    "percent_rank", "cume_dist", "first_value", "last_value", "nth_value",
+})
+
+# Keywords that are also function names, e.g. LEFT(name, 3)
+_FUNCTION_KEYWORDS = ("left", "right", "mod", "if", "insert", "replace", "values")
+_CLAUSES = frozenset({"select", "from", "where", "group", "having", "order", "limit", "offset", "window", "for", "into"})
+_SET_OPERATORS = frozenset({"union", "intersect", "except"})
+_JOINS = frozenset({"join", "straight_join"})
+
+
+class _Token:
+    __slots__ = ("kind", "value", "start", "end")
+
+    def __init__(self, kind, value, start=0, end=0):
+        self.kind = kind
+        self.value = value
+        self.start = start  # offsets in the original text
+        self.end = end
+
+    @property
+    def text(self):
+        return f"`{self.value}`" if self.kind == "quoted" and self.value in KEYWORDS else self.value
+
+
+class _Group:
+    """A parenthesized run of tokens"""
+    __slots__ = ("items",)
+
+    def __init__(self, items):
+        self.items = items
+
+
+@dataclass(frozen=True)
+class ParsedQuery:
+    """
+    Structured view of a SELECT statement.
+
+    `tables` lists every base table read anywhere in the statement (CTE names
+    excluded); the remaining fields describe the outermost SELECT.
+    `aliases` holds (alias, target) pairs for tables and select items.
+    """
+    tables: tuple
+    columns: tuple
+    aliases: tuple
+    aggregates: tuple
+    group_by: tuple
+    filters: tuple
+    having: tuple = ()
+    ctes: tuple = ()
+    subqueries: int = 0
+
+    @property
+    def alias_map(self):
+        return dict(self.aliases)
+
+
+def tokenize(sql: str, comments: bool = False):
+    """
+    Split SQL into tokens; identifiers and keywords are lowercased, literals kept verbatim.
+    Comments are dropped unless `comments` is set.
+    """
+    tokens = []
+    for match in _TOKEN_RE.finditer(sql):
+        kind = match.lastgroup
+        value = match.group()
+        if kind == "ws" or (kind == "comment" and not comments):
+            continue
+        if kind == "ident":
+            value = value.lower()
+        elif kind == "quoted":
+            value = value[1:-1].replace("``", "`").lower()
+        tokens.append(_Token(kind, value, match.start(), match.end()))
+    return tokens
+
+
+def _nest(tokens):
+    """Fold tokens into nested groups at parentheses"""
+    stack = [[]]
+    for token in tokens:
+        if token.kind == "punct" and token.value == "(":
+            stack.append([])
+        elif token.kind == "punct" and token.value == ")":
+            if len(stack) == 1:
+                raise SQLParseError("Unbalanced ')' in query")
+            items = stack.pop()
+            stack[-1].append(_Group(items))
+        elif not (token.kind == "punct" and token.value == ";"):
+            stack[-1].append(token)
+    if len(stack) != 1:
+        raise SQLParseError("Unclosed '(' in query")
+    return stack[0]
+
+
+def _is_kw(item, *words):
+    return _kw_in(item, words)
+
+
+def _kw_in(item, words):
+    return item.__class__ is _Token and item.kind == "ident" and item.value in words
+
+
+def _is_punct(item, value):
+    return isinstance(item, _Token) and item.kind == "punct" and item.value == value
+
+
+def _is_name(item):
+    """An identifier that can name a table, column or alias"""
+    return isinstance(item, _Token) and (item.kind == "quoted" or (item.kind == "ident" and item.value not in KEYWORDS))
+
+
+def _is_subquery(item):
+    return isinstance(item, _Group) and bool(item.items) and _is_kw(item.items[0], "select", "with")
+
+
+def _split(items):
+    """Split items on top-level commas"""
+    parts, current = [], []
+    for item in items:
+        if _is_punct(item, ","):
+            parts.append(current)
+            current = []
+        else:
+            current.append(item)
+    if current:
+        parts.append(current)
+    return parts
+
+
+def _render(items):
+    """Render tokens back to compact SQL text"""
+    out = []
+    prev = None
+    for item in items:
+        if isinstance(item, _Group):
+            text = f"({_render(item.items)})"
+            glue = _is_name(prev) or _kw_in(prev, _FUNCTION_KEYWORDS)  # function call
+        else:
+            text = item.text
+            glue = _is_punct(item, ",") or _is_punct(item, ".") or _is_punct(prev, ".")
+        if out and not glue:
+            out.append(" ")
+        out.append(text)
+        prev = item
+    return "".join(out)
+
+
+def _strip_alias(expr):
+    """Split a select item into (expression, alias)"""
+    if len(expr) >= 3 and _is_kw(expr[-2], "as") and isinstance(expr[-1], _Token) \
+            and expr[-1].kind in ("ident", "quoted", "string"):
+        return expr[:-2], expr[-1].value.strip("'\"")
+    if len(expr) >= 2 and _is_name(expr[-1]):
+        prev = expr[-2]
+        if isinstance(prev, _Group) or _is_name(prev) or _is_kw(prev, "end") \
+                or (isinstance(prev, _Token) and prev.kind in ("number", "string")):
+            return expr[:-1], expr[-1].value
+    return expr, None
+
+
+def _contains_aggregate(items):
+    for index, item in enumerate(items):
+        if isinstance(item, _Group):
+            if not _is_subquery(item) and _contains_aggregate(item.items):
+                return True
+        elif item.kind == "ident" and item.value in AGGREGATE_FUNCTIONS \
+                and index + 1 < len(items) and isinstance(items[index + 1], _Group):
+            return True
+    return False
+
+
+def _column_refs(items):
+    """Column names referenced by an expression, without table qualifiers"""
+    refs = []
+    for index, item in enumerate(items):
+        prev = items[index - 1] if index else None
+        nxt = items[index + 1] if index + 1 < len(items) else None
+        if isinstance(item, _Group):
+            if not _is_subquery(item):
+                refs.extend(_column_refs(item.items))
+        elif item.kind == "op" and item.value == "*":
+            if prev is None and nxt is None or _is_punct(prev, "."):
+                refs.append("*")
+        elif _is_name(item):
+            if isinstance(nxt, _Group) and item.kind == "ident":
+                continue  # function name
+            if _is_punct(nxt, "."):
+                continue  # table qualifier
+            if _is_kw(prev, "as") or _is_kw(nxt, "from"):
+                continue  # CAST(x AS type), EXTRACT(unit FROM x)
+            if index >= 2 and _is_kw(items[index - 2], "interval"):
+                continue  # INTERVAL n unit
+            refs.append(item.value)
+    return refs
+
+
+def _split_conditions(items):
+    """Split a WHERE/HAVING condition on top-level AND, keeping BETWEEN ... AND ... together"""
+    parts, current = [], []
+    pending_between = False
+    for item in items:
+        if _is_kw(item, "and") and not pending_between:
+            parts.append(current)
+            current = []
+            continue
+        if _is_kw(item, "between"):
+            pending_between = True
+        elif _is_kw(item, "and"):
+            pending_between = False
+        current.append(item)
+    if current:
+        parts.append(current)
+    return tuple(_render(part) for part in parts if part)
+
+
+class _Parser:
+    def __init__(self):
+        self.tables = []
+        self.aliases = []
+        self.ctes = []
+        self.subqueries = 0
+
+    def _add_table(self, name):
+        if name not in self.ctes and name not in self.tables:
+            self.tables.append(name)
+
+    def parse_query(self, items, outer=False):
+        """Parse [WITH ...] SELECT ... [UNION SELECT ...]; returns the clauses of the first SELECT"""
+        index = 0
+        if _is_kw(items[0] if items else None, "with"):
+            index = 1
+            if _is_kw(items[index] if index < len(items) else None, "recursive"):
+                index += 1
+            while index < len(items) and _is_name(items[index]):
+                name = items[index].value
+                index += 1
+                if index < len(items) and isinstance(items[index], _Group):
+                    index += 1  # column list
+                if index < len(items) and _is_kw(items[index], "as"):
+                    index += 1
+                self.ctes.append(name)
+                if index < len(items) and _is_subquery(items[index]):
+                    self.parse_query(items[index].items)
+                    index += 1
+                if index < len(items) and _is_punct(items[index], ","):
+                    index += 1
+                    continue
+                break
+
+        selects = [[]]
+        for item in items[index:]:
+            if _kw_in(item, _SET_OPERATORS):
+                selects.append([])
+            elif not (_is_kw(item, "all", "distinct") and not selects[-1]):
+                selects[-1].append(item)
+
+        first = None
+        for select in selects:
+            if len(select) == 1 and _is_subquery(select[0]):
+                # (SELECT ...) UNION (SELECT ...)
+                clauses = self.parse_query(select[0].items, outer and first is None)
+            else:
+                clauses = self.parse_select(select, outer and first is None)
+            first = first if first is not None else clauses
+        return first
+
+    def parse_select(self, items, outer=False):
+        clauses = {}
+        current = None
+        for item in items:
+            if _kw_in(item, _CLAUSES):
+                current = clauses.setdefault(item.value, [])
+            elif _is_kw(item, "by") and current is not None and not current:
+                continue
+            elif current is not None:
+                current.append(item)
+
+        self._parse_from(clauses.get("from", []))
+        self._walk_subqueries(items)
+        if not outer:
+            return {}
+
+        columns, aggregates = [], []
+        select_items = clauses.get("select", [])
+        while select_items and _is_kw(select_items[0], "distinct", "all", "distinctrow", "sql_calc_found_rows",
+                                      "sql_no_cache", "high_priority"):
+            select_items = select_items[1:]
+        for expr in _split(select_items):
+            expr, alias = _strip_alias(expr)
+            if alias:
+                self.aliases.append((alias, _render(expr)))
+            if _contains_aggregate(expr):
+                aggregates.append(_render(expr))
+            else:
+                columns.extend(_column_refs(expr))
+
+        group_by = clauses.get("group", [])
+        if len(group_by) >= 2 and _is_kw(group_by[-2], "with") and _is_kw(group_by[-1], "rollup"):
+            group_by = group_by[:-2]
+        return {
+            "columns": columns,
+            "aggregates": aggregates,
+            "group_by": tuple(_render(part) for part in _split(group_by)),
+            "filters": _split_conditions(clauses.get("where", [])),
+            "having": _split_conditions(clauses.get("having", [])),
+        }
+
+    def _parse_from(self, items):
+        """Record base tables and their aliases from a FROM clause (comma lists and JOINs)"""
+        index = 0
+        expect_table = True
+        while index < len(items):
+            item = items[index]
+            if not expect_table:
+                if _is_punct(item, ",") or _kw_in(item, _JOINS):
+                    expect_table = True
+                index += 1
+                continue
+
+            if isinstance(item, _Group):
+                target = "(subquery)"
+                index += 1
+            elif _is_name(item):
+                target = item.value
+                index += 1
+                while index + 1 < len(items) and _is_punct(items[index], ".") and _is_name(items[index + 1]):
+                    target += "." + items[index + 1].value  # schema.table
+                    index += 2
+                self._add_table(target)
+            else:
+                index += 1
+                continue
+
+            if index < len(items) and _is_kw(items[index], "as"):
+                index += 1
+            if index < len(items) and _is_name(items[index]):
+                self.aliases.append((items[index].value, target))
+                index += 1
+            expect_table = False
+
+    def _walk_subqueries(self, items):
+        """Parse every nested SELECT (derived tables, IN/EXISTS, scalar subqueries) for its tables"""
+        for item in items:
+            if isinstance(item, _Group):
+                if _is_subquery(item):
+                    self.subqueries += 1
+                    self.parse_query(item.items)
+                else:
+                    self._walk_subqueries(item.items)
+
+
+def _dedupe(values):
+    return tuple(dict.fromkeys(values))
+
+
+def _parse_sql(sql: str) -> ParsedQuery:
+    items = _nest(tokenize(sql))
+    if not items:
+        raise SQLParseError("Empty query")
+    parser = _Parser()
+    clauses = parser.parse_query(items, outer=True) or {}
+    return ParsedQuery(
+        tables=tuple(parser.tables),
+        columns=_dedupe(clauses.get("columns", ())),
+        aliases=tuple(parser.aliases),
+        aggregates=_dedupe(clauses.get("aggregates", ())),
+        group_by=clauses.get("group_by", ()),
+        filters=clauses.get("filters", ()),
+        having=clauses.get("having", ()),
+        ctes=tuple(parser.ctes),
+        subqueries=parser.subqueries,
+    )
+
+
+# Generated SQL repeats heavily (translation and result caches key on it too), so parses are memoized
+parse_sql = lru_cache(maxsize=config.SQL_PARSE_CACHE_SIZE)(_parse_sql)
@@ -1,20 +1,32 @@
 import pytest
-from unittest.mock import patch, MagicMock
+import threading
+from unittest.mock import patch, MagicMock, AsyncMock
 from datetime import datetime, timedelta
 from jose import jwt
 from fastapi.exceptions import HTTPException
 from app.services.auth_services import (
     hash_password, verify_password, create_access_token,
-    admin_login, get_current_admin
+    admin_login, get_current_admin, hash_password_async, verify_password_async
 )
 from app.core.config import JWT_SECRET_KEY, JWT_ALGORITHM
 
 @pytest.fixture
 def mock_admins_collection():
-    """Mock MongoDB admins collection"""
-    with patch("app.services.auth_services.admins_collection") as mock_collection:
+    """Mock MongoDB admins collection on the shared async client"""
+    mock_collection = MagicMock()
+    mock_collection.find_one = AsyncMock()
+    mock_collection.insert_one = AsyncMock()
+    with patch("app.services.auth_services.admins_collection", return_value=mock_collection):
         yield mock_collection
 
+@pytest.fixture(autouse=True)
+def mock_revocation_store():
+    """Keep the token revocation check off the network"""
+    mock_redis = MagicMock()
+    mock_redis.exists = AsyncMock(return_value=0)
+    with patch("app.core.token_verifier.token_verifier.redis_client", mock_redis):
+        yield mock_redis
+
 def test_hash_password():
     """Test password hashing"""
     password = "securepassword"
@@ -29,6 +41,20 @@ def test_verify_password():
     assert verify_password(password, hashed)  # Correct password
     assert not verify_password("wrongpassword", hashed)  # Incorrect password
 
+@pytest.mark.asyncio
+async def test_password_hashing_runs_off_event_loop():
+    """Test that async hashing and verification run on the bcrypt pool"""
+    threads = []
+    with patch("app.services.auth_services.pwd_context") as mock_context:
+        mock_context.hash.side_effect = lambda password: threads.append(threading.current_thread().name) or "hashed"
+        mock_context.verify.side_effect = lambda plain, hashed: threads.append(threading.current_thread().name) or True
+
+        assert await hash_password_async("securepassword") == "hashed"
+        assert await verify_password_async("securepassword", "hashed")
+
+    assert len(threads) == 2
+    assert all(name.startswith("bcrypt") for name in threads)
+
 def test_create_access_token():
     """Test JWT token creation"""
     data = {"sub": "test@example.com"}
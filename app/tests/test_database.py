@@ -1,18 +1,33 @@
 import pytest
-from unittest.mock import patch, MagicMock
+import asyncio
+import threading
+from unittest.mock import patch, MagicMock, AsyncMock
 import pymysql
 from app.services.database import (
     get_database,
+    connect_mongo,
+    close_mongo,
     get_db_connection,
-    execute_sql_query
+    execute_sql_query_async,
+    fetch_sql_query,
+    stream_sql_query,
+    mysql_pool
 )
+from app.core.config import config
+
+@pytest.fixture(autouse=True)
+def reset_pool():
+    """Start every test with an empty MySQL connection pool."""
+    mysql_pool.close_all()
+    yield
+    mysql_pool.close_all()
 
 @pytest.fixture
 def mock_mongo():
-    """Mock MongoDB database connection."""
-    with patch("app.services.database.client") as mock_client, \
-         patch("app.services.database.db") as mock_db:
-        yield mock_client, mock_db
+    """Mock the shared Motor client."""
+    with patch("app.services.database.AsyncIOMotorClient") as mock_client_class, \
+         patch("app.services.database.mongo_client", None):
+        yield mock_client_class
 
 
 @pytest.fixture
@@ -30,12 +45,26 @@ def mock_mysql():
 
 
 def test_get_database(mock_mongo):
-    """Test MongoDB database retrieval."""
-    _, mock_db = mock_mongo
-    mock_db.name = "test_db"
+    """Test that every caller shares one Motor client, created with the configured pool size."""
+    first = get_database()
+    second = get_database()
+
+    mock_mongo.assert_called_once()
+    assert mock_mongo.call_args.kwargs["maxPoolSize"] == config.MONGO_MAX_POOL_SIZE
+    assert first is second
+
+
+@pytest.mark.asyncio
+async def test_connect_and_close_mongo(mock_mongo):
+    """Test that startup pings the server and shutdown closes the shared client."""
+    client = mock_mongo.return_value
+    client.admin.command = AsyncMock()
 
-    db_instance = get_database()
-    assert db_instance.name == "test_db"
+    await connect_mongo()
+    close_mongo()
+
+    client.admin.command.assert_awaited_once_with("ping")
+    client.close.assert_called_once()
 
 
 def test_get_db_connection_success(mock_mysql):
@@ -54,25 +83,178 @@ def test_get_db_connection_failure():
             get_db_connection()
 
 
-def test_execute_sql_query_success(mock_mysql):
-    """Test successful SQL query execution."""
-    _, mock_conn, mock_cursor = mock_mysql
-    mock_cursor.fetchall.return_value = [{"id": 1, "name": "John"}]
+@pytest.fixture
+def mock_stream_cursor(mock_mysql):
+    """Server-side cursor returned by conn.cursor(SSDictCursor)."""
+    _, mock_conn, _ = mock_mysql
+    cursor = MagicMock()
+    mock_conn.cursor.return_value = cursor
+    return mock_conn, cursor
+
+
+def test_stream_sql_query_batches(mock_stream_cursor):
+    """Test that rows are fetched in batches from a server-side cursor."""
+    mock_conn, cursor = mock_stream_cursor
+    cursor.fetchmany.side_effect = [[{"id": 1}, {"id": 2}], [{"id": 3}], []]
+
+    stream = stream_sql_query("SELECT id FROM emi", batch_size=2)
+    batches = list(stream.batches())
+
+    assert batches == [[{"id": 1}, {"id": 2}], [{"id": 3}]]
+    assert stream.row_count == 3
+    assert not stream.truncated
+    mock_conn.cursor.assert_called_once_with(pymysql.cursors.SSDictCursor)
+    mock_conn.close.assert_not_called()  # Fully read, so the connection is reusable
+
+
+def test_fetch_sql_query_truncates_at_cap(mock_stream_cursor):
+    """Test that the row cap stops fetching and discards the half-read connection."""
+    mock_conn, cursor = mock_stream_cursor
+    cursor.fetchmany.side_effect = [[{"id": 1}, {"id": 2}]]
+    cursor.fetchone.return_value = {"id": 3}
+
+    rows, truncated = fetch_sql_query("SELECT id FROM emi", max_rows=2)
 
-    result = execute_sql_query("SELECT * FROM users")
+    assert rows == [{"id": 1}, {"id": 2}]
+    assert truncated
+    cursor.fetchmany.assert_called_once_with(2)
+    cursor.close.assert_not_called()  # Closing would drain the remaining rows
+    mock_conn.close.assert_called_once()
+
+
+def test_fetch_sql_query_exact_cap_not_truncated(mock_stream_cursor):
+    """Test that a result exactly at the cap is not flagged as truncated."""
+    _, cursor = mock_stream_cursor
+    cursor.fetchmany.side_effect = [[{"id": 1}]]
+    cursor.fetchone.return_value = None
+
+    rows, truncated = fetch_sql_query("SELECT id FROM emi", max_rows=1)
 
-    assert result == [{"id": 1, "name": "John"}]
-    mock_conn.cursor.assert_called_once()
-    mock_cursor.execute.assert_called_once_with("SELECT * FROM users")
+    assert rows == [{"id": 1}]
+    assert not truncated
 
 
-def test_execute_sql_query_failure(mock_mysql):
-    """Test handling of MySQL query errors."""
-    _, mock_conn, mock_cursor = mock_mysql
-    mock_cursor.execute.side_effect = pymysql.MySQLError("Query failed")
+def test_fetch_sql_query_error(mock_stream_cursor):
+    """Test that MySQL errors are reported and the connection is discarded."""
+    mock_conn, cursor = mock_stream_cursor
+    cursor.execute.side_effect = pymysql.MySQLError("Query failed")
 
-    result = execute_sql_query("SELECT * FROM users")
+    result, truncated = fetch_sql_query("SELECT * FROM emi")
 
-    assert "error" in result
     assert "Query failed" in result["error"]
+    assert not truncated
     mock_conn.close.assert_called_once()
+
+
+def test_fetch_sql_query_reuses_pooled_connection(mock_stream_cursor):
+    """Test that consecutive queries share one pooled MySQL connection."""
+    mock_conn, cursor = mock_stream_cursor
+    cursor.fetchmany.return_value = []
+
+    fetch_sql_query("SELECT 1")
+    fetch_sql_query("SELECT 2")
+
+    assert mock_conn.cursor.call_count == 2
+    mock_conn.ping.assert_called_once_with(reconnect=False)
+    mock_conn.close.assert_not_called()  # Connection goes back to the pool
+
+
+@pytest.mark.asyncio
+async def test_execute_sql_query_async(mock_stream_cursor):
+    """Test that the async variant runs a capped query on the MySQL executor."""
+    _, cursor = mock_stream_cursor
+    cursor.fetchmany.side_effect = [[{"id": 1}], []]
+
+    with patch("app.services.database.query_result_cache.enabled", False):
+        result, truncated = await execute_sql_query_async("SELECT id FROM users")
+
+    assert result == [{"id": 1}]
+    assert not truncated
+    cursor.execute.assert_called_once_with("SELECT id FROM users")
+
+
+@pytest.mark.asyncio
+async def test_execute_sql_query_async_served_from_cache(mock_mysql):
+    """Test that a cached result skips MySQL entirely."""
+    mock_connect, _, _ = mock_mysql
+
+    with patch("app.services.database.query_result_cache") as mock_cache:
+        mock_cache.get = AsyncMock(return_value=([{"id": 7}], False))
+        result, truncated = await execute_sql_query_async("SELECT id FROM users")
+
+    assert result == [{"id": 7}]
+    assert not truncated
+    mock_connect.assert_not_called()
+
+
+def test_cancelled_stream_discards_connection(mock_stream_cursor):
+    """Test that cancel() reports the MySQL thread id and the connection is not reused."""
+    mock_conn, cursor = mock_stream_cursor
+    mock_conn.thread_id.return_value = 42
+    cursor.fetchmany.side_effect = [[{"id": 1}], [{"id": 2}]]
+
+    stream = stream_sql_query("SELECT id FROM emi", batch_size=1)
+    batches = stream.batches()
+    next(batches)
+
+    assert stream.cancel() == 42
+    batches.close()
+    mock_conn.close.assert_called_once()
+    assert stream.cancel() is None  # Already released, nothing left to kill
+
+
+
+def test_stream_cancelled_during_execute_stops(mock_stream_cursor):
+    """Test that a cancel() racing execute() stops the stream before any rows are read."""
+    mock_conn, cursor = mock_stream_cursor
+    mock_conn.thread_id.return_value = 42
+    stream = stream_sql_query("SELECT id FROM emi", batch_size=1)
+    cursor.execute.side_effect = lambda query: stream.cancel()
+
+    with pytest.raises(RuntimeError):
+        next(stream.batches())
+
+    cursor.fetchmany.assert_not_called()
+    mock_conn.close.assert_called_once()
+
+
+def test_stream_checks_cancel_between_batches(mock_stream_cursor):
+    """Test that a stream cancelled mid-read fetches no further batches."""
+    mock_conn, cursor = mock_stream_cursor
+    cursor.fetchmany.side_effect = [[{"id": 1}], [{"id": 2}]]
+    stream = stream_sql_query("SELECT id FROM emi", batch_size=1)
+    batches = stream.batches()
+    next(batches)
+
+    stream.cancel()
+    with pytest.raises(RuntimeError):
+        next(batches)
+
+    assert cursor.fetchmany.call_count == 1
+    mock_conn.close.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_execute_sql_query_async_cancel_kills_query(mock_stream_cursor):
+    """Test that cancelling the awaiting task kills the connection running the statement."""
+    mock_conn, cursor = mock_stream_cursor
+    mock_conn.thread_id.return_value = 42
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_execute(query):
+        started.set()
+        release.wait(5)
+
+    cursor.execute.side_effect = slow_execute
+    cursor.fetchmany.return_value = []
+
+    with patch("app.services.database.query_result_cache.enabled", False), \
+         patch("app.services.database.kill_connection", side_effect=lambda _: release.set()) as mock_kill:
+        task = asyncio.create_task(execute_sql_query_async("SELECT SLEEP(60)"))
+        await asyncio.to_thread(started.wait, 5)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    mock_kill.assert_called_once_with(42)
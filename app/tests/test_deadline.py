@@ -0,0 +1,84 @@
+import asyncio
+import pytest
+from app.core.deadline import Deadline, StageTimeoutError
+
+
+@pytest.mark.asyncio
+async def test_run_returns_result_within_budget():
+    """Test that a stage finishing in time returns its result."""
+    deadline = Deadline(1)
+
+    async def stage():
+        return "ok"
+
+    assert await deadline.run("format", stage(), 0.5) == "ok"
+
+
+@pytest.mark.asyncio
+async def test_run_stage_timeout_names_stage():
+    """Test that a stage overrunning its own timeout is cancelled and reported."""
+    deadline = Deadline(5)
+    cancelled = asyncio.Event()
+
+    async def stage():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    with pytest.raises(StageTimeoutError) as exc_info:
+        await deadline.run("sql_execution", stage(), 0.05)
+
+    assert cancelled.is_set()
+    body = exc_info.value.to_dict()
+    assert body["error"] == "timeout"
+    assert body["stage"] == "sql_execution"
+    assert body["deadline"] == "stage"
+    assert body["timeout_seconds"] == 0.05
+
+
+@pytest.mark.asyncio
+async def test_run_request_deadline_caps_stage_timeout():
+    """Test that the overall request deadline wins over a longer stage timeout."""
+    deadline = Deadline(0.05)
+
+    with pytest.raises(StageTimeoutError) as exc_info:
+        await deadline.run("format", asyncio.sleep(5), 30)
+
+    assert exc_info.value.request_deadline
+    assert exc_info.value.to_dict()["deadline"] == "request"
+
+
+@pytest.mark.asyncio
+async def test_run_after_deadline_expired():
+    """Test that a stage is not started once the request deadline has passed."""
+    deadline = Deadline(0)
+
+    with pytest.raises(StageTimeoutError) as exc_info:
+        await deadline.run("persist", asyncio.sleep(0))
+
+    assert exc_info.value.stage == "persist"
+
+
+@pytest.mark.asyncio
+async def test_iterate_times_out_mid_stream():
+    """Test that a stalled stream is cut off after the items already produced."""
+    deadline = Deadline(5)
+    closed = asyncio.Event()
+
+    async def tokens():
+        try:
+            yield "first"
+            await asyncio.sleep(5)
+            yield "never"
+        finally:
+            closed.set()
+
+    received = []
+    with pytest.raises(StageTimeoutError):
+        async for token in deadline.iterate("format", tokens(), 0.05):
+            received.append(token)
+
+    assert received == ["first"]
+    assert closed.is_set()
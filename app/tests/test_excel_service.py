@@ -2,7 +2,11 @@ import pytest
 import os
 import pandas as pd
 from unittest.mock import patch, MagicMock
-from app.services.excel_service import generate_excel
+import gzip
+import csv
+import datetime
+from decimal import Decimal
+from app.services.excel_service import generate_excel, export_query, media_type_for
 from app.core.config import EXCEL_STORAGE_PATH
 
 # Sample test data
@@ -61,9 +65,88 @@ async def test_generate_excel_error(mock_store_excel_path):
     conversation_id = "error_test"
 
     # Simulate an exception when saving
-    with patch("pandas.DataFrame.to_excel", side_effect=OSError("Disk full")):
+    with patch("app.services.excel_service.write_rows_xlsx", side_effect=OSError("Disk full")):
         with patch("app.services.excel_service.logging.error") as mock_log_error:
             await generate_excel(conversation_id, test_data)
 
     mock_log_error.assert_called_with("Excel generation failed: Disk full")
     mock_store_excel_path.assert_not_called()  # Ensure Redis is not updated on failure
+
+
+@pytest.mark.asyncio
+@patch("app.services.excel_service.store_excel_path")
+async def test_generate_excel_from_iterator(mock_store_excel_path, tmp_path):
+    """Test streaming a row generator with MySQL types into xlsx and reporting size/row count."""
+    rows = ({"loan_id": i, "principal": Decimal("1000.50"), "disbursed_date": datetime.date(2024, 1, 1)}
+            for i in range(500))
+
+    with patch("app.services.excel_service.EXCEL_STORAGE_PATH", tmp_path):
+        result = await generate_excel("stream_test", rows)
+
+    assert result["rows"] == 500
+    assert result["bytes"] == os.path.getsize(result["path"])
+    df = pd.read_excel(result["path"])
+    assert df.shape == (500, 3)
+    assert not os.path.exists(result["path"] + ".part")
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("fmt", ["csv", "csv.gz"])
+@patch("app.services.excel_service.store_excel_path")
+async def test_generate_csv_exports(mock_store_excel_path, tmp_path, fmt):
+    """Test the CSV and gzip-compressed CSV export formats."""
+    with patch("app.services.excel_service.EXCEL_STORAGE_PATH", tmp_path):
+        result = await generate_excel("csv_test", test_data, fmt=fmt)
+
+    assert result["path"].endswith(f".{fmt}")
+    opener = gzip.open if fmt == "csv.gz" else open
+    with opener(result["path"], "rt", newline="") as handle:
+        lines = list(csv.reader(handle))
+    assert lines[0] == ["name", "age", "city"]
+    assert lines[1] == ["Alice", "30", "New York"]
+    assert result["rows"] == 2
+
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("fmt", ["xlsx", "csv"])
+@patch("app.services.excel_service.store_excel_path")
+async def test_exports_binary_values(mock_store_excel_path, tmp_path, fmt):
+    """Test that BLOB values are written as text when valid UTF-8 and as hex otherwise."""
+    rows = [{"doc": b"\xffA"}, {"doc": b""}, {"doc": b"ok"}]
+
+    with patch("app.services.excel_service.EXCEL_STORAGE_PATH", tmp_path):
+        result = await generate_excel("binary_test", rows, fmt=fmt)
+
+    assert result["rows"] == 3
+    if fmt == "xlsx":
+        values = pd.read_excel(result["path"], keep_default_na=False, dtype=str)["doc"].tolist()
+    else:
+        with open(result["path"], newline="") as handle:
+            values = [line[0] for line in list(csv.reader(handle))[1:]]
+    assert values == ["ff41", "", "ok"]
+
+
+@pytest.mark.asyncio
+@patch("app.services.excel_service.store_excel_path")
+async def test_export_query_streams_from_database(mock_store_excel_path, tmp_path):
+    """Test that query exports are fed by the DB row stream."""
+    stream = MagicMock()
+    stream.__enter__.return_value = stream
+    stream.__iter__.return_value = iter(test_data)
+    stream.truncated = False
+
+    with patch("app.services.excel_service.EXCEL_STORAGE_PATH", tmp_path), \
+         patch("app.services.excel_service.stream_sql_query", return_value=stream) as mock_stream:
+        result = await export_query("query_test", "SELECT * FROM loan", fmt="csv", max_rows=50)
+
+    mock_stream.assert_called_once_with("SELECT * FROM loan", max_rows=50)
+    assert result["rows"] == 2
+    assert result["truncated"] is False
+
+
+def test_media_type_for():
+    """Test download media types by export extension."""
+    assert media_type_for("/x/1.xlsx").endswith("spreadsheetml.sheet")
+    assert media_type_for("/x/1.csv") == "text/csv"
+    assert media_type_for("/x/1.csv.gz") == "application/gzip"
@@ -0,0 +1,199 @@
+import pytest
+import threading
+from unittest.mock import AsyncMock, MagicMock, patch
+from app.services.export_jobs import (
+    ExportWorkerPool,
+    enqueue_export,
+    get_export_status,
+    encode_results,
+    QUEUE_KEY,
+    DELAYED_KEY,
+    PROCESSING_KEY
+)
+
+
+@pytest.fixture
+def redis_client():
+    """Async Redis client mock with a pipeline usable as an async context manager."""
+    client = MagicMock()
+    client.hgetall = AsyncMock(return_value={})
+    client.get = AsyncMock(return_value=None)
+    client.hset = AsyncMock()
+    client.zadd = AsyncMock()
+    client.delete = AsyncMock()
+    pipe = MagicMock()
+    pipe.execute = AsyncMock()
+    client.pipeline.return_value.__aenter__.return_value = pipe
+    client.pipe = pipe
+    return client
+
+
+def _states(redis_client):
+    return [call.kwargs["mapping"]["state"] for call in redis_client.hset.call_args_list]
+
+
+@pytest.mark.asyncio
+async def test_enqueue_inlines_small_results(redis_client):
+    """Test that small result sets travel with the job instead of being re-queried."""
+    rows = [{"loan_id": 1}]
+    job = await enqueue_export("conv1", rows=rows, sql_query="SELECT loan_id FROM loan", redis_client=redis_client)
+
+    assert job["state"] == "queued"
+    assert job["source"] == "rows"
+    redis_client.pipe.set.assert_called_once_with("export_job:conv1:payload", encode_results(rows), ex=10800)
+    redis_client.pipe.rpush.assert_called_once_with(QUEUE_KEY, "conv1")
+
+
+@pytest.mark.asyncio
+async def test_enqueue_large_results_use_query(redis_client):
+    """Test that results over the inline limit are exported by re-running the query."""
+    with patch("app.services.export_jobs.config.EXPORT_INLINE_MAX_BYTES", 10):
+        job = await enqueue_export("conv1", rows=[{"loan_id": i} for i in range(10)],
+                                   sql_query="SELECT loan_id FROM loan", redis_client=redis_client)
+
+    assert job["source"] == "query"
+    redis_client.pipe.set.assert_called_once_with("export_job:conv1:payload", "SELECT loan_id FROM loan", ex=10800)
+
+
+@pytest.mark.asyncio
+async def test_enqueue_requires_rows_or_query(redis_client):
+    with pytest.raises(ValueError):
+        await enqueue_export("conv1", redis_client=redis_client)
+
+
+@pytest.mark.asyncio
+async def test_get_export_status(redis_client):
+    redis_client.hgetall.return_value = {"state": "done", "attempts": "1", "rows": "5", "bytes": "512"}
+
+    job = await get_export_status("conv1", redis_client=redis_client)
+
+    assert job == {"state": "done", "attempts": 1, "rows": 5, "bytes": 512}
+
+
+@pytest.mark.asyncio
+async def test_process_job_success(redis_client):
+    """Test a job moves through running to done and records the file details."""
+    redis_client.hgetall.return_value = {"state": "queued", "attempts": "0", "format": "xlsx", "source": "rows"}
+    redis_client.get.return_value = encode_results([{"loan_id": 1}])
+    result = {"path": "/tmp/conv1.xlsx", "format": "xlsx", "rows": 1, "bytes": 100}
+    pool = ExportWorkerPool(redis_client=redis_client)
+
+    with patch("app.services.export_jobs.write_export", return_value=result) as mock_write:
+        await pool.process_job("conv1")
+
+    mock_write.assert_called_once_with("conv1", [{"loan_id": 1}], "xlsx")
+    assert _states(redis_client) == ["running", "done"]
+    assert redis_client.hset.call_args.kwargs["mapping"]["path"] == "/tmp/conv1.xlsx"
+    assert pool.stats()["completed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_process_job_query_source(redis_client):
+    """Test that query-backed jobs stream the export from MySQL."""
+    redis_client.hgetall.return_value = {"attempts": "0", "format": "csv.gz", "source": "query"}
+    redis_client.get.return_value = "SELECT * FROM emi"
+    result = {"path": "/tmp/conv1.csv.gz", "format": "csv.gz", "rows": 20000, "bytes": 4096}
+    pool = ExportWorkerPool(redis_client=redis_client)
+
+    with patch("app.services.export_jobs.export_query_to_file", return_value=result) as mock_export:
+        await pool.process_job("conv1")
+
+    assert mock_export.call_args.args[:3] == ("conv1", "SELECT * FROM emi", "csv.gz")
+    assert _states(redis_client)[-1] == "done"
+
+
+@pytest.mark.asyncio
+async def test_process_job_retries_then_fails(redis_client):
+    """Test failed exports are retried with backoff until max_attempts is reached."""
+    redis_client.get.return_value = encode_results([{"loan_id": 1}])
+    pool = ExportWorkerPool(redis_client=redis_client, max_attempts=2, retry_backoff=5)
+
+    with patch("app.services.export_jobs.write_export", return_value=None):
+        redis_client.hgetall.return_value = {"attempts": "0", "format": "xlsx", "source": "rows"}
+        await pool.process_job("conv1")
+        assert _states(redis_client) == ["running", "queued"]
+        assert redis_client.zadd.call_args.args[0] == DELAYED_KEY
+
+        redis_client.hgetall.return_value = {"attempts": "1", "format": "xlsx", "source": "rows"}
+        await pool.process_job("conv1")
+
+    assert _states(redis_client)[-1] == "failed"
+    assert redis_client.zadd.call_count == 1
+    assert pool.stats()["retried"] == 1
+    assert pool.stats()["failed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_process_job_timeout_kills_query(redis_client):
+    """Test that an export past its timeout kills its query and fails without a retry."""
+    redis_client.hgetall.return_value = {"attempts": "0", "format": "csv.gz", "source": "query"}
+    redis_client.get.return_value = "SELECT * FROM emi"
+    pool = ExportWorkerPool(redis_client=redis_client, job_timeout=0.05)
+    release = threading.Event()
+
+    def slow_export(*args):
+        release.wait(5)
+
+    async def cancel(stream):
+        release.set()
+
+    with patch("app.services.export_jobs.export_query_to_file", side_effect=slow_export) as mock_export, \
+         patch("app.services.export_jobs.cancel_sql_stream", side_effect=cancel) as mock_cancel:
+        await pool.process_job("conv1")
+
+    mock_cancel.assert_called_once_with(mock_export.call_args.args[4])
+    assert _states(redis_client)[-1] == "failed"
+    redis_client.zadd.assert_not_called()
+    assert pool.stats()["timed_out"] == 1
+
+
+@pytest.mark.asyncio
+async def test_process_job_expired(redis_client):
+    """Test that a job whose payload has expired is dropped."""
+    pool = ExportWorkerPool(redis_client=redis_client)
+
+    await pool.process_job("conv1")
+
+    redis_client.hset.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_worker_acknowledges_finished_jobs(redis_client):
+    """Test that a job is moved onto the processing list and removed once it has run."""
+    pool = ExportWorkerPool(redis_client=redis_client)
+
+    async def blmove(*args):
+        if pool._stopping:
+            return None
+        pool._stopping = True
+        return "conv1"
+
+    redis_client.zrangebyscore = AsyncMock(return_value=[])
+    redis_client.blmove = AsyncMock(side_effect=blmove)
+    redis_client.lrem = AsyncMock()
+    with patch.object(pool, "process_job", AsyncMock()) as mock_process:
+        await pool._worker(0)
+
+    assert redis_client.blmove.call_args.args[:2] == (QUEUE_KEY, pool.processing_key)
+    mock_process.assert_awaited_once_with("conv1")
+    redis_client.lrem.assert_awaited_once_with(pool.processing_key, 1, "conv1")
+
+
+@pytest.mark.asyncio
+async def test_requeue_stale_recovers_jobs_of_dead_pools(redis_client):
+    """Test that only processing lists without a live heartbeat go back on the queue."""
+    pool = ExportWorkerPool(redis_client=redis_client)
+
+    async def scan_iter(match):
+        for key in (f"{PROCESSING_KEY}:dead", f"{PROCESSING_KEY}:alive", pool.processing_key):
+            yield key
+
+    redis_client.scan_iter = scan_iter
+    redis_client.exists = AsyncMock(side_effect=lambda key: key.endswith(":alive"))
+    redis_client.lmove = AsyncMock(side_effect=["conv1", "conv2", None])
+
+    assert await pool.requeue_stale() == 2
+
+    redis_client.lmove.assert_awaited_with(f"{PROCESSING_KEY}:dead", QUEUE_KEY, "RIGHT", "LEFT")
+    assert redis_client.lmove.await_count == 3
+    assert pool.stats()["requeued"] == 2
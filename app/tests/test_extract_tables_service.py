@@ -33,6 +33,20 @@ from app.services.extract_tables_service import extract_tables_and_columns
 
         # Query with functions that are not aggregations
         ("SELECT LOWER(email), LENGTH(name) FROM users", ["users"], ["email", "name"]),
+
+        # Subquery in FROM and WHERE
+        ("SELECT t.user_id FROM (SELECT user_id FROM loan) t WHERE t.user_id IN (SELECT user_id FROM users)",
+         ["loan", "users"], ["user_id"]),
+
+        # CTE names are not tables
+        ("WITH recent AS (SELECT loan_id FROM loan) SELECT r.loan_id FROM recent r JOIN emi e ON e.loan_id = r.loan_id",
+         ["loan", "emi"], ["loan_id"]),
+
+        # Quoted identifiers
+        ("SELECT `order`, `u`.`name` FROM `users` `u`", ["users"], ["order", "name"]),
+
+        # Nested functions
+        ("SELECT UPPER(TRIM(name)), ROUND(AVG(salary), 2) FROM employees", ["employees"], ["name"]),
     ]
 )
 def test_extract_tables_and_columns(query, expected_tables, expected_columns):
@@ -40,3 +54,8 @@ def test_extract_tables_and_columns(query, expected_tables, expected_columns):
     tables, columns = extract_tables_and_columns(query)
     assert tables == expected_tables
     assert columns == expected_columns
+
+
+def test_extract_tables_and_columns_unbalanced():
+    """Test that unparseable SQL yields empty results instead of raising."""
+    assert extract_tables_and_columns("SELECT COUNT(id FROM loan") == ([], [])
@@ -2,8 +2,8 @@ import pytest
 import json
 import datetime
 from decimal import Decimal
-from unittest.mock import patch, MagicMock
-from app.services.result_formatter import format_results, serialize_dates
+from unittest.mock import patch, MagicMock, AsyncMock
+from app.services.result_formatter import format_results_async, stream_format_results, serialize_dates
 
 # Sample test data
 sample_results = [
@@ -28,39 +28,109 @@ def test_serialize_dates(input_data, expected_json):
     assert json.dumps(input_data, default=serialize_dates) == expected_json
 
 
-@patch("app.services.result_formatter.model.generate_content")
-def test_format_results_valid(mock_gemini):
+@pytest.mark.asyncio
+@patch("app.services.result_formatter.model.generate_content_async", new_callable=AsyncMock)
+async def test_format_results_valid(mock_gemini):
     """Test formatting results with valid input."""
     
     mock_gemini.return_value.text = "The loan details show an average interest rate of 6.85%."
     
-    output = format_results(sample_results)
+    output = await format_results_async(sample_results)
     
     assert "average interest rate" in output
-    mock_gemini.assert_called_once()
+    mock_gemini.assert_awaited_once()
 
 
-@patch("app.services.result_formatter.model.generate_content")
-def test_format_results_empty(mock_gemini):
+@pytest.mark.asyncio
+@patch("app.services.result_formatter.model.generate_content_async", new_callable=AsyncMock)
+async def test_format_results_empty(mock_gemini):
     """Test formatting when results are empty."""
     
     mock_gemini.return_value.text = "No data available."
     
-    output = format_results([])
+    output = await format_results_async([])
     
     assert output == "No data available."
-    mock_gemini.assert_called_once()
+    mock_gemini.assert_awaited_once()
 
 
-@patch("app.services.result_formatter.model.generate_content")
-def test_format_results_large_data(mock_gemini):
+@pytest.mark.asyncio
+@patch("app.services.result_formatter.model.generate_content_async", new_callable=AsyncMock)
+async def test_format_results_large_data(mock_gemini):
     """Test formatting with large data input."""
     
     large_data = [{"loan_id": i, "interest": Decimal("5.5")} for i in range(1000)]
     
     mock_gemini.return_value.text = "The dataset contains 1000 records with a consistent interest rate of 5.5%."
     
-    output = format_results(large_data)
+    output = await format_results_async(large_data)
     
     assert "1000 records" in output
-    mock_gemini.assert_called_once()
+    mock_gemini.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+@patch("app.services.result_formatter.model.generate_content_async", new_callable=AsyncMock)
+async def test_format_results_async(mock_gemini):
+    """Test async formatting includes the user question in the prompt."""
+    mock_gemini.return_value.text = "Two loans were disbursed."
+
+    output = await format_results_async(sample_results, "How many loans were disbursed?")
+
+    assert output == "Two loans were disbursed."
+    assert "How many loans were disbursed?" in mock_gemini.call_args[0][0]
+
+
+@pytest.mark.asyncio
+@patch("app.services.result_formatter.model.generate_content_async", new_callable=AsyncMock)
+async def test_format_results_truncated(mock_gemini):
+    """Test that truncated results are flagged as partial in the prompt."""
+    mock_gemini.return_value.text = "Partial data shows two loans."
+
+    await format_results_async(sample_results, "List all loans", truncated=True)
+
+    prompt = mock_gemini.call_args[0][0]
+    assert "Only the first 2 rows are shown" in prompt
+
+
+@pytest.mark.asyncio
+@patch("app.services.result_formatter.model.generate_content_async", new_callable=AsyncMock)
+async def test_format_results_summarizes_large_data(mock_gemini):
+    """Test that large results are sent as a bounded summary rather than every row."""
+    mock_gemini.return_value.text = "5000 loans at 5.5%."
+    large_data = [{"loan_id": i, "interest": Decimal("5.5")} for i in range(5000)]
+
+    await format_results_async(large_data)
+
+    prompt = mock_gemini.call_args[0][0]
+    assert "The result has 5000 rows" in prompt
+    assert '"column_stats"' in prompt
+    assert len(prompt) < 5000
+
+
+@pytest.mark.asyncio
+@patch("app.services.result_formatter.model.generate_content_async", new_callable=AsyncMock)
+async def test_format_results_small_data_unchanged(mock_gemini):
+    """Test that small results are still passed through verbatim."""
+    mock_gemini.return_value.text = "Two loans."
+
+    await format_results_async(sample_results)
+
+    assert json.dumps(sample_results, indent=2, default=serialize_dates) in mock_gemini.call_args[0][0]
+
+
+@pytest.mark.asyncio
+@patch("app.services.result_formatter.model.generate_content_async", new_callable=AsyncMock)
+async def test_stream_format_results(mock_gemini):
+    """Test that streamed Gemini chunks are yielded as they arrive."""
+    async def chunks():
+        for text in ("Two loans ", "were disbursed."):
+            yield MagicMock(parts=[text], text=text)
+        yield MagicMock(parts=[])
+
+    mock_gemini.return_value = chunks()
+
+    output = [chunk async for chunk in stream_format_results(sample_results, "How many loans?")]
+
+    assert output == ["Two loans ", "were disbursed."]
+    assert mock_gemini.call_args.kwargs["stream"] is True
@@ -1,6 +1,13 @@
 import pytest
-from unittest.mock import patch, MagicMock
-from app.services.query_generator import generate_sql
+from unittest.mock import patch, MagicMock, AsyncMock
+from app.services.query_generator import generate_sql_async, SQL_SCHEMA_PROMPT
+
+
+@pytest.fixture(autouse=True)
+def no_context_cache():
+    """Keep current() from scheduling a real Gemini cache creation."""
+    with patch("app.services.query_generator.sql_prompt_model.use_context_cache", False):
+        yield
 
 @pytest.mark.parametrize(
     "user_input, thread_id, mock_redis_return, expected_output",
@@ -23,9 +30,10 @@ from app.services.query_generator import generate_sql
          "SELECT emi_id, due_date, emi_amount, late_fee, status FROM emi WHERE status='OVERDUE';"),
     ]
 )
-@patch("app.services.query_generator.get_last_n_conversations")
-@patch("app.services.query_generator.model.generate_content")
-def test_generate_sql(mock_gemini, mock_redis, user_input, thread_id, mock_redis_return, expected_output):
+@pytest.mark.asyncio
+@patch("app.services.query_generator.get_last_n_conversations_async", new_callable=AsyncMock)
+@patch("app.services.query_generator.model.generate_content_async", new_callable=AsyncMock)
+async def test_generate_sql(mock_gemini, mock_redis, user_input, thread_id, mock_redis_return, expected_output):
     """Test SQL query generation with different inputs."""
     
     # Mock Redis return value
@@ -35,7 +43,43 @@ def test_generate_sql(mock_gemini, mock_redis, user_input, thread_id, mock_redis
     mock_gemini.return_value.text = f"```sql\n{expected_output}\n```"
 
     # Call function
-    result = generate_sql(user_input, thread_id)
+    with patch("app.services.query_generator.sql_translation_cache.enabled", False):
+        result = await generate_sql_async(user_input, thread_id)
 
     # Check if function output matches expected SQL or predefined response
     assert result == expected_output, f"Expected {expected_output}, got {result}"
+
+
+@pytest.mark.asyncio
+@patch("app.services.query_generator.get_last_n_conversations_async", new_callable=AsyncMock)
+@patch("app.services.query_generator.model.generate_content_async", new_callable=AsyncMock)
+async def test_generate_sql_async(mock_gemini, mock_redis):
+    """Test async SQL generation includes thread context in the prompt."""
+    mock_redis.return_value = ["Show all loans"]
+    mock_gemini.return_value.text = "```sql\nSELECT COUNT(*) FROM emi;\n```"
+
+    with patch("app.services.query_generator.sql_translation_cache.enabled", False):
+        result = await generate_sql_async("How many EMIs?", "thread_123")
+
+    assert result == "SELECT COUNT(*) FROM emi;"
+    prompt = mock_gemini.call_args[0][0][0]
+    assert "Show all loans" in prompt
+    assert "How many EMIs?" in prompt
+
+
+@pytest.mark.asyncio
+@patch("app.services.query_generator.get_last_n_conversations_async", new_callable=AsyncMock)
+@patch("app.services.query_generator.model.generate_content_async", new_callable=AsyncMock)
+async def test_generate_sql_async_sends_only_dynamic_prompt(mock_gemini, mock_redis):
+    """Test that the schema travels as the system instruction and token usage is recorded."""
+    mock_redis.return_value = []
+    mock_gemini.return_value.text = "SELECT COUNT(*) FROM loan;"
+
+    with patch("app.services.query_generator.sql_translation_cache.enabled", False), \
+         patch("app.services.query_generator.prompt_metrics") as mock_metrics:
+        await generate_sql_async("How many loans?")
+
+    prompt = mock_gemini.call_args[0][0][0]
+    assert SQL_SCHEMA_PROMPT not in prompt
+    assert "The loan table contains" not in prompt
+    mock_metrics.record.assert_called_once_with("sql_generation", mock_gemini.return_value)
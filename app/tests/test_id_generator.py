@@ -0,0 +1,130 @@
+import pytest
+import itertools
+import threading
+from unittest.mock import AsyncMock, MagicMock, patch
+from app.core.id_generator import IdGenerator, MAX_SEQUENCE, MAX_NODE
+
+
+def test_ids_are_unique_and_sorted_within_a_millisecond():
+    """Test that IDs from one frozen millisecond stay unique and strictly increasing."""
+    generator = IdGenerator(node_id=7)
+    with patch("app.core.id_generator.time.time", return_value=1792265930.914):
+        ids = [generator.next_id() for _ in range(1000)]
+
+    assert len(set(ids)) == 1000
+    assert ids == sorted(ids)
+    assert ids[0] == "1792265930914_00070000"
+    assert ids[-1] == "1792265930914_00070999"
+
+
+def test_exhausted_sequence_moves_to_next_millisecond():
+    """Test that the 4097th ID in a millisecond waits for the next one."""
+    generator = IdGenerator(node_id=1)
+    clock = itertools.chain([1.000] * (MAX_SEQUENCE + 3), itertools.repeat(1.0015))
+    with patch("app.core.id_generator.time.time", side_effect=lambda: next(clock)):
+        ids = [generator.next_id() for _ in range(MAX_SEQUENCE + 2)]
+
+    assert ids[-2] == f"1000_0001{MAX_SEQUENCE:04d}"
+    assert ids[-1] == "1001_00010000"
+    assert generator.stats()["sequence_waits"] == 1
+
+
+def test_clock_stepping_back_keeps_ids_increasing():
+    """Test that a backwards clock jump does not reissue or reorder IDs."""
+    generator = IdGenerator(node_id=1)
+    with patch("app.core.id_generator.time.time", side_effect=itertools.chain([5.000, 4.000], itertools.repeat(4.5))):
+        ids = [generator.next_id() for _ in range(3)]
+
+    assert ids == ["5000_00010000", "5000_00010001", "5000_00010002"]
+
+
+def test_ids_are_unique_across_threads():
+    """Test that concurrent callers never receive the same ID."""
+    generator = IdGenerator(node_id=3)
+    results = [[] for _ in range(8)]
+
+    def worker(out):
+        out.extend(generator.next_id() for _ in range(5000))
+
+    threads = [threading.Thread(target=worker, args=(out,)) for out in results]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id_ for out in results for id_ in out}) == 40000
+
+
+@pytest.fixture
+def redis_client():
+    """Async Redis client mock whose node leases are all free."""
+    client = MagicMock()
+    client.incr = AsyncMock(return_value=1)
+    client.set = AsyncMock(return_value=True)
+    client.get = AsyncMock(return_value=None)
+    client.expire = AsyncMock()
+    client.delete = AsyncMock()
+    return client
+
+
+@pytest.mark.asyncio
+async def test_lease_node_skips_taken_slots(redis_client):
+    """Test that a node is claimed with SET NX EX, moving past slots other workers hold."""
+    redis_client.incr.return_value = 1024
+    redis_client.set.side_effect = [None, None, True]  # Nodes 0 and 1 are leased
+    generator = IdGenerator()
+
+    assert await generator.lease_node(redis_client, ttl=30) == 2
+    redis_client.set.assert_awaited_with("id_generator:node:2", generator._owner, nx=True, ex=30)
+    assert generator.stats()["leased"]
+    await generator.release_node()
+
+
+@pytest.mark.asyncio
+async def test_lease_node_fails_when_every_node_is_leased(redis_client):
+    """Test that a full node space is reported instead of sharing a node."""
+    redis_client.set.return_value = None
+
+    with pytest.raises(RuntimeError):
+        await IdGenerator().lease_node(redis_client)
+    assert redis_client.set.await_count == MAX_NODE + 1
+
+
+@pytest.mark.asyncio
+async def test_configured_node_is_not_leased(redis_client):
+    """Test that ID_NODE bypasses Redis."""
+    assert await IdGenerator(node_id=9).lease_node(redis_client) == 9
+    redis_client.set.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_renew_lease(redis_client):
+    """Test that renewal extends an owned lease and moves off a node another worker took."""
+    generator = IdGenerator()
+    await generator.lease_node(redis_client, ttl=30)
+    node_id = generator.node_id
+
+    redis_client.get.return_value = generator._owner
+    await generator.renew_lease()
+    redis_client.expire.assert_awaited_once_with(f"id_generator:node:{node_id}", 30)
+
+    redis_client.get.return_value = "another-worker"
+    redis_client.incr.return_value = 5
+    await generator.renew_lease()
+    assert generator.node_id == 5
+
+    await generator.release_node()
+    redis_client.delete.assert_not_awaited()  # Node 5's lease reads as another worker's
+
+
+@pytest.mark.asyncio
+async def test_release_node_frees_owned_lease(redis_client):
+    """Test that shutdown deletes the lease so the node can be reused at once."""
+    generator = IdGenerator()
+    await generator.lease_node(redis_client)
+    redis_client.get.return_value = generator._owner
+
+    await generator.release_node()
+
+    redis_client.delete.assert_awaited_once_with(f"id_generator:node:{generator.node_id}")
+    assert not generator.stats()["leased"]
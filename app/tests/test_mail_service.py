@@ -0,0 +1,143 @@
+import pytest
+import asyncio
+import smtplib
+from email import message_from_bytes
+from email.mime.text import MIMEText
+from unittest.mock import MagicMock, patch
+from app.services.mail_service import MailSender, SMTPTransport, FileTransport
+from app.core.helper import send_email
+
+
+def _message(to="admin@example.com"):
+    message = MIMEText("<p>hello</p>", "html")
+    message["From"] = "bot@example.com"
+    message["To"] = to
+    message["Subject"] = "Test"
+    return message
+
+
+class FlakyTransport:
+    """Transport that fails the first `failures` sends"""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.sent = []
+        self.closed = 0
+
+    def send(self, message):
+        if self.failures:
+            self.failures -= 1
+            raise smtplib.SMTPServerDisconnected("connection lost")
+        self.sent.append(message["To"])
+
+    def close(self):
+        self.closed += 1
+
+
+@pytest.mark.asyncio
+async def test_send_is_queued_and_delivered_off_loop():
+    """Test that send returns once queued and the worker delivers it."""
+    transport = FlakyTransport()
+    sender = MailSender(transport)
+    await sender.start()
+
+    assert await sender.send(_message())
+    await sender.stop()
+
+    assert transport.sent == ["admin@example.com"]
+    assert sender.stats()["sent"] == 1
+    assert transport.closed == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_send_is_retried_with_backoff():
+    """Test that a failed send is requeued and delivered on a later attempt."""
+    transport = FlakyTransport(failures=1)
+    sender = MailSender(transport, max_attempts=3, retry_backoff=0.01)
+    await sender.start()
+
+    await sender.send(_message())
+    for _ in range(100):
+        if transport.sent:
+            break
+        await asyncio.sleep(0.01)
+    await sender.stop()
+
+    assert transport.sent == ["admin@example.com"]
+    assert sender.stats()["retried"] == 1
+    assert sender.stats()["failed"] == 0
+
+
+@pytest.mark.asyncio
+async def test_send_gives_up_after_max_attempts():
+    """Test that a message is marked failed once its attempts are used up."""
+    sender = MailSender(FlakyTransport(failures=5), max_attempts=2, retry_backoff=0.01)
+    await sender.start()
+
+    await sender.send(_message())
+    for _ in range(100):
+        if sender.stats()["failed"]:
+            break
+        await asyncio.sleep(0.01)
+    await sender.stop()
+
+    assert sender.stats()["failed"] == 1
+    assert sender.stats()["retried"] == 1
+
+
+@pytest.mark.asyncio
+async def test_full_queue_drops_message():
+    """Test that a full queue refuses new mail instead of growing without bound."""
+    sender = MailSender(FlakyTransport(), queue_size=1, shutdown_timeout=0.01)
+    await sender.start()
+    sender._task.cancel()  # Keep the worker from draining the queue
+
+    assert await sender.send(_message())
+    assert not await sender.send(_message())
+    assert sender.stats()["dropped"] == 1
+    await sender.stop()
+
+
+def test_smtp_transport_reuses_connection():
+    """Test that STARTTLS and login happen once and a dropped session is reopened."""
+    with patch("app.services.mail_service.smtplib.SMTP") as mock_smtp:
+        server = MagicMock()
+        mock_smtp.return_value = server
+        transport = SMTPTransport("smtp.example.com", 587, "bot@example.com", "secret")
+
+        transport.send(_message())
+        transport.send(_message())
+        assert mock_smtp.call_count == 1
+        server.login.assert_called_once_with("bot@example.com", "secret")
+
+        server.send_message.side_effect = [smtplib.SMTPServerDisconnected("idle timeout"), None]
+        transport.send(_message())
+        assert transport.connections == 2
+
+        transport.close()
+        server.quit.assert_called_once()
+
+
+def test_file_transport_writes_eml(tmp_path):
+    """Test that the file sink writes a readable .eml per message."""
+    transport = FileTransport(str(tmp_path / "outbox"))
+
+    transport.send(_message())
+
+    files = list((tmp_path / "outbox").iterdir())
+    assert len(files) == 1
+    assert message_from_bytes(files[0].read_bytes())["To"] == "admin@example.com"
+
+
+@pytest.mark.asyncio
+async def test_send_email_builds_otp_message():
+    """Test that the OTP email carries the code and goes through the mail sender."""
+    transport = FlakyTransport()
+    sender = MailSender(transport)
+    with patch("app.core.helper.mail_sender", sender):
+        with patch.object(transport, "send", wraps=transport.send) as send:
+            assert await send_email("admin@example.com", "123456")
+
+    message = send.call_args.args[0]
+    assert message["To"] == "admin@example.com"
+    assert "123456" in message.get_payload()[0].get_payload()
@@ -1,64 +1,211 @@
 import pytest
-from unittest.mock import patch, MagicMock
+import asyncio
+from unittest.mock import patch, MagicMock, AsyncMock
 from datetime import datetime
+from bson import ObjectId
+from app.services import mongo_service
 from app.services.mongo_service import (
     get_conversations_by_thread,
     get_threads_by_admin,
-    insert_into_threads,
-    insert_into_conversations
+    get_thread_snapshot,
+    insert_into_threads_async,
+    insert_into_conversations_async,
+    ensure_indexes,
+    encode_cursor,
+    decode_cursor,
+    MongoWriteBuffer
 )
 
 
+def _collection(docs=None, count=0):
+    """Motor collection mock whose find() cursor chains sort/skip/limit and yields `docs`."""
+    collection = MagicMock()
+    cursor = MagicMock()
+    cursor.sort.return_value = cursor
+    cursor.skip.return_value = cursor
+    cursor.limit.return_value = cursor
+    cursor.to_list = AsyncMock(return_value=docs or [])
+    collection.find.return_value = cursor
+    collection.cursor = cursor
+    collection.count_documents = AsyncMock(return_value=count)
+    collection.insert_one = AsyncMock()
+    collection.update_one = AsyncMock()
+    collection.create_indexes = AsyncMock()
+    collection.bulk_write = AsyncMock()
+    return collection
+
+
 @pytest.fixture
 def mock_mongo():
-    """Mock MongoDB collections."""
-    with patch("app.services.mongo_service.threads_collection") as mock_threads, \
-         patch("app.services.mongo_service.conversations_collection") as mock_conversations:
+    """Mock MongoDB collections on the shared client."""
+    mongo_service._count_cache.clear()
+    mock_threads, mock_conversations = _collection(), _collection()
+    with patch("app.services.mongo_service.threads_collection", return_value=mock_threads), \
+         patch("app.services.mongo_service.conversations_collection", return_value=mock_conversations):
         yield mock_threads, mock_conversations
 
 
-def test_get_conversations_by_thread(mock_mongo):
+def _conversation(n):
+    return {"_id": ObjectId(), "conversation_id": f"conv_{n}", "query": f"Query {n}",
+            "timestamp": f"2024-03-18T12:0{n}:00Z"}
+
+
+@pytest.mark.asyncio
+async def test_get_conversations_by_thread(mock_mongo):
     """Test fetching paginated conversations for a thread."""
-    mock_threads, mock_conversations = mock_mongo
-    mock_conversations.find.return_value.sort.return_value.skip.return_value.limit.return_value = [
-        {"conversation_id": "conv_1", "query": "Hello?", "response": "Hi!", "timestamp": "2024-03-18T12:00:00Z"},
-        {"conversation_id": "conv_2", "query": "How are you?", "response": "I'm good!", "timestamp": "2024-03-18T12:01:00Z"},
-    ]
-    mock_conversations.count_documents.return_value = 2
+    _, mock_conversations = mock_mongo
+    docs = [_conversation(3), _conversation(2), _conversation(1)]
+    boundary_id = docs[1]["_id"]
+    mock_conversations.cursor.to_list.return_value = docs
+    mock_conversations.count_documents.return_value = 3
 
-    result = get_conversations_by_thread("admin_1", "thread_1", page=1, limit=2)
+    result = await get_conversations_by_thread("admin_1", "thread_1", page=1, limit=2)
 
-    assert result["total_conversations"] == 2
+    assert result["total_conversations"] == 3
+    assert result["total_pages"] == 2
     assert result["page"] == 1
-    assert result["conversations"][0]["query"] == "Hello?"
-    mock_conversations.find.assert_called_once()
+    assert [conv["conversation_id"] for conv in result["conversations"]] == ["conv_3", "conv_2"]
+    assert all("_id" not in conv for conv in result["conversations"])
+    assert decode_cursor(result["next_cursor"]) == ("2024-03-18T12:02:00Z", boundary_id)
+    mock_conversations.cursor.limit.assert_called_once_with(3)
+    mock_conversations.cursor.skip.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_get_conversations_by_thread_with_cursor(mock_mongo):
+    """Test that a cursor seeks past the previous page instead of skipping."""
+    _, mock_conversations = mock_mongo
+    mock_conversations.cursor.to_list.return_value = [_conversation(1)]
+    mock_conversations.count_documents.return_value = 3
+    last_id = ObjectId()
+    cursor = encode_cursor({"_id": last_id, "timestamp": "2024-03-18T12:02:00Z"}, "timestamp")
 
+    result = await get_conversations_by_thread("admin_1", "thread_1", limit=2, cursor=cursor)
+
+    query_filter = mock_conversations.find.call_args.args[0]
+    assert query_filter["admin_id"] == "admin_1"
+    assert {"timestamp": {"$lt": "2024-03-18T12:02:00Z"}} in query_filter["$or"]
+    assert {"timestamp": "2024-03-18T12:02:00Z", "_id": {"$lt": last_id}} in query_filter["$or"]
+    assert result["next_cursor"] is None  # Fewer than limit + 1 left
+
+
+@pytest.mark.asyncio
+async def test_get_conversations_by_thread_legacy_page_skips(mock_mongo):
+    """Test that page numbers without a cursor still work by offset."""
+    _, mock_conversations = mock_mongo
+
+    await get_conversations_by_thread("admin_1", "thread_1", page=3, limit=10)
+
+    mock_conversations.cursor.skip.assert_called_once_with(20)
+
+
+@pytest.mark.asyncio
+async def test_count_is_cached_until_insert(mock_mongo):
+    """Test that paging reuses the total and an insert into the thread refreshes it."""
+    _, mock_conversations = mock_mongo
+    mock_conversations.count_documents.return_value = 5
 
-def test_get_threads_by_admin(mock_mongo):
-    """Test fetching paginated threads for an admin."""
+    await get_conversations_by_thread("admin_1", "thread_1")
+    await get_conversations_by_thread("admin_1", "thread_1")
+    assert mock_conversations.count_documents.await_count == 1
+
+    await insert_into_conversations_async("thread_1", "admin_1", {
+        "conversation_id": "c", "query": "q", "response": "r", "timestamp": "t", "excel_path": "p"})
+    await get_conversations_by_thread("admin_1", "thread_1")
+    assert mock_conversations.count_documents.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_count_cache_is_bounded(mock_mongo):
+    """Test that expired totals are dropped and the cache stays within MONGO_COUNT_CACHE_SIZE."""
+    collection = MagicMock(count_documents=AsyncMock(return_value=3))
+    with patch("app.services.mongo_service.time.monotonic", side_effect=[0, 0, 100]):
+        for n in range(1, 4):
+            await mongo_service._cached_count(collection, {}, ("conversations", "admin_1", f"thread_{n}"))
+    assert list(mongo_service._count_cache) == [("conversations", "admin_1", "thread_3")]
+
+    with patch("app.services.mongo_service.config.MONGO_COUNT_CACHE_SIZE", 2):
+        for n in range(4, 7):
+            await mongo_service._cached_count(collection, {}, ("conversations", "admin_1", f"thread_{n}"))
+    assert list(mongo_service._count_cache) == [("conversations", "admin_1", "thread_5"),
+                                                ("conversations", "admin_1", "thread_6")]
+
+def test_decode_cursor_rejects_garbage():
+    """Test that a tampered cursor is reported as a ValueError."""
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+
+@pytest.mark.asyncio
+async def test_get_threads_by_admin(mock_mongo):
+    """Test fetching paginated threads for an admin, most recently active first."""
     mock_threads, _ = mock_mongo
-    mock_threads.find.return_value.skip.return_value.limit.return_value = [
-        {"thread_id": "thread_1", "chat_name": "Support Chat"},
-        {"thread_id": "thread_2", "chat_name": "Tech Help"},
+    mock_threads.cursor.to_list.return_value = [
+        {"_id": ObjectId(), "thread_id": "thread_1", "chat_name": "Support Chat", "end_timestamp": "2024-03-18"},
+        {"_id": ObjectId(), "thread_id": "thread_2", "chat_name": "Tech Help", "end_timestamp": None},
     ]
     mock_threads.count_documents.return_value = 2
 
-    result = get_threads_by_admin("admin_1", page=1, limit=2)
+    result = await get_threads_by_admin("admin_1", page=1, limit=2)
 
     assert result["total_threads"] == 2
-    assert len(result["threads"]) == 2
-    assert result["threads"][0]["chat_name"] == "Support Chat"
+    assert result["threads"] == [{"thread_id": "thread_1", "chat_name": "Support Chat"},
+                                 {"thread_id": "thread_2", "chat_name": "Tech Help"}]
+    assert result["next_cursor"] is None
     mock_threads.find.assert_called_once()
 
 
-def test_insert_into_threads(mock_mongo):
+@pytest.mark.asyncio
+async def test_get_thread_snapshot(mock_mongo):
+    """Test that a thread is rebuilt for Redis with its newest conversations, oldest first, and full count."""
+    mock_threads, mock_conversations = mock_mongo
+    mock_threads.find_one = AsyncMock(return_value={"_id": ObjectId(), "chat_name": "Support Chat"})
+    mock_conversations.cursor.to_list.return_value = [_conversation(3), _conversation(2)]
+    mock_conversations.count_documents.return_value = 60
+
+    snapshot = await get_thread_snapshot("admin_1", "thread_1", limit=2)
+
+    assert snapshot["chat_name"] == "Support Chat"
+    assert [conv["conversation_id"] for conv in snapshot["conversations"]] == ["conv_2", "conv_3"]
+    assert snapshot["conversation_count"] == 60
+
+    mock_threads.find_one.return_value = None
+    assert await get_thread_snapshot("admin_1", "missing", limit=2) is None
+
+
+@pytest.mark.asyncio
+async def test_get_threads_by_admin_cursor_after_null_end_timestamp(mock_mongo):
+    """Test that threads without conversations (null end_timestamp) page by _id."""
+    mock_threads, _ = mock_mongo
+    last_id = ObjectId()
+
+    await get_threads_by_admin("admin_1", cursor=encode_cursor({"_id": last_id, "end_timestamp": None}, "end_timestamp"))
+
+    assert mock_threads.find.call_args.args[0] == {"admin_id": "admin_1", "end_timestamp": None,
+                                                   "_id": {"$lt": last_id}}
+
+
+@pytest.mark.asyncio
+async def test_ensure_indexes(mock_mongo):
+    """Test that startup provisioning creates the pagination indexes."""
+    mock_threads, mock_conversations = mock_mongo
+
+    await ensure_indexes()
+
+    keys = mock_conversations.create_indexes.call_args.args[0][0].document["key"]
+    assert list(keys.items())[:3] == [("admin_id", 1), ("thread_id", 1), ("timestamp", -1)]
+    thread_keys = [list(index.document["key"]) for index in mock_threads.create_indexes.call_args.args[0]]
+    assert ["admin_id", "end_timestamp", "_id"] in thread_keys
+
+
+@pytest.mark.asyncio
+async def test_insert_into_threads_async(mock_mongo):
     """Test inserting a new thread into MongoDB."""
     mock_threads, _ = mock_mongo
-    mock_threads.insert_one = MagicMock()
 
-    insert_into_threads("thread_1", "admin_1", "Support Chat")
+    await insert_into_threads_async("thread_1", "admin_1", "Support Chat")
 
-    mock_threads.insert_one.assert_called_once()
+    mock_threads.insert_one.assert_awaited_once()
     inserted_doc = mock_threads.insert_one.call_args[0][0]
     assert inserted_doc["thread_id"] == "thread_1"
     assert inserted_doc["admin_id"] == "admin_1"
@@ -66,26 +213,127 @@ def test_insert_into_threads(mock_mongo):
     assert "start_timestamp" in inserted_doc
 
 
-def test_insert_into_conversations(mock_mongo):
-    """Test inserting a conversation and updating thread end_timestamp."""
-    _, mock_conversations = mock_mongo
-    mock_conversations.insert_one = MagicMock()
-    mock_mongo[0].update_one = MagicMock()
-
+@pytest.mark.asyncio
+async def test_insert_into_conversations_async(mock_mongo):
+    """Test the conversation insert and thread end_timestamp update."""
+    mock_threads, mock_conversations = mock_mongo
     conversation = {
-        "conversation_id": "conv_1",
-        "query": "What's up?",
-        "response": "Not much!",
+        "conversation_id": "conv_2",
+        "query": "Any overdue EMIs?",
+        "response": "Yes, 3.",
         "timestamp": datetime.utcnow().isoformat(),
         "excel_path": "/path/to/excel.xlsx"
     }
 
-    insert_into_conversations("thread_1", "admin_1", conversation)
+    await insert_into_conversations_async("thread_1", "admin_1", conversation)
 
-    mock_conversations.insert_one.assert_called_once()
-    mock_mongo[0].update_one.assert_called_once()
+    mock_conversations.insert_one.assert_awaited_once()
+    mock_threads.update_one.assert_awaited_once()
     inserted_doc = mock_conversations.insert_one.call_args[0][0]
-    assert inserted_doc["conversation_id"] == "conv_1"
-    assert inserted_doc["query"] == "What's up?"
-    assert inserted_doc["response"] == "Not much!"
+    assert inserted_doc["thread_id"] == "thread_1"
+    assert inserted_doc["query"] == "Any overdue EMIs?"
     assert inserted_doc["excel_path"] == "/path/to/excel.xlsx"
+
+
+def _conversation_record(conversation_id, timestamp):
+    return {"conversation_id": conversation_id, "query": "q", "response": "r", "timestamp": timestamp,
+            "excel_path": "p"}
+
+
+@pytest.mark.asyncio
+async def test_write_buffer_batches_into_bulk_writes(mock_mongo):
+    """Test that buffered writes reach MongoDB as one bulk_write per collection on flush."""
+    mock_threads, mock_conversations = mock_mongo
+    buffer = MongoWriteBuffer(flush_interval=60, max_batch=100)
+    await buffer.start()
+    with patch.object(mongo_service, "mongo_write_buffer", buffer):
+        await insert_into_threads_async("thread_1", "admin_1", "Support Chat", wait=False)
+        await insert_into_conversations_async("thread_1", "admin_1", _conversation_record("c1", "2024-03-18T12:01:00"),
+                                              wait=False)
+        flushed = buffer.add_conversation(mongo_service._build_conversation_doc(
+            "thread_1", "admin_1", _conversation_record("c2", "2024-03-18T12:02:00")))
+
+        assert buffer.stats()["depth"] == 3
+        mock_conversations.insert_one.assert_not_called()
+        await buffer.stop()  # Graceful shutdown flushes the rest
+
+    assert flushed.result() is True
+    conversation_ops = mock_conversations.bulk_write.call_args.args[0]
+    assert [op._doc["conversation_id"] for op in conversation_ops] == ["c1", "c2"]
+    thread_ops = mock_threads.bulk_write.call_args.args[0]
+    assert thread_ops[0]._doc["thread_id"] == "thread_1"  # Insert before the end_timestamp update
+    assert len(thread_ops) == 2
+    assert thread_ops[1]._doc == {"$set": {"end_timestamp": "2024-03-18T12:02:00"}}
+    assert buffer.stats()["depth"] == 0
+    assert buffer.stats()["conversations_written"] == 2
+
+
+@pytest.mark.asyncio
+async def test_write_buffer_flushes_at_max_batch(mock_mongo):
+    """Test that a full batch is flushed without waiting for the interval."""
+    _, mock_conversations = mock_mongo
+    buffer = MongoWriteBuffer(flush_interval=60, max_batch=2)
+    await buffer.start()
+    futures = [buffer.add_conversation(mongo_service._build_conversation_doc(
+        "thread_1", "admin_1", _conversation_record(f"c{i}", "t"))) for i in range(2)]
+
+    await asyncio.wait_for(asyncio.gather(*futures), timeout=1)
+
+    mock_conversations.bulk_write.assert_awaited_once()
+    await buffer.stop()
+
+
+@pytest.mark.asyncio
+async def test_write_buffer_surfaces_failures_to_waiters(mock_mongo):
+    """Test that a failed flush is reported to callers awaiting durability."""
+    _, mock_conversations = mock_mongo
+    mock_conversations.bulk_write.side_effect = RuntimeError("not primary")
+    buffer = MongoWriteBuffer(flush_interval=0.01)
+    await buffer.start()
+
+    with patch.object(mongo_service, "mongo_write_buffer", buffer):
+        with pytest.raises(RuntimeError):
+            await insert_into_conversations_async("thread_1", "admin_1", _conversation_record("c1", "t"), wait=True)
+
+    await buffer.stop()
+    assert buffer.stats()["failed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_write_buffer_settles_each_collection_separately(mock_mongo):
+    """Test that a failed threads write does not fail conversations that were written."""
+    mock_threads, _ = mock_mongo
+    mock_threads.bulk_write.side_effect = RuntimeError("not primary")
+    buffer = MongoWriteBuffer(flush_interval=60)
+    await buffer.start()
+    thread = buffer.add_thread(mongo_service._build_thread_doc("thread_1", "admin_1", "Support Chat"))
+    conversation = buffer.add_conversation(mongo_service._build_conversation_doc(
+        "thread_1", "admin_1", _conversation_record("c1", "t")))
+
+    await buffer.stop()
+
+    assert conversation.result() is True
+    with pytest.raises(RuntimeError):
+        thread.result()
+    assert buffer.stats()["conversations_written"] == 1
+
+
+@pytest.mark.asyncio
+async def test_write_buffer_survives_a_malformed_batch(mock_mongo):
+    """Test that an error building a batch fails its writes but keeps the buffer running."""
+    _, mock_conversations = mock_mongo
+    buffer = MongoWriteBuffer(flush_interval=0.01)
+    await buffer.start()
+    bad = [buffer.add_conversation(mongo_service._build_conversation_doc(
+        "thread_1", "admin_1", _conversation_record(f"c{i}", timestamp))) for i, timestamp in enumerate(["t", None])]
+
+    results = await asyncio.wait_for(asyncio.gather(*bad, return_exceptions=True), timeout=1)
+    assert all(isinstance(result, TypeError) for result in results)
+    assert buffer.running
+
+    good = buffer.add_conversation(mongo_service._build_conversation_doc(
+        "thread_1", "admin_1", _conversation_record("c3", "t")))
+    assert await asyncio.wait_for(good, timeout=1) is True
+    mock_conversations.bulk_write.assert_awaited_once()
+    await buffer.stop()
+    assert not buffer.running
@@ -0,0 +1,119 @@
+import threading
+import pytest
+from unittest.mock import MagicMock, patch
+from app.services.mysql_pool import MySQLConnectionPool, PoolTimeoutError
+
+
+@pytest.fixture
+def connect():
+    """Factory returning a fresh mock connection on every call."""
+    return MagicMock(side_effect=lambda: MagicMock())
+
+
+def test_acquire_and_release_reuses_connection(connect):
+    """Test that a released connection is handed out again."""
+    pool = MySQLConnectionPool(connect, max_size=2)
+
+    conn = pool.acquire()
+    pool.release(conn)
+    again = pool.acquire()
+
+    assert again is conn
+    assert connect.call_count == 1
+    stats = pool.stats()
+    assert stats["in_use"] == 1
+    assert stats["idle"] == 0
+
+
+def test_pool_is_bounded(connect):
+    """Test that acquire times out once max_size connections are borrowed."""
+    pool = MySQLConnectionPool(connect, max_size=1, acquire_timeout=0.05)
+    pool.acquire()
+
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire()
+
+    stats = pool.stats()
+    assert stats["timeouts"] == 1
+    assert stats["waits"] == 1
+    assert connect.call_count == 1
+
+
+def test_waiter_is_woken_on_release(connect):
+    """Test that a blocked borrower receives a connection when one is released."""
+    pool = MySQLConnectionPool(connect, max_size=1, acquire_timeout=2)
+    conn = pool.acquire()
+    borrowed = []
+
+    waiter = threading.Thread(target=lambda: borrowed.append(pool.acquire()))
+    waiter.start()
+    threading.Timer(0.05, pool.release, args=(conn,)).start()
+    waiter.join(timeout=2)
+
+    assert borrowed == [conn]
+    assert pool.stats()["max_wait_seconds"] > 0
+
+
+def test_unhealthy_connection_is_replaced(connect):
+    """Test health-check-on-borrow discards connections that fail ping."""
+    pool = MySQLConnectionPool(connect, max_size=2)
+    conn = pool.acquire()
+    pool.release(conn)
+    conn.ping.side_effect = Exception("MySQL server has gone away")
+
+    fresh = pool.acquire()
+
+    assert fresh is not conn
+    conn.close.assert_called_once()
+    assert pool.stats()["health_check_failures"] == 1
+
+
+def test_max_lifetime_recycles_connection(connect):
+    """Test that connections older than max_lifetime are closed instead of reused."""
+    pool = MySQLConnectionPool(connect, max_size=2, max_lifetime=60)
+    with patch("app.services.mysql_pool.time.monotonic", return_value=1000.0):
+        conn = pool.acquire()
+        pool.release(conn)
+    with patch("app.services.mysql_pool.time.monotonic", return_value=1061.0):
+        fresh = pool.acquire()
+
+    assert fresh is not conn
+    conn.close.assert_called_once()
+
+
+def test_idle_timeout_keeps_min_size(connect):
+    """Test that idle reaping never shrinks the pool below min_size."""
+    pool = MySQLConnectionPool(connect, min_size=1, max_size=3, idle_timeout=30)
+    with patch("app.services.mysql_pool.time.monotonic", return_value=1000.0):
+        first, second = pool.acquire(), pool.acquire()
+        pool.release(first)
+        pool.release(second)
+    with patch("app.services.mysql_pool.time.monotonic", return_value=1031.0):
+        pool.acquire()
+
+    assert pool.stats()["closed"] == 1
+    assert connect.call_count == 2
+
+
+def test_discard_frees_slot(connect):
+    """Test that discarding a broken connection lets a new one be opened."""
+    pool = MySQLConnectionPool(connect, max_size=1, acquire_timeout=0.05)
+    conn = pool.acquire()
+    pool.discard(conn)
+
+    fresh = pool.acquire()
+
+    assert fresh is not conn
+    conn.close.assert_called_once()
+
+
+def test_connect_failure_does_not_leak_slot():
+    """Test that a failed connect attempt does not count against max_size."""
+    failing = MagicMock(side_effect=RuntimeError("Database connection error"))
+    pool = MySQLConnectionPool(failing, max_size=1, acquire_timeout=0.05)
+
+    for _ in range(2):
+        with pytest.raises(RuntimeError, match="Database connection error"):
+            pool.acquire()
+
+    assert pool.stats()["size"] == 0
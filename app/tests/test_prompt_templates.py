@@ -0,0 +1,132 @@
+import time
+import asyncio
+import threading
+import pytest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+from app.services.prompt_templates import (
+    SQL_SCHEMA_PROMPT,
+    CachedPromptModel,
+    PromptMetrics,
+    render_sql_prompt
+)
+
+
+def test_render_sql_prompt_is_dynamic_part_only():
+    """Test that a rendered prompt carries history and question but not the schema."""
+    prompt = render_sql_prompt("How many EMIs?", ["Show all loans", "Only disbursed ones"])
+
+    assert prompt == ("## Previous User Queries:\nShow all loans\nOnly disbursed ones\n\n"
+                      "## New User Query:\nHow many EMIs?\n")
+    assert "No previous queries." in render_sql_prompt("How many EMIs?", [])
+    assert "emi_amount" in SQL_SCHEMA_PROMPT
+
+
+@pytest.mark.asyncio
+async def test_prepare_uses_context_cache():
+    """Test that a created context cache is used until it expires."""
+    cache, cached_model = MagicMock(name="cache"), MagicMock(name="cached_model")
+    prompt_model = CachedPromptModel("gemini-2.0-flash", SQL_SCHEMA_PROMPT, cache_ttl=600)
+
+    with patch.object(prompt_model, "_count_prefix_tokens", return_value=8000), \
+         patch("app.services.prompt_templates.caching.CachedContent.create", return_value=cache) as create, \
+         patch("app.services.prompt_templates.genai.GenerativeModel.from_cached_content", return_value=cached_model):
+        assert await prompt_model.prepare()
+
+    assert create.call_args.kwargs["system_instruction"] == SQL_SCHEMA_PROMPT
+    assert prompt_model.current() is cached_model
+    assert prompt_model.stats()["context_cache"]
+
+    with patch("app.services.prompt_templates.time.time", return_value=prompt_model._expires_at + 1), \
+         patch.object(prompt_model, "refresh_in_background") as refresh:
+        assert prompt_model.current() is prompt_model.model  # Expired: fall back while it is recreated
+    refresh.assert_called_once()
+
+    await prompt_model.close()
+    cache.delete.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_prepare_falls_back_to_system_instruction():
+    """Test that a refused cache leaves the system-instruction model in place and is retried later."""
+    prompt_model = CachedPromptModel("gemini-2.0-flash", SQL_SCHEMA_PROMPT, cache_model_name="gemini-2.0-flash-001",
+                                     retry_interval=30)
+
+    with patch.object(prompt_model, "_count_prefix_tokens", return_value=8000), \
+         patch("app.services.prompt_templates.caching.CachedContent.create",
+               side_effect=Exception("Service unavailable")) as create:
+        assert not await prompt_model.prepare()
+        assert not await prompt_model.prepare()
+
+    assert create.call_args.kwargs["model"] == "gemini-2.0-flash-001"
+    assert prompt_model.use_context_cache
+    assert prompt_model._retry_at - time.time() == pytest.approx(60, abs=1)  # Backoff doubled
+    with patch.object(prompt_model, "prepare") as prepare:
+        assert prompt_model.current() is prompt_model.model
+        prepare.assert_not_called()  # Still backing off
+
+        with patch("app.services.prompt_templates.time.time", return_value=prompt_model._retry_at + 1):
+            assert prompt_model.current() is prompt_model.model
+        prepare.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_prepare_disables_cache_for_short_prefix():
+    """Test that a prefix below the model's cacheable minimum turns caching off without retries."""
+    prompt_model = CachedPromptModel("gemini-2.0-flash", SQL_SCHEMA_PROMPT, min_cache_tokens=4096)
+
+    with patch.object(prompt_model, "_count_prefix_tokens", return_value=1000) as count, \
+         patch("app.services.prompt_templates.caching.CachedContent.create") as create:
+        assert not await prompt_model.prepare()
+        assert not await prompt_model.prepare()
+
+    count.assert_called_once()
+    create.assert_not_called()
+    assert not prompt_model.use_context_cache
+    assert prompt_model.stats()["prefix_tokens"] == 1000
+    with patch.object(prompt_model, "prepare") as prepare:
+        assert prompt_model.current() is prompt_model.model
+    prepare.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_cache_created_after_timeout_is_deleted():
+    """Test that a create that outlives create_timeout does not leave a billed cache behind."""
+    cache = MagicMock(name="cache")
+    release = threading.Event()
+    prompt_model = CachedPromptModel("gemini-2.0-flash", SQL_SCHEMA_PROMPT, create_timeout=0.05)
+    prompt_model.prefix_tokens = 8000
+
+    def slow_create(**kwargs):
+        release.wait(5)
+        return cache
+
+    with patch("app.services.prompt_templates.caching.CachedContent.create", side_effect=slow_create), \
+         patch("app.services.prompt_templates.genai.GenerativeModel.from_cached_content"):
+        assert not await prompt_model.prepare()
+        release.set()
+        for _ in range(100):
+            if cache.delete.called:
+                break
+            await asyncio.sleep(0.01)
+
+    cache.delete.assert_called_once()
+    assert prompt_model.current() is prompt_model.model
+
+
+def test_prompt_metrics_records_usage():
+    """Test that token counts are aggregated per call site."""
+    metrics = PromptMetrics()
+    usage = SimpleNamespace(prompt_token_count=120, cached_content_token_count=900,
+                            candidates_token_count=30, total_token_count=1050)
+
+    metrics.record("sql_generation", SimpleNamespace(usage_metadata=usage))
+    metrics.record("sql_generation", SimpleNamespace(usage_metadata=usage))
+    assert metrics.record("format", SimpleNamespace()) is None
+
+    stats = metrics.stats()["sql_generation"]
+    assert stats["calls"] == 2
+    assert stats["prompt_token_count_total"] == 240
+    assert stats["cached_content_token_count_mean"] == 900
+    assert stats["last"]["candidates_token_count"] == 30
+    assert "format" not in metrics.stats()
@@ -0,0 +1,76 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from app.services.rate_limiter import LoginRateLimiter, RateLimitExceeded
+
+
+@pytest.fixture
+def redis_client():
+    """Async Redis client mock with a pipeline usable as an async context manager."""
+    client = MagicMock()
+    client.delete = AsyncMock()
+    pipe = MagicMock()
+    pipe.execute = AsyncMock()
+    client.pipeline.return_value.__aenter__.return_value = pipe
+    client.pipe = pipe
+    return client
+
+
+@pytest.mark.asyncio
+async def test_attempts_within_limits_pass(redis_client):
+    """Test that both counters are bumped in one transaction and pass under their limits."""
+    redis_client.pipe.execute.return_value = [True, 1, 300, None, 4, 120]
+    limiter = LoginRateLimiter(max_per_email=5, max_per_ip=20, window=300, redis_client=redis_client)
+
+    await limiter.hit(" Admin@Example.com", "10.0.0.1")
+
+    redis_client.pipeline.assert_called_once_with(transaction=True)
+    keys = [call.args[0] for call in redis_client.pipe.incr.call_args_list]
+    assert keys == ["login_attempts:email:admin@example.com", "login_attempts:ip:10.0.0.1"]
+    redis_client.pipe.set.assert_any_call("login_attempts:ip:10.0.0.1", 0, ex=300, nx=True)
+
+
+@pytest.mark.asyncio
+async def test_email_over_limit_is_rejected(redis_client):
+    """Test that the sixth attempt on one email is refused with the window's remaining time."""
+    redis_client.pipe.execute.return_value = [None, 6, 250, None, 6, 250]
+    limiter = LoginRateLimiter(max_per_email=5, max_per_ip=20, redis_client=redis_client)
+
+    with pytest.raises(RateLimitExceeded) as exc_info:
+        await limiter.hit("admin@example.com", "10.0.0.1")
+
+    assert exc_info.value.scope == "email"
+    assert exc_info.value.retry_after == 250
+    assert limiter.stats()["limited"] == 1
+
+
+@pytest.mark.asyncio
+async def test_ip_over_limit_is_rejected(redis_client):
+    """Test that one IP cycling through emails is still limited."""
+    redis_client.pipe.execute.return_value = [True, 1, 300, None, 21, 40]
+    limiter = LoginRateLimiter(max_per_email=5, max_per_ip=20, redis_client=redis_client)
+
+    with pytest.raises(RateLimitExceeded) as exc_info:
+        await limiter.hit("new@example.com", "10.0.0.1")
+
+    assert exc_info.value.scope == "IP"
+
+
+@pytest.mark.asyncio
+async def test_redis_failure_lets_attempt_through(redis_client):
+    """Test that an unreachable Redis does not block logins."""
+    redis_client.pipe.execute.side_effect = ConnectionError("redis down")
+    limiter = LoginRateLimiter(redis_client=redis_client)
+
+    await limiter.hit("admin@example.com", "10.0.0.1")
+
+    assert limiter.stats()["errors"] == 1
+
+
+@pytest.mark.asyncio
+async def test_reset_clears_email_counter(redis_client):
+    """Test that a successful login forgets the email's failed attempts."""
+    limiter = LoginRateLimiter(redis_client=redis_client)
+
+    await limiter.reset("Admin@example.com")
+
+    redis_client.delete.assert_awaited_once_with("login_attempts:email:admin@example.com")
@@ -1,13 +1,16 @@
 import json
 import pytest
 import redis
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
+from app.core import json_codec
 from app.services.redis_service import (
-    insert_into_redis,
-    append_conversation,
-    get_from_redis,
     store_excel_path,
-    get_excel_path
+    get_excel_path,
+    append_conversation_async,
+    insert_into_redis_async,
+    get_from_redis_async,
+    memory_report,
+    get_last_n_conversations_async
 )
 
 # Mock Redis client
@@ -17,12 +20,55 @@ def mock_redis():
         yield mock_redis_client
 
 
-def test_insert_into_redis(mock_redis):
-    """Test inserting a chat thread into Redis."""
-    mock_redis.hset = MagicMock()
-    mock_redis.rpush = MagicMock()
+def test_store_excel_path(mock_redis):
+    """Test storing an Excel file path in Redis."""
+    mock_redis.set = MagicMock()
     mock_redis.expire = MagicMock()
 
+    conversation_id = "conv_1"
+    file_path = "/path/to/excel.xlsx"
+
+    store_excel_path(conversation_id, file_path)
+
+    mock_redis.set.assert_called_with(f"excel:{conversation_id}", file_path)
+    mock_redis.expire.assert_called_with(f"excel:{conversation_id}", 10800)
+
+
+def test_get_excel_path(mock_redis):
+    """Test retrieving an Excel file path from Redis."""
+    mock_redis.get.return_value = "/path/to/excel.xlsx"
+
+    file_path = get_excel_path("conv_1")
+
+    assert file_path == "/path/to/excel.xlsx"
+    mock_redis.get.assert_called_with("excel:conv_1")
+
+
+@pytest.fixture
+def mock_async_redis():
+    with patch("app.services.redis_service.async_redis_client", new_callable=AsyncMock) as mock_client:
+        # Commands queue synchronously on the pipeline; only execute() is awaited
+        pipe = MagicMock()
+        pipe.execute = AsyncMock()
+        pipe.exists = AsyncMock(return_value=1)
+        mock_client.pipeline = MagicMock()
+        mock_client.pipeline.return_value.__aenter__.return_value = pipe
+        mock_client.pipe = pipe
+
+        async def transaction(func, *watches):
+            # WATCH, run func, then EXEC whatever it queued after MULTI
+            await func(pipe)
+            return await pipe.execute() if pipe.multi.called else []
+
+        mock_client.transaction = AsyncMock(side_effect=transaction)
+        yield mock_client
+
+
+@pytest.mark.asyncio
+async def test_insert_into_redis(mock_async_redis):
+    """Test inserting a chat thread into Redis in one MULTI/EXEC round trip."""
+    pipe = mock_async_redis.pipe
+
     data = {
         "thread_id": "123",
         "admin_id": "admin_1",
@@ -33,77 +79,206 @@ def test_insert_into_redis(mock_redis):
         ]
     }
 
-    response = insert_into_redis(data)
+    response = await insert_into_redis_async(data)
 
     assert response == {"message": "Chat thread inserted successfully", "thread_id": "123"}
-    mock_redis.hset.assert_called_once()
-    mock_redis.expire.assert_called()
+    mock_async_redis.pipeline.assert_called_once_with(transaction=True)
+    pipe.hset.assert_called_once()
+    assert pipe.hset.call_args.kwargs["mapping"]["conversation_count"] == 2
+    pipe.rpush.assert_any_call(
+        "admin_thread:123:conversations",
+        json_codec.dumps(data["conversations"][0]),
+        json_codec.dumps(data["conversations"][1])
+    )
+    pipe.rpush.assert_any_call("admin_thread:123:context", "Hello?", "How are you?")
+    pipe.ltrim.assert_any_call("admin_thread:123:context", -10, -1)
+    pipe.ltrim.assert_any_call("admin_thread:123:conversations", -50, -1)
+    assert pipe.expire.call_count == 3
+    pipe.execute.assert_awaited_once()
 
 
-def test_append_conversation(mock_redis):
+@pytest.mark.asyncio
+async def test_append_conversation(mock_async_redis):
     """Test appending a conversation to an existing thread in Redis."""
-    mock_redis.rpush = MagicMock()
-    mock_redis.expire = MagicMock()
-    mock_redis.llen = MagicMock(return_value=3)
+    pipe = mock_async_redis.pipe
+    pipe.execute.return_value = [3, True, 1, True, True, 1, True, True]  # HINCRBY reply is the conversation count
 
     thread_id = "123"
     conversation = {"conversation_id": "conv_3", "query": "What's up?"}
 
-    response = append_conversation(thread_id, conversation)
+    response = await append_conversation_async(thread_id, conversation)
 
     assert response["status"] == "success"
     assert response["total_conversations"] == 3
-    mock_redis.rpush.assert_called_once()
-    mock_redis.expire.assert_called()
+    assert mock_async_redis.transaction.call_args.args[1:] == ("admin_thread:123",)  # Appends only while the hash exists
+    pipe.hincrby.assert_called_once_with("admin_thread:123", "conversation_count", 1)
+    pipe.rpush.assert_any_call("admin_thread:123:context", "What's up?")
+    assert pipe.ltrim.call_count == 2  # Both lists are capped
+    assert pipe.expire.call_count == 3
+    mock_async_redis.llen.assert_not_awaited()
 
 
-def test_get_from_redis(mock_redis):
-    """Test retrieving a thread from Redis."""
-    mock_redis.exists.return_value = True
-    mock_redis.hgetall.return_value = {
-        "thread_id": "123",
-        "admin_id": "admin_1",
-        "chat_name": "Support Chat"
-    }
-    mock_redis.lrange.return_value = [json.dumps({"conversation_id": "conv_1", "query": "Hello?"})]
+@pytest.mark.asyncio
+async def test_get_from_redis(mock_async_redis):
+    """Test retrieving a thread from Redis with one pipeline and one MGET."""
+    pipe = mock_async_redis.pipe
+    pipe.execute.return_value = [
+        {"thread_id": "123", "admin_id": "admin_1", "chat_name": "Support Chat"},
+        2,
+        [json.dumps({"conversation_id": "conv_1", "query": "Hello?"}),
+         json.dumps({"conversation_id": "conv_2", "query": "Bye?"})]
+    ]
+    mock_async_redis.mget.return_value = ["/path/to/excel.xlsx", None]
 
-    with patch("app.services.redis_service.get_excel_path", return_value="/path/to/excel.xlsx"):
-        response = get_from_redis("123")
+    response = await get_from_redis_async("123")
 
     assert response["thread_details"]["thread_id"] == "123"
-    assert len(response["conversations"]) == 1
+    assert [conv["conversation_id"] for conv in response["conversations"]] == ["conv_1", "conv_2"]
     assert response["conversations"][0]["excel_path"] == "/path/to/excel.xlsx"
+    assert "excel_path" not in response["conversations"][1]
+    pipe.lrange.assert_called_once_with("admin_thread:123:conversations", 0, -1)
+    mock_async_redis.mget.assert_awaited_once_with(["excel:conv_1", "excel:conv_2"])
+    mock_async_redis.get.assert_not_awaited()
+
 
+@pytest.mark.asyncio
+async def test_get_from_redis_paged(mock_async_redis):
+    """Test that paging reads only an LRANGE window, newest first."""
+    pipe = mock_async_redis.pipe
+    pipe.execute.return_value = [
+        {"thread_id": "123"},
+        25,
+        [json.dumps({"conversation_id": "conv_14"}), json.dumps({"conversation_id": "conv_15"})]
+    ]
+    mock_async_redis.mget.return_value = [None, None]
 
-def test_get_from_redis_thread_not_found(mock_redis):
+    response = await get_from_redis_async("123", page=2, limit=10)
+
+    pipe.lrange.assert_called_once_with("admin_thread:123:conversations", -20, -11)
+    assert [conv["conversation_id"] for conv in response["conversations"]] == ["conv_15", "conv_14"]
+    assert response["total_conversations"] == 25
+    assert response["total_pages"] == 3
+
+
+@pytest.mark.asyncio
+async def test_get_from_redis_thread_not_found(mock_async_redis):
     """Test retrieving a non-existent thread from Redis."""
-    mock_redis.exists.return_value = False
+    pipe = mock_async_redis.pipe
+    pipe.execute.return_value = [{}, 0, []]
 
-    response, status_code = get_from_redis("999")
+    response, status_code = await get_from_redis_async("999")
 
     assert response == {"message": "Thread not found"}
     assert status_code == 404
+    mock_async_redis.mget.assert_not_awaited()
 
 
-def test_store_excel_path(mock_redis):
-    """Test storing an Excel file path in Redis."""
-    mock_redis.set = MagicMock()
-    mock_redis.expire = MagicMock()
+@pytest.mark.asyncio
+async def test_append_conversation_to_expired_thread(mock_async_redis):
+    """Test that an expired thread is not recreated as a partial hash by the append."""
+    mock_async_redis.pipe.exists.return_value = 0
 
-    conversation_id = "conv_1"
-    file_path = "/path/to/excel.xlsx"
+    response = await append_conversation_async("123", {"conversation_id": "conv_4", "query": "Hi"})
 
-    store_excel_path(conversation_id, file_path)
+    assert response["total_conversations"] is None
+    mock_async_redis.pipe.hincrby.assert_not_called()
+    mock_async_redis.pipe.rpush.assert_not_called()
+    mock_async_redis.pipe.execute.assert_not_awaited()
 
-    mock_redis.set.assert_called_with(f"excel:{conversation_id}", file_path)
-    mock_redis.expire.assert_called_with(f"excel:{conversation_id}", 10800)
 
+@pytest.mark.asyncio
+async def test_insert_into_redis_async(mock_async_redis):
+    """Test inserting a thread through the async Redis client in one round trip."""
+    data = {"thread_id": "123", "admin_id": "admin_1", "chat_name": "Loans",
+            "conversations": [{"conversation_id": "conv_1", "query": "Show loans"}]}
 
-def test_get_excel_path(mock_redis):
-    """Test retrieving an Excel file path from Redis."""
-    mock_redis.get.return_value = "/path/to/excel.xlsx"
+    response = await insert_into_redis_async(data, ttl=60)
 
-    file_path = get_excel_path("conv_1")
+    assert response["thread_id"] == "123"
+    pipe = mock_async_redis.pipe
+    pipe.hset.assert_called_once_with("admin_thread:123", mapping={
+        "thread_id": "123", "admin_id": "admin_1", "chat_name": "Loans", "conversation_count": 1})
+    pipe.rpush.assert_any_call("admin_thread:123:conversations", json_codec.dumps(data["conversations"][0]))
+    pipe.rpush.assert_any_call("admin_thread:123:context", "Show loans")
+    pipe.expire.assert_any_call("admin_thread:123:conversations", 60)
+    pipe.execute.assert_awaited_once()
 
-    assert file_path == "/path/to/excel.xlsx"
-    mock_redis.get.assert_called_with("excel:conv_1")
+    await insert_into_redis_async({**data, "conversation_count": 60})  # Re-cached from MongoDB with older history
+    assert pipe.hset.call_args.kwargs["mapping"]["conversation_count"] == 60
+
+
+@pytest.mark.asyncio
+async def test_get_last_n_conversations_async(mock_async_redis):
+    """Test fetching recent queries from the thread's context window."""
+    mock_async_redis.lrange.return_value = ["Show loans", "Only active ones"]
+
+    queries = await get_last_n_conversations_async("123", n=5)
+
+    assert queries == ["Show loans", "Only active ones"]
+    mock_async_redis.lrange.assert_awaited_once_with("admin_thread:123:context", -5, -1)
+
+
+@pytest.mark.asyncio
+async def test_get_last_n_conversations_async_falls_back_to_records(mock_async_redis):
+    """Test that threads cached without a context window still return their queries."""
+    mock_async_redis.lrange.side_effect = [[], [
+        json.dumps({"conversation_id": "conv_1", "query": "Show loans"}),
+        json.dumps({"conversation_id": "conv_2"})
+    ]]
+
+    queries = await get_last_n_conversations_async("123", n=5)
+
+    assert queries == ["Show loans"]
+    mock_async_redis.lrange.assert_awaited_with("admin_thread:123:conversations", -5, -1)
+
+
+@pytest.mark.asyncio
+async def test_memory_report(mock_async_redis):
+    """Test that memory is summed per key pattern from pipelined MEMORY USAGE."""
+    keys = {"admin_thread:*": ["admin_thread:1", "admin_thread:1:conversations"], "excel:*": ["excel:c1"], "otp:*": [],
+            "revoked_token:*": [], "login_attempts:*": []}
+
+    async def scan_iter(match, count):
+        for key in keys[match]:
+            yield key
+
+    mock_async_redis.scan_iter = scan_iter
+    mock_async_redis.pipe.execute.side_effect = [[120, 4096], [None]]  # excel:c1 expired mid-scan
+
+    report = await memory_report()
+
+    assert report["admin_thread:*"] == {"keys": 2, "bytes": 4216, "largest_key": "admin_thread:1:conversations",
+                                        "largest_bytes": 4096}
+    assert report["excel:*"]["keys"] == 0
+    assert report["otp:*"]["bytes"] == 0
+
+
+@pytest.mark.asyncio
+async def test_get_from_redis_async(mock_async_redis):
+    """Test retrieving a thread through the async Redis client."""
+    mock_async_redis.pipe.execute.return_value = [
+        {"thread_id": "123"}, 1, [json.dumps({"conversation_id": "conv_1"})]
+    ]
+    mock_async_redis.mget.return_value = ["/path/to/conv_1.xlsx"]
+
+    response = await get_from_redis_async("123")
+
+    assert response["conversations"] == [{"conversation_id": "conv_1", "excel_path": "/path/to/conv_1.xlsx"}]
+    mock_async_redis.mget.assert_awaited_once_with(["excel:conv_1"])
+
+
+@pytest.mark.parametrize("backend", ["orjson", "json"])
+def test_json_codec_round_trip(backend):
+    """Test that both codec backends write compact JSON readable by the other."""
+    record = {"conversation_id": "conv_1", "query": "Show loans", "rows": 3, "cols": ["loan_id"]}
+    orjson_module = json_codec.orjson if backend == "orjson" else None
+    if backend == "orjson" and orjson_module is None:
+        pytest.skip("orjson not installed")
+
+    with patch.object(json_codec, "orjson", orjson_module):
+        encoded = json_codec.dumps(record)
+
+    assert isinstance(encoded, str)
+    assert json.loads(encoded) == record
+    assert json_codec.loads(json.dumps(record)) == record
+    assert ", " not in encoded
@@ -0,0 +1,117 @@
+import pytest
+import datetime
+from decimal import Decimal
+from unittest.mock import AsyncMock, MagicMock
+from app.services.result_cache import (
+    QueryResultCache,
+    canonicalize_sql,
+    parse_table_ttls,
+    encode_results,
+    decode_results
+)
+
+
+@pytest.fixture
+def redis_client():
+    """Async Redis client mock with a pipeline usable as an async context manager."""
+    client = MagicMock()
+    client.get = AsyncMock(return_value=None)
+    client.smembers = AsyncMock(return_value=set())
+    pipe = MagicMock()
+    pipe.execute = AsyncMock()
+    client.pipeline.return_value.__aenter__.return_value = pipe
+    client.pipe = pipe
+    return client
+
+
+def test_canonicalize_sql():
+    """Test that formatting differences collapse but literals are preserved."""
+    a = canonicalize_sql("SELECT  COUNT(*)\n FROM loan WHERE status = 'DISBURSED';")
+    b = canonicalize_sql("select count( * ) from LOAN where status='DISBURSED'")
+    c = canonicalize_sql("select count(*) from loan where status='disbursed'")
+
+    assert a == b
+    assert a != c
+
+
+def test_parse_table_ttls():
+    """Test parsing of the per-table TTL specification."""
+    assert parse_table_ttls("loan=300, emi=60,bogus") == {"loan": 300, "emi": 60}
+
+
+def test_results_round_trip_types():
+    """Test that MySQL column types survive the cache encoding."""
+    rows = [{
+        "principal": Decimal("50000.25"),
+        "disbursed_date": datetime.date(2024, 3, 1),
+        "created_at": datetime.datetime(2024, 3, 1, 10, 30),
+        "duration": datetime.timedelta(hours=2),
+        "blob": b"\x00\x01",
+        "status": "DISBURSED",
+    }]
+
+    assert decode_results(encode_results(rows)) == rows
+
+
+@pytest.mark.asyncio
+async def test_set_uses_shortest_table_ttl(redis_client):
+    """Test that a join is cached for the shortest TTL of its tables and indexed per table."""
+    cache = QueryResultCache(redis_client, table_ttls={"loan": 300, "emi": 60})
+    sql = "SELECT e.emi_amount FROM emi e JOIN loan l ON e.loan_id = l.loan_id"
+
+    assert await cache.set(sql, [{"emi_amount": Decimal("10.5")}])
+
+    pipe = redis_client.pipe
+    assert pipe.set.call_args.kwargs["ex"] == 60
+    indexed = {call.args[0] for call in pipe.sadd.call_args_list}
+    assert indexed == {"result_cache:table:emi", "result_cache:table:loan"}
+
+
+@pytest.mark.asyncio
+async def test_get_hit_and_miss(redis_client):
+    """Test cache lookups decode stored rows and count hits/misses."""
+    cache = QueryResultCache(redis_client)
+    assert await cache.get("SELECT * FROM loan") is None
+
+    redis_client.get.return_value = encode_results({"rows": [{"principal": Decimal("1.5")}], "truncated": True})
+    assert await cache.get("select * from loan;") == ([{"principal": Decimal("1.5")}], True)
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_oversize_and_unknown_tables_are_skipped(redis_client):
+    """Test that huge results and queries on unknown tables are not cached."""
+    cache = QueryResultCache(redis_client, max_bytes=100)
+
+    assert not await cache.set("SELECT * FROM loan", [{"loan_id": i} for i in range(100)])
+    assert not await cache.set("SELECT * FROM audit_log", [{"id": 1}])
+
+    redis_client.pipe.set.assert_not_called()
+    stats = cache.stats()
+    assert stats["skipped_oversize"] == 1
+    assert stats["skipped_uncacheable"] == 1
+
+
+@pytest.mark.asyncio
+async def test_invalidate_table(redis_client):
+    """Test that invalidating a table deletes its dependent entries and index."""
+    cache = QueryResultCache(redis_client)
+    redis_client.smembers.return_value = {"result_cache:a", "result_cache:b"}
+
+    removed = await cache.invalidate_table("EMI")
+
+    assert removed == 2
+    redis_client.smembers.assert_awaited_once_with("result_cache:table:emi")
+    deleted = [call.args for call in redis_client.pipe.delete.call_args_list]
+    assert set(deleted[0]) == {"result_cache:a", "result_cache:b"}
+    assert deleted[1] == ("result_cache:table:emi",)
+
+
+def test_row_cap_is_part_of_key(redis_client):
+    """Test that results fetched under different row caps do not share an entry."""
+    cache = QueryResultCache(redis_client)
+
+    assert cache.make_key("SELECT * FROM emi", 100) != cache.make_key("SELECT * FROM emi", 1000)
@@ -0,0 +1,63 @@
+import datetime
+from decimal import Decimal
+from app.services.result_summary import (
+    column_stats,
+    sample_rows,
+    to_columnar,
+    summarize_results,
+    needs_summary
+)
+
+rows = [
+    {"loan_id": i, "principal": Decimal("1000.50") * i, "status": "DISBURSED" if i % 3 else "CLOSED",
+     "disbursed_date": datetime.date(2024, 1, 1) + datetime.timedelta(days=i), "remarks": None}
+    for i in range(1, 101)
+]
+
+
+def test_numeric_column_stats():
+    stats = column_stats(rows, "loan_id")
+
+    assert stats == {"count": 100, "nulls": 0, "type": "numeric", "min": 1, "max": 100, "mean": 50.5, "sum": 5050}
+
+
+def test_text_and_date_column_stats():
+    status = column_stats(rows, "status", top_k=1)
+    dates = column_stats(rows, "disbursed_date")
+
+    assert status["distinct"] == 2
+    assert status["top"] == [["DISBURSED", 67]]
+    assert (dates["min"], dates["max"]) == ("2024-01-02", "2024-04-10")
+
+
+def test_empty_column_stats():
+    assert column_stats(rows, "remarks") == {"count": 0, "nulls": 100, "type": "empty"}
+
+
+def test_sample_rows_spread():
+    """Test that the sample is evenly spread and keeps both ends."""
+    sample = sample_rows(rows, 5)
+
+    assert [row["loan_id"] for row in sample] == [1, 26, 51, 75, 100]
+    assert sample_rows(rows[:3], 5) == rows[:3]
+
+
+def test_summary_is_bounded():
+    """Test the summary size does not grow with the number of rows."""
+    big = rows * 100
+    summary = summarize_results(big, sample_size=10)
+
+    assert summary["row_count"] == 10000
+    assert len(summary["sample"]["rows"]) == 10
+    assert summary["sample"]["columns"] == list(rows[0].keys())
+    assert summary["column_stats"]["principal"]["count"] == 10000
+
+
+def test_to_columnar():
+    assert to_columnar([{"a": 1, "b": 2}], ["a", "b"]) == {"columns": ["a", "b"], "rows": [[1, 2]]}
+
+
+def test_needs_summary():
+    assert not needs_summary(rows[:50], 50)
+    assert needs_summary(rows[:51], 50)
+    assert not needs_summary({"error": "boom"}, 0)
@@ -0,0 +1,143 @@
+import pytest
+from unittest.mock import AsyncMock, patch
+from app.services.sql_cache import SQLTranslationCache, normalize_question
+
+SCHEMA = "We have four tables: loan, emi, user_information, users."
+
+
+@pytest.fixture
+def redis_client():
+    """Async Redis client mock that behaves like an empty cache."""
+    client = AsyncMock()
+    client.get.return_value = None
+    return client
+
+
+@pytest.mark.parametrize(
+    "question, fuzzy, expected",
+    [
+        ("  Total disbursed loans   this month? ", False, "total disbursed loans this month"),
+        ("Show me total disbursed loans this month?", True, "total disbursed loan this month"),
+        ("this month's total disbursed loan", True, "this month total disbursed loan"),
+        ("List overdue EMIs", True, "list overdue emi"),
+        ("loans after 2023 before 2024", True, "loan after 2023 before 2024"),
+    ]
+)
+def test_normalize_question(question, fuzzy, expected):
+    """Test exact and fuzzy question normalization."""
+    assert normalize_question(question, fuzzy) == expected
+
+
+@pytest.mark.asyncio
+async def test_miss_then_local_hit(redis_client):
+    """Test that a stored translation is served from the in-process LRU."""
+    cache = SQLTranslationCache(redis_client, SCHEMA)
+
+    assert await cache.get("Total loans", []) is None
+    await cache.set("Total loans", [], "SELECT COUNT(*) FROM loan;")
+    assert await cache.get("total loans?", []) == "SELECT COUNT(*) FROM loan;"
+
+    redis_client.set.assert_awaited_once()
+    assert redis_client.set.call_args.kwargs["ex"] == 3600
+    stats = cache.stats()
+    assert stats["misses"] == 1
+    assert stats["local_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_redis_hit_populates_local_tier(redis_client):
+    """Test that a Redis hit is promoted into the in-process LRU."""
+    cache = SQLTranslationCache(redis_client, SCHEMA)
+    redis_client.get.return_value = "SELECT 1;"
+
+    assert await cache.get("anything", []) == "SELECT 1;"
+    assert await cache.get("anything", []) == "SELECT 1;"
+
+    redis_client.get.assert_awaited_once()
+    assert cache.stats()["redis_hits"] == 1
+    assert cache.stats()["local_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_context_and_schema_change_key(redis_client):
+    """Test that thread context and schema prompt are part of the key."""
+    cache = SQLTranslationCache(redis_client, SCHEMA)
+    changed = SQLTranslationCache(redis_client, SCHEMA + " New column: loan.branch")
+
+    assert cache.make_key("Total loans", []) != cache.make_key("Total loans", ["Show EMIs"])
+    assert cache.make_key("Total loans", []) != changed.make_key("Total loans", [])
+
+
+@pytest.mark.asyncio
+async def test_fuzzy_mode_matches_rephrasing(redis_client):
+    """Test that fuzzy mode serves near-identical phrasings from one entry."""
+    cache = SQLTranslationCache(redis_client, SCHEMA, fuzzy=True)
+
+    await cache.set("Show me total disbursed loans this month", [], "SELECT 1;")
+
+    assert await cache.get("total disbursed loan this month?", []) == "SELECT 1;"
+
+
+def test_fuzzy_keys_keep_token_order():
+    """Test that fuzzy keys do not merge questions that differ only in word order."""
+    cache = SQLTranslationCache(None, SCHEMA, fuzzy=True)
+
+    assert cache.make_key("loans after 2023 before 2024", []) != cache.make_key("loans before 2023 after 2024", [])
+    assert cache.make_key("EMIs due today", []) != cache.make_key("EMIs due today today", [])
+
+
+@pytest.mark.asyncio
+async def test_held_translation_served_only_after_confirm(redis_client):
+    """Test that a generated translation is not cached until it is confirmed."""
+    cache = SQLTranslationCache(redis_client, SCHEMA)
+
+    cache.hold("Total loans", [], "SELECT COUNT(*) FROM loan;")
+    assert await cache.get("Total loans", []) is None
+    redis_client.set.assert_not_awaited()
+
+    await cache.confirm("SELECT COUNT(*) FROM loan;")
+    assert await cache.get("Total loans", []) == "SELECT COUNT(*) FROM loan;"
+    assert cache.stats()["pending"] == 0
+
+    await cache.confirm("SELECT COUNT(*) FROM loan;")
+    redis_client.set.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_lru_evicts_oldest(redis_client):
+    """Test that the in-process tier is bounded."""
+    cache = SQLTranslationCache(redis_client, SCHEMA, max_local_entries=2)
+
+    for i in range(3):
+        await cache.set(f"question {i}", [], f"SELECT {i};")
+
+    assert cache.stats()["local_entries"] == 2
+    assert await cache.get("question 0", []) is None
+
+
+@pytest.mark.asyncio
+async def test_redis_errors_are_not_fatal(redis_client):
+    """Test that Redis failures degrade to a miss."""
+    redis_client.get.side_effect = ConnectionError("Redis down")
+    cache = SQLTranslationCache(redis_client, SCHEMA)
+
+    assert await cache.get("Total loans", []) is None
+    assert cache.stats()["errors"] == 1
+
+
+@pytest.mark.asyncio
+@patch("app.services.query_generator.model.generate_content_async", new_callable=AsyncMock)
+async def test_generate_sql_async_uses_cache(mock_gemini, redis_client):
+    """Test that a repeated question skips the Gemini call once its SQL has run."""
+    from app.services.query_generator import generate_sql_async, SQL_SCHEMA_PROMPT
+    mock_gemini.return_value.text = "SELECT COUNT(*) FROM loan;"
+
+    sql_cache = SQLTranslationCache(redis_client, SQL_SCHEMA_PROMPT)
+    with patch("app.services.query_generator.sql_translation_cache", sql_cache), \
+         patch("app.services.query_generator.sql_prompt_model.use_context_cache", False):
+        first = await generate_sql_async("How many loans?")
+        await sql_cache.confirm(first)
+        second = await generate_sql_async("How many loans?")
+
+    assert first == second == "SELECT COUNT(*) FROM loan;"
+    mock_gemini.assert_awaited_once()
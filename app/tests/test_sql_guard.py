@@ -0,0 +1,124 @@
+import pytest
+from unittest.mock import AsyncMock
+from app.services.sql_guard import (
+    SQLGuard,
+    UnsafeQueryError,
+    QueryTooExpensiveError,
+    estimate_rows_examined
+)
+
+
+@pytest.fixture
+def guard():
+    return SQLGuard(max_rows=100, max_rows_examined=1000, max_execution_ms=30000, explain=False)
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "SELECT 1; DROP TABLE loan",
+        "DELETE FROM loan",
+        "UPDATE loan SET status = 'CLOSED'",
+        "INSERT INTO loan VALUES (1)",
+        "SELECT * FROM loan INTO OUTFILE '/tmp/loans.csv'",
+        "SELECT * FROM loan FOR UPDATE",
+        "SELECT SLEEP(10)",
+        "SELECT /*! SLEEP(100) */ 1 FROM loan",
+        "SELECT * FROM loan /*!50000 INTO OUTFILE '/tmp/loans.csv' */",
+        "SELECT /*+ SET_VAR(sort_buffer_size = 16M) */ * FROM loan",
+        "SELECT /* loans */ * FROM loan",
+        "SELECT 1 --SLEEP(10)\nFROM loan",
+        "WITH x AS (SELECT 1)",
+        "",
+    ]
+)
+def test_validate_rejects(guard, query):
+    """Test that writes, multi-statements and side-effecting functions are refused."""
+    with pytest.raises(UnsafeQueryError):
+        guard.validate(query)
+
+
+def test_validate_accepts_reads(guard):
+    assert guard.validate("SELECT REPLACE(name, 'a', 'b') FROM users;  -- names\n") == "SELECT REPLACE(name, 'a', 'b') FROM users"
+    assert guard.validate("SELECT `update` FROM loan") == "SELECT `update` FROM loan"
+    assert guard.validate("WITH x AS (SELECT loan_id FROM loan) SELECT * FROM x")
+
+
+def test_apply_limits(guard):
+    """Test LIMIT injection and the MAX_EXECUTION_TIME hint on the outer SELECT."""
+    sql, added = guard.apply_limits("WITH x AS (SELECT loan_id FROM loan LIMIT 5) SELECT * FROM x", 101, 2000)
+
+    assert added
+    assert sql == "WITH x AS (SELECT loan_id FROM loan LIMIT 5) SELECT /*+ MAX_EXECUTION_TIME(2000) */ * FROM x LIMIT 101"
+    assert guard.apply_limits("SELECT * FROM loan LIMIT 10", 101, 0) == ("SELECT * FROM loan LIMIT 10", False)
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        ("SELECT * FROM loan LIMIT 1000000", "SELECT * FROM loan LIMIT 101"),
+        ("SELECT * FROM loan LIMIT 0, 1000000", "SELECT * FROM loan LIMIT 0, 101"),
+        ("SELECT * FROM loan LIMIT 1000000 OFFSET 5", "SELECT * FROM loan LIMIT 101 OFFSET 5"),
+    ]
+)
+def test_apply_limits_clamps_existing_limit(guard, query, expected):
+    assert guard.apply_limits(query, 101, 0) == (expected, False)
+
+
+def test_apply_limits_wraps_set_operations(guard):
+    """Test that parenthesised and UNION queries get the hint and LIMIT on an outer SELECT."""
+    sql, added = guard.apply_limits("(SELECT loan_id FROM loan) UNION (SELECT emi_id FROM emi)", 101, 2000)
+
+    assert added
+    assert sql == ("SELECT /*+ MAX_EXECUTION_TIME(2000) */ * FROM ((SELECT loan_id FROM loan) UNION "
+                   "(SELECT emi_id FROM emi)) AS guarded_query LIMIT 101")
+    sql, _ = guard.apply_limits("SELECT loan_id FROM loan UNION SELECT emi_id FROM emi", 101, 2000)
+    assert sql.startswith("SELECT /*+ MAX_EXECUTION_TIME(2000) */ * FROM (SELECT loan_id FROM loan UNION")
+
+
+def test_estimate_rows_examined():
+    """Test that joined tables multiply and separate selects add."""
+    plan = [
+        {"id": 1, "table": "l", "rows": 1000, "filtered": 10.0},
+        {"id": 1, "table": "e", "rows": 12, "filtered": 100.0},
+        {"id": 2, "table": "users", "rows": 500, "filtered": None},
+    ]
+
+    assert estimate_rows_examined(plan) == 1000 + 100 * 12 + 500
+
+
+@pytest.mark.asyncio
+async def test_prepare_rejects_expensive_query():
+    explain = AsyncMock(return_value=[{"id": 1, "rows": 100000, "filtered": 100.0},
+                                      {"id": 1, "rows": 100000, "filtered": 100.0}])
+    guard = SQLGuard(max_rows_examined=1000, explain_fn=explain)
+
+    with pytest.raises(QueryTooExpensiveError) as exc:
+        await guard.prepare("SELECT * FROM emi, loan")
+
+    assert exc.value.estimated_rows > 1000
+    assert guard.stats()["rejected_cost"] == 1
+
+
+@pytest.mark.asyncio
+async def test_prepare_downgrades_expensive_query():
+    """Test downgrade mode runs over-budget queries with a smaller cap and time limit."""
+    explain = AsyncMock(return_value=[{"id": 1, "rows": 50000, "filtered": 100.0}])
+    guard = SQLGuard(max_rows=100, max_rows_examined=1000, mode="downgrade", downgrade_rows=10,
+                     downgrade_execution_ms=500, explain_fn=explain)
+
+    guarded = await guard.prepare("SELECT * FROM emi")
+
+    assert guarded.downgraded
+    assert guarded.max_rows == 10
+    assert guarded.sql == "SELECT /*+ MAX_EXECUTION_TIME(500) */ * FROM emi LIMIT 11"
+
+
+@pytest.mark.asyncio
+async def test_prepare_survives_explain_failure():
+    guard = SQLGuard(max_rows=100, explain_fn=AsyncMock(side_effect=RuntimeError("boom")))
+
+    guarded = await guard.prepare("SELECT * FROM loan")
+
+    assert guarded.estimated_rows is None
+    assert guarded.limit_added
@@ -0,0 +1,61 @@
+import pytest
+from app.services.sql_parser import parse_sql, tokenize, SQLParseError
+
+QUERY = (
+    "WITH recent AS (SELECT loan_id, principal FROM loan WHERE disbursed_date >= CURDATE() - INTERVAL 1 MONTH) "
+    "SELECT r.loan_id, ROUND(AVG(e.emi_amount), 2) AS avg_emi FROM recent r JOIN emi e ON e.loan_id = r.loan_id "
+    "WHERE e.status = 'PAID' AND e.due_date BETWEEN '2024-01-01' AND '2024-12-31' "
+    "GROUP BY r.loan_id HAVING COUNT(*) > 2"
+)
+
+
+def test_parse_structure():
+    """Test the structured fields extracted from a CTE query with a join."""
+    parsed = parse_sql(QUERY)
+
+    assert parsed.tables == ("loan", "emi")
+    assert parsed.ctes == ("recent",)
+    assert parsed.columns == ("loan_id",)
+    assert parsed.aggregates == ("round(avg(e.emi_amount), 2)",)
+    assert parsed.alias_map == {"r": "recent", "e": "emi", "avg_emi": "round(avg(e.emi_amount), 2)"}
+    assert parsed.group_by == ("r.loan_id",)
+    assert parsed.filters == ("e.status = 'PAID'", "e.due_date between '2024-01-01' and '2024-12-31'")
+    assert parsed.having == ("count(*) > 2",)
+
+
+def test_parse_union_and_subqueries():
+    parsed = parse_sql("SELECT loan_id FROM loan WHERE user_id IN (SELECT user_id FROM users) "
+                       "UNION ALL SELECT loan_id FROM emi")
+
+    assert parsed.tables == ("loan", "users", "emi")
+    assert parsed.columns == ("loan_id",)
+    assert parsed.subqueries == 1
+
+
+def test_tokenize_keeps_literals():
+    """Test that string literals keep their case and comments are dropped."""
+    tokens = tokenize("SELECT Name FROM Users -- note\nWHERE city = 'Pune'")
+
+    assert [token.value for token in tokens] == ["select", "name", "from", "users", "where", "city", "=", "'Pune'"]
+
+
+def test_tokenize_double_dash_needs_whitespace():
+    """Test that "--" without a following space is two minus signs, as MySQL reads it."""
+    tokens = tokenize("SELECT 1 --1 /* note */", comments=True)
+
+    assert [token.value for token in tokens] == ["select", "1", "-", "-", "1", "/* note */"]
+
+
+def test_parse_is_cached():
+    """Test that repeated parses of the same text hit the LRU cache."""
+    parse_sql.cache_clear()
+    first = parse_sql("SELECT loan_id FROM loan")
+    second = parse_sql("SELECT loan_id FROM loan")
+
+    assert first is second
+    assert parse_sql.cache_info().hits == 1
+
+
+def test_parse_unbalanced():
+    with pytest.raises(SQLParseError):
+        parse_sql("SELECT (loan_id FROM loan")
@@ -0,0 +1,117 @@
+import time
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from datetime import timedelta
+from jose import jwt
+from app.core.config import JWT_SECRET_KEY, JWT_ALGORITHM
+from app.core.security import create_access_token
+from app.core.token_verifier import TokenVerifier, InvalidTokenError, decode_native, token_hash, REVOKED_PREFIX
+
+
+@pytest.fixture
+def redis_client():
+    """Async Redis client mock with no revoked tokens."""
+    client = MagicMock()
+    client.exists = AsyncMock(return_value=0)
+    client.set = AsyncMock()
+    return client
+
+
+def _verifier(redis_client, **kwargs):
+    return TokenVerifier(JWT_SECRET_KEY, JWT_ALGORITHM, redis_client=redis_client, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_verified_tokens_are_cached(redis_client):
+    """Test that a repeat token skips signature verification but is still checked for revocation."""
+    verifier = _verifier(redis_client)
+    token = create_access_token({"sub": "admin@example.com", "admin_id": "123"})
+
+    with patch("app.core.token_verifier.jwt.decode", wraps=jwt.decode) as decode:
+        first = await verifier.verify(token)
+        second = await verifier.verify(token)
+
+    assert first == second
+    assert first["admin_id"] == "123"
+    assert decode.call_count == 1
+    assert redis_client.exists.await_count == 2
+    assert verifier.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_cached_token_expires_with_exp(redis_client):
+    """Test that cache entries are dropped once the token's exp has passed."""
+    verifier = _verifier(redis_client)
+    token = create_access_token({"sub": "admin@example.com"}, timedelta(minutes=5))
+    await verifier.verify(token)
+
+    later = time.time() + 600
+    with patch("app.core.token_verifier.time.time", return_value=later), \
+         patch("app.core.token_verifier.jwt.decode", side_effect=jwt.ExpiredSignatureError("expired")) as decode:
+        with pytest.raises(InvalidTokenError):
+            await verifier.verify(token)
+
+    decode.assert_called_once()  # Re-verified rather than served from the cache
+    assert verifier.stats()["size"] == 0
+
+
+@pytest.mark.asyncio
+async def test_cache_is_bounded(redis_client):
+    """Test that the least recently used token is evicted past cache_size."""
+    verifier = _verifier(redis_client, cache_size=2)
+    for i in range(3):
+        await verifier.verify(create_access_token({"sub": f"admin{i}@example.com"}))
+
+    assert verifier.stats()["size"] == 2
+
+
+@pytest.mark.asyncio
+async def test_revoked_token_is_rejected(redis_client):
+    """Test that revocation writes a self-expiring key and evicts the cached claims."""
+    verifier = _verifier(redis_client)
+    token = create_access_token({"sub": "admin@example.com"}, timedelta(minutes=10))
+    await verifier.verify(token)
+
+    await verifier.revoke(token)
+
+    key, value = redis_client.set.call_args.args
+    assert key == REVOKED_PREFIX + token_hash(token)
+    assert 0 < redis_client.set.call_args.kwargs["ex"] <= 601
+    redis_client.exists.return_value = 1
+    with pytest.raises(InvalidTokenError):
+        await verifier.verify(token)
+    assert verifier.stats()["size"] == 0
+
+
+@pytest.mark.asyncio
+async def test_revocation_check_failure_does_not_block(redis_client):
+    """Test that an unreachable Redis skips the revocation check instead of failing auth."""
+    redis_client.exists.side_effect = ConnectionError("redis down")
+    verifier = _verifier(redis_client)
+
+    claims = await verifier.verify(create_access_token({"sub": "admin@example.com"}))
+
+    assert claims["sub"] == "admin@example.com"
+    assert verifier.stats()["revocation_check_errors"] == 1
+
+
+def test_native_backend_matches_jose():
+    """Test that the stdlib verifier accepts jose-issued tokens and rejects tampered ones."""
+    token = create_access_token({"sub": "admin@example.com", "admin_id": "123"})
+
+    assert decode_native(token, JWT_SECRET_KEY, JWT_ALGORITHM) == jwt.decode(token, JWT_SECRET_KEY,
+                                                                            algorithms=[JWT_ALGORITHM])
+    header, payload, signature = token.split(".")
+    forged = jwt.encode({"sub": "other@example.com"}, "wrong_key", algorithm=JWT_ALGORITHM).split(".")[1]
+    for bad in (f"{header}.{forged}.{signature}", "invalid.token.here", token + "x",
+                jwt.encode({"sub": "a"}, JWT_SECRET_KEY, algorithm="HS512")):
+        with pytest.raises(InvalidTokenError):
+            decode_native(bad, JWT_SECRET_KEY, JWT_ALGORITHM)
+
+
+def test_native_backend_rejects_expired_token():
+    """Test that the stdlib verifier enforces exp."""
+    token = create_access_token({"sub": "admin@example.com"}, timedelta(seconds=-1))
+
+    with pytest.raises(InvalidTokenError):
+        decode_native(token, JWT_SECRET_KEY, JWT_ALGORITHM)
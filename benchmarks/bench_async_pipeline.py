@@ -0,0 +1,134 @@
+"""
+Load benchmark for /generate-response/.
+
+Fires N concurrent requests at the real router with every backend (Gemini, MySQL,
+Redis, MongoDB, Excel) replaced by a stub that sleeps for a fixed latency. Two modes
+are compared:
+
+- blocking: the stubs call time.sleep(), which is what the handler did before the
+  async pipeline (synchronous Gemini/pymysql/pymongo/redis calls inside `async def`).
+- async: the stubs await asyncio.sleep() and MySQL runs on the bounded executor, as
+  the handler does now.
+
+With blocking stubs the wall time grows with N (requests serialize on the event
+loop); with async stubs it stays close to a single request's latency.
+
+Usage:
+    python benchmarks/bench_async_pipeline.py --requests 20 --latency 0.05
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The benchmark never talks to real services; the Mongo client is only created lazily.
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+os.environ.setdefault("MONGO_DB_NAME", "bench")
+
+import httpx  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+from app.api import endpoints  # noqa: E402
+from app.core.security import get_current_admin  # noqa: E402
+
+ROWS = [{"loan_id": 1, "principal": 50000}]
+
+
+def build_app():
+    app = FastAPI()
+    app.include_router(endpoints.router)
+    app.dependency_overrides[get_current_admin] = lambda: {"email": "bench@example.com", "admin_id": "bench"}
+    return app
+
+
+def stubs(mode, latency):
+    """Patch every backend call made by process_user_input with a fixed-latency stub."""
+    if mode == "blocking":
+        async def wait(result=None):
+            time.sleep(latency)
+            return result
+    else:
+        async def wait(result=None):
+            await asyncio.sleep(latency)
+            return result
+
+    def blocking_query(query, max_rows=None, stream=None):
+        time.sleep(latency)
+        return ROWS, False
+
+    async def generate_sql(user_input, thread_id=None):
+        return await wait("SELECT loan_id, principal FROM loan;")
+
+    async def format_results(results, user_inp=None, truncated=False):
+        return await wait("One loan of 50000.")
+
+    async def execute_blocking(query, max_rows=None):
+        return blocking_query(query)
+
+    async def persist(*args, **kwargs):
+        return await wait({"total_conversations": 1})
+
+    patches = [
+        patch.object(endpoints, "generate_sql_async", generate_sql),
+        patch.object(endpoints, "format_results_async", format_results),
+        patch.object(endpoints, "insert_into_threads_async", persist),
+        patch.object(endpoints, "insert_into_conversations_async", persist),
+        patch.object(endpoints, "insert_into_redis_async", persist),
+        patch.object(endpoints, "append_conversation_async", persist),
+        patch.object(endpoints, "enqueue_export", persist),
+        patch.object(endpoints.sql_guard, "explain", False),  # no MySQL to EXPLAIN against
+    ]
+    if mode == "blocking":
+        patches.append(patch.object(endpoints, "execute_sql_query_async", execute_blocking))
+    else:
+        # Exercise the real bounded executor with a blocking query stub (result cache off)
+        patches.append(patch("app.services.database.fetch_sql_query", blocking_query))
+        patches.append(patch("app.services.database.query_result_cache.enabled", False))
+    return patches
+
+
+async def run(mode, requests, latency):
+    patches = stubs(mode, latency)
+    for p in patches:
+        p.start()
+    try:
+        transport = httpx.ASGITransport(app=build_app())
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            async def one(i):
+                response = await client.post("/generate-response/", json={"user_input": f"loans {i}"})
+                response.raise_for_status()
+
+            start = time.perf_counter()
+            await asyncio.gather(*(one(i) for i in range(requests)))
+            return time.perf_counter() - start
+    finally:
+        for p in patches:
+            p.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20, help="concurrent requests per mode")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per simulated backend call")
+    args = parser.parse_args()
+
+    # Backend calls per new-thread request: generate, query, format, thread insert,
+    # conversation insert, Redis insert, export enqueue. Run one after another they
+    # take 7 latencies; with the post-query fan-out they complete in 5 sequential stages
+    # (the thread is only created once formatting has succeeded).
+    single = 7 * args.latency
+    print(f"{args.requests} concurrent requests, {args.latency * 1000:.0f} ms per backend call "
+          f"(~{single * 1000:.0f} ms per request if run sequentially)")
+    for mode in ("blocking", "async"):
+        elapsed = asyncio.run(run(mode, args.requests, args.latency))
+        print(f"{mode:>8}: {elapsed:.3f}s total, {elapsed / single:.1f}x single-request latency")
+
+    elapsed = asyncio.run(run("async", 1, args.latency))
+    print(f"one async request: {elapsed * 1000:.0f} ms (sum of its backend calls: {single * 1000:.0f} ms)")
+
+
+if __name__ == "__main__":
+    main()
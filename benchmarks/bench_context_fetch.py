@@ -0,0 +1,97 @@
+"""
+Microbenchmark for the conversation-context lookup done before every SQL generation.
+
+Takes the values LRANGE would return for the last N conversations of a thread and
+times turning them into the list of previous queries:
+
+- legacy:          full records, json.loads twice per record (filter + value), as
+                   get_last_n_conversations did before (copied below)
+- records (json):  full records, one stdlib json.loads per record
+- records (codec): full records, one app.core.json_codec.loads per record (orjson
+                   when installed); the fallback path for threads without a
+                   context window
+- context window:  the query-only list at admin_thread:{id}:context, no decoding
+
+It also times encoding conversation records with the stdlib and with json_codec,
+which is what every thread insert/append pays.
+
+Usage:
+    python benchmarks/bench_context_fetch.py --conversations 5 --response-bytes 2000 --repeat 20000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core import json_codec  # noqa: E402
+
+
+def legacy_queries(conversations):
+    return [json.loads(conv)["query"] for conv in conversations if "query" in json.loads(conv)]
+
+
+def json_queries(conversations):
+    records = (json.loads(conv) for conv in conversations)
+    return [record["query"] for record in records if "query" in record]
+
+
+def codec_queries(conversations):
+    records = (json_codec.loads(conv) for conv in conversations)
+    return [record["query"] for record in records if "query" in record]
+
+
+def make_record(i, response_bytes):
+    """Conversation record shaped like build_conversation_record's output"""
+    return {
+        "conversation_id": f"1792265278522_{i:04d}",
+        "query": f"Show the EMIs overdue for more than {i + 1} months grouped by city",
+        "response": ("Overdue EMIs are concentrated in Pune and Nagpur. " * 64)[:response_bytes],
+        "timestamp": "2026-10-17T19:27:58.522000",
+        "data_type": ["emi", "loan", "user_information"],
+        "cols": ["emi_id", "loan_id", "due_date", "city"],
+        "rows": 42,
+        "truncated": False,
+        "excel_path": f"excel_files/1792265278522_{i:04d}",
+    }
+
+
+def timed(fn, arg, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(arg)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", type=int, default=5, help="previous conversations fetched (n)")
+    parser.add_argument("--response-bytes", type=int, default=2000, help="size of each formatted response")
+    parser.add_argument("--repeat", type=int, default=20000, help="lookups per measurement")
+    args = parser.parse_args()
+
+    records = [make_record(i, args.response_bytes) for i in range(args.conversations)]
+    blobs = [json.dumps(record) for record in records]
+    queries = [record["query"] for record in records]
+    assert legacy_queries(blobs) == json_queries(blobs) == codec_queries(blobs) == queries
+
+    print(f"{args.conversations} conversations, {args.response_bytes}-byte responses, "
+          f"json_codec backend: {json_codec.BACKEND}")
+    print("context lookup (us per call):")
+    for label, fn, arg in (
+        ("legacy", legacy_queries, blobs),
+        ("records (json)", json_queries, blobs),
+        ("records (codec)", codec_queries, blobs),
+        ("context window", list, queries),
+    ):
+        print(f"  {label:>16}: {timed(fn, arg, args.repeat):8.2f}")
+
+    print("record encoding (us per conversation):")
+    for label, fn in (("json", json.dumps), ("codec", json_codec.dumps)):
+        print(f"  {label:>16}: {timed(fn, records[0], args.repeat):8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Prompt size benchmark for result formatting.
+
+Builds the Gemini formatting prompt for synthetic loan results of increasing size and
+compares the previous behaviour (every row as indented JSON) with the summarized
+prompt built by `build_format_prompt`. Reports prompt characters, an estimated token
+count (~4 characters per token) and the time to build the prompt.
+
+With --live the prompts are also sent to Gemini (GEMINI_API_KEY must be set) to
+measure real token counts and end-to-end formatting latency.
+
+Usage:
+    python benchmarks/bench_format_prompt.py --rows 10 100 1000 10000 100000
+"""
+import argparse
+import datetime
+import json
+import os
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.result_formatter import build_format_prompt, serialize_dates, model  # noqa: E402
+
+QUESTION = "Show all loans disbursed this year"
+STATUSES = ("DISBURSED", "CLOSED", "OVERDUE", "PENDING")
+
+
+def make_rows(count):
+    start = datetime.date(2024, 1, 1)
+    return [{
+        "loan_id": i,
+        "user_id": 1000 + i % 97,
+        "principal": Decimal(25000 + (i * 137) % 50000) + Decimal("0.50"),
+        "interest_rate": Decimal("7.25") + Decimal(i % 5) / 4,
+        "status": STATUSES[i % len(STATUSES)],
+        "disbursed_date": start + datetime.timedelta(days=i % 365),
+    } for i in range(count)]
+
+
+def legacy_prompt(results):
+    formatted_data = json.dumps(results, indent=2, default=serialize_dates)
+    return f"Based on the user question \n\n {QUESTION} Format the following database query results into a readable sentence with insights which help to grow their business :\n\n{formatted_data}"
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10, 100, 1000, 10000, 100000])
+    parser.add_argument("--live", action="store_true", help="send prompts to Gemini for real token counts and latency")
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} | {'legacy chars':>12} {'~tokens':>9} {'build ms':>9} | "
+          f"{'summary chars':>13} {'~tokens':>9} {'build ms':>9}")
+    for count in args.rows:
+        rows = make_rows(count)
+        legacy, legacy_time = timed(legacy_prompt, rows)
+        compact, compact_time = timed(build_format_prompt, rows, QUESTION)
+        print(f"{count:>8} | {len(legacy):>12} {len(legacy) // 4:>9} {legacy_time * 1000:>9.1f} | "
+              f"{len(compact):>13} {len(compact) // 4:>9} {compact_time * 1000:>9.1f}")
+
+        if args.live:
+            for name, prompt in (("legacy", legacy), ("summary", compact)):
+                try:
+                    tokens = model.count_tokens(prompt).total_tokens
+                    _, latency = timed(model.generate_content, prompt)
+                    print(f"{'':>8}   {name}: {tokens} tokens, {latency:.2f}s Gemini latency")
+                except Exception as e:
+                    print(f"{'':>8}   {name}: Gemini call failed ({e})")
+
+
+if __name__ == "__main__":
+    main()
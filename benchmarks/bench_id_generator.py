@@ -0,0 +1,93 @@
+"""
+Throughput and uniqueness stress test for thread/conversation IDs.
+
+Generates IDs as fast as possible with:
+
+- legacy:   `<ms>_<randint(1000, 9999)>`, as helper.generate_id did before (copied below)
+- snowflake: app.core.id_generator.IdGenerator
+
+first from several threads in one process, then from several processes (standing in
+for uvicorn workers, each with its own node ID as the lifespan would lease), and
+reports IDs per second, duplicates, and IDs that sort before their predecessor from
+the same generator.
+
+Usage:
+    python benchmarks/bench_id_generator.py --ids 200000 --threads 4 --processes 4
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from multiprocessing import Pool
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.id_generator import IdGenerator  # noqa: E402
+
+
+def legacy_generate_id():
+    timestamp = int(time.time() * 1000)
+    random_part = random.randint(1000, 9999)
+    return f"{timestamp}_{random_part}"
+
+
+def out_of_order(ids):
+    return sum(1 for previous, current in zip(ids, ids[1:]) if current <= previous)
+
+
+def report(label, batches, elapsed):
+    ids = [id_ for batch in batches for id_ in batch]
+    duplicates = len(ids) - len(set(ids))
+    unsorted = sum(out_of_order(batch) for batch in batches)
+    print(f"  {label:>9}: {len(ids) / elapsed:>12,.0f} ids/s | duplicates {duplicates:>7} | "
+          f"out of order {unsorted:>7}")
+
+
+def threaded(generate, ids, threads):
+    batches = [[] for _ in range(threads)]
+
+    def worker(out):
+        out.extend(generate() for _ in range(ids // threads))
+
+    workers = [threading.Thread(target=worker, args=(out,)) for out in batches]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return batches, time.perf_counter() - start
+
+
+def process_batch(args):
+    kind, node_id, count = args
+    generate = legacy_generate_id if kind == "legacy" else IdGenerator(node_id=node_id).next_id
+    return [generate() for _ in range(count)]
+
+
+def multiprocess(kind, ids, processes):
+    with Pool(processes) as pool:
+        start = time.perf_counter()
+        batches = pool.map(process_batch, [(kind, node, ids // processes) for node in range(processes)])
+        return batches, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ids", type=int, default=200000, help="IDs generated per scenario")
+    parser.add_argument("--threads", type=int, default=4, help="threads sharing one generator")
+    parser.add_argument("--processes", type=int, default=4, help="worker processes, one node each")
+    args = parser.parse_args()
+
+    print(f"{args.ids} IDs, {args.threads} threads in one process:")
+    report("legacy", *threaded(legacy_generate_id, args.ids, args.threads))
+    report("snowflake", *threaded(IdGenerator(node_id=0).next_id, args.ids, args.threads))
+
+    print(f"{args.ids} IDs across {args.processes} processes:")
+    for kind in ("legacy", "snowflake"):
+        report(kind, *multiprocess(kind, args.ids, args.processes))
+
+
+if __name__ == "__main__":
+    main()
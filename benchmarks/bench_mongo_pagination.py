@@ -0,0 +1,144 @@
+"""
+Pagination benchmark for conversation history in MongoDB.
+
+Seeds a synthetic `conversations` collection (default 1M documents for one admin,
+spread over a few threads so single threads get deep histories) in a scratch
+database, then times fetching one page at increasing depths:
+
+- offset, no index:   sort + skip/limit, as get_conversations_by_thread did before
+- offset, indexed:    the same query once ensure_indexes' indexes exist
+- keyset, indexed:    the `cursor` path, seeking from the previous page's last row
+
+and the pagination total: count_documents on every page versus the cached count.
+
+Needs a reachable MongoDB; the scratch database is dropped at the end unless
+--keep is given (reuse it with --skip-seed).
+
+Usage:
+    python benchmarks/bench_mongo_pagination.py --uri mongodb://localhost:27017 --docs 1000000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+os.environ.setdefault("MONGO_DB_NAME", "bench")
+
+from pymongo import DESCENDING  # noqa: E402
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+from app.services import mongo_service  # noqa: E402
+
+ADMIN_ID = "bench_admin"
+LIMIT = 10
+
+
+async def seed(collection, docs, threads, batch_size=10000):
+    start_time = datetime(2024, 1, 1)
+    batch = []
+    for i in range(docs):
+        batch.append({
+            "conversation_id": f"conv_{i}",
+            "thread_id": f"thread_{i % threads}",
+            "admin_id": ADMIN_ID,
+            "query": "Show overdue EMIs by city",
+            "response": "Overdue EMIs are concentrated in Pune and Nagpur.",
+            "timestamp": (start_time + timedelta(seconds=i)).isoformat(),
+            "data_type": ["emi"],
+            "cols": ["emi_id", "city"],
+            "rows": 42,
+            "truncated": False,
+            "excel_path": f"excel_files/conv_{i}",
+        })
+        if len(batch) == batch_size:
+            await collection.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await collection.insert_many(batch, ordered=False)
+
+
+async def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        await fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+async def cursor_for_page(collection, thread_id, page):
+    """Cursor a client would hold after reading `page - 1` pages (fetched untimed)"""
+    if page == 1:
+        return None
+    docs = await collection.find({"admin_id": ADMIN_ID, "thread_id": thread_id}, {"timestamp": 1}) \
+        .sort([("timestamp", DESCENDING), ("_id", DESCENDING)]).skip((page - 1) * LIMIT - 1).to_list(length=1)
+    return mongo_service.encode_cursor(docs[0], "timestamp")
+
+
+async def measure_pages(collection, thread_id, depths, repeat, label, keyset):
+    for page in depths:
+        offset = await timed(lambda: mongo_service.get_conversations_by_thread(ADMIN_ID, thread_id, page, LIMIT),
+                             repeat)
+        line = f"  {label:>18} page {page:>6}: offset {offset:8.2f} ms"
+        if keyset:
+            cursor = await cursor_for_page(collection, thread_id, page)
+            seek = await timed(
+                lambda: mongo_service.get_conversations_by_thread(ADMIN_ID, thread_id, page, LIMIT, cursor), repeat
+            )
+            line += f" | keyset {seek:8.2f} ms"
+        print(line)
+
+
+async def run(args):
+    client = AsyncIOMotorClient(args.uri, serverSelectionTimeoutMS=5000)
+    db = client[args.db]
+    conversations = db["conversations"]
+    thread_id = "thread_0"
+    per_thread = args.docs // args.threads
+    depths = [page for page in (1, 10, 100, 1000, 10000) if page * LIMIT <= per_thread] or [1]
+    query_filter = {"admin_id": ADMIN_ID, "thread_id": thread_id}
+
+    try:
+        if not args.skip_seed:
+            await conversations.drop()
+            start = time.perf_counter()
+            await seed(conversations, args.docs, args.threads)
+            print(f"seeded {args.docs} conversations in {time.perf_counter() - start:.1f}s")
+        print(f"{per_thread} conversations per thread, {LIMIT} per page")
+
+        # Page timings reuse the cached total, so they measure the page query itself
+        with patch.object(mongo_service, "conversations_collection", lambda: conversations):
+            await conversations.drop_indexes()
+            await measure_pages(conversations, thread_id, depths[:3], 1, "no index", keyset=False)
+
+            await conversations.create_indexes(mongo_service.CONVERSATION_INDEXES)
+            await measure_pages(conversations, thread_id, depths, args.repeat, "indexed", keyset=True)
+
+        recount = await timed(lambda: conversations.count_documents(query_filter), args.repeat)
+        print(f"  count_documents per page: {recount:8.2f} ms")
+        mongo_service._count_cache.clear()
+        cached = await timed(lambda: mongo_service._cached_count(
+            conversations, query_filter, ("conversations", ADMIN_ID, thread_id)), args.repeat)
+        print(f"  cached count per page:    {cached:8.2f} ms (first page pays one count_documents)")
+    finally:
+        if not args.keep:
+            await client.drop_database(args.db)
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default=os.environ["MONGO_URI"], help="MongoDB connection string")
+    parser.add_argument("--db", default="adminbot_pagination_bench", help="scratch database (dropped afterwards)")
+    parser.add_argument("--docs", type=int, default=1000000, help="conversations to seed")
+    parser.add_argument("--threads", type=int, default=10, help="threads the conversations are spread over")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per measurement")
+    parser.add_argument("--skip-seed", action="store_true", help="reuse an existing scratch database")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch database")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
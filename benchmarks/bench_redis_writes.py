@@ -0,0 +1,142 @@
+"""
+Round-trip benchmark for Redis thread writes.
+
+Compares the previous command-per-call `insert_into_redis_async` /
+`append_conversation_async` (copied below as `legacy_*`) with the pipelined
+MULTI/EXEC versions in app/services/redis_service.py. Redis is replaced by an
+in-process fakeredis server whose connection sleeps for a simulated network
+round trip on every write to the socket, so the numbers show how many round trips
+each call makes and what they cost at a given RTT.
+
+Requires fakeredis (pip install fakeredis); no Redis server is needed.
+
+Usage:
+    python benchmarks/bench_redis_writes.py --threads 200 --conversations 5 --rtt 0.5
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    from fakeredis import FakeServer
+    from fakeredis.aioredis import FakeRedis, FakeAsyncRedisConnection
+except ImportError:
+    sys.exit("This benchmark needs fakeredis: pip install fakeredis")
+
+from app.services import redis_service  # noqa: E402
+
+
+class LatencyConnection(FakeAsyncRedisConnection):
+    """fakeredis connection that counts socket writes and delays each by the simulated RTT"""
+    rtt = 0.0
+    round_trips = 0
+
+    async def send_packed_command(self, command, check_health=True):
+        LatencyConnection.round_trips += 1
+        await asyncio.sleep(LatencyConnection.rtt)
+        return await super().send_packed_command(command, check_health)
+
+
+async def legacy_insert_into_redis_async(client, data, ttl=10800):
+    thread_id = data["thread_id"]
+    thread_key = f"admin_thread:{thread_id}"
+
+    thread_data = {
+        "thread_id": data["thread_id"],
+        "admin_id": data["admin_id"],
+        "chat_name": data["chat_name"],
+    }
+    await client.hset(thread_key, mapping=thread_data)
+    await client.expire(thread_key, ttl)
+
+    for conversation in data.get("conversations", []):
+        await client.rpush(f"{thread_key}:conversations", json.dumps(conversation))
+    await client.expire(f"{thread_key}:conversations", ttl)
+
+    return {"message": "Chat thread inserted successfully", "thread_id": thread_id}
+
+
+async def legacy_append_conversation_async(client, thread_id, conversation, ttl=10800):
+    key = f"admin_thread:{thread_id}:conversations"
+
+    await client.rpush(key, json.dumps(conversation))
+    await client.expire(key, ttl)
+    await client.expire(f"admin_thread:{thread_id}", ttl)
+
+    conversation_count = await client.llen(key)
+
+    return {"total_conversations": conversation_count}
+
+
+def make_thread(i, conversations):
+    return {
+        "thread_id": f"bench{i}",
+        "admin_id": "bench",
+        "chat_name": "Loans disbursed last month",
+        "conversations": [
+            {"conversation_id": f"bench{i}_{n}", "query": "Show loans", "response": "x" * 200}
+            for n in range(conversations)
+        ],
+    }
+
+
+async def measure(label, client, threads, conversations, insert, append):
+    """Insert `threads` threads then append one conversation to each; report round trips and latency"""
+    await client.flushdb()
+    results = []
+    for name, calls in (
+        ("insert", [insert(make_thread(i, conversations)) for i in range(threads)]),
+        ("append", [append(f"bench{i}", {"conversation_id": f"bench{i}_x", "query": "More"})
+                    for i in range(threads)]),
+    ):
+        LatencyConnection.round_trips = 0
+        start = time.perf_counter()
+        for call in calls:
+            await call
+        elapsed = time.perf_counter() - start
+        results.append((name, LatencyConnection.round_trips / threads, elapsed / threads * 1000))
+
+    lengths = {await client.llen(f"admin_thread:bench{i}:conversations") for i in range(threads)}
+    assert lengths == {conversations + 1}, lengths
+    for name, trips, ms in results:
+        print(f"{label:>9} {name}: {trips:4.1f} round trips, {ms:6.2f} ms per call")
+
+
+async def run(threads, conversations, rtt):
+    LatencyConnection.rtt = rtt
+    client = FakeRedis(server=FakeServer(), decode_responses=True, connection_class=LatencyConnection)
+    await client.ping()
+
+    await measure(
+        "legacy", client, threads, conversations,
+        lambda data: legacy_insert_into_redis_async(client, data),
+        lambda thread_id, conversation: legacy_append_conversation_async(client, thread_id, conversation),
+    )
+    with patch.object(redis_service, "async_redis_client", client):
+        await measure(
+            "pipelined", client, threads, conversations,
+            redis_service.insert_into_redis_async,
+            redis_service.append_conversation_async,
+        )
+    await client.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=200, help="threads inserted and appended to")
+    parser.add_argument("--conversations", type=int, default=5, help="conversations per inserted thread")
+    parser.add_argument("--rtt", type=float, default=0.5, help="simulated network round trip in ms")
+    args = parser.parse_args()
+
+    print(f"{args.threads} threads x {args.conversations} conversations, simulated RTT {args.rtt} ms")
+    asyncio.run(run(args.threads, args.conversations, args.rtt / 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""
+Microbenchmark for SQL table/column extraction.
+
+Compares the previous regex-based `extract_tables_and_columns` (copied below as
+`legacy_extract_tables_and_columns`) with the tokenizer/parser in
+app/services/sql_parser.py over a corpus of generated queries shaped like the ones
+the SQL generator produces. The parser is timed cold (every distinct query tokenized
+and parsed, scaled to the corpus size) and warm (every query already in the LRU
+cache, as for repeated questions).
+
+Usage:
+    python benchmarks/bench_sql_parser.py --queries 1000 --repeat 5
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.sql_parser import parse_sql  # noqa: E402
+
+TABLES = {
+    "loan": ["loan_id", "user_id", "principal", "interest_rate", "status", "disbursed_date"],
+    "emi": ["emi_id", "loan_id", "emi_amount", "due_date", "status", "paid_date"],
+    "users": ["user_id", "name", "email", "created_at"],
+    "user_information": ["user_id", "city", "salary", "credit_score"],
+}
+
+
+def generate_queries(count, seed=7):
+    """Mix of simple selects, joins, aggregates, subqueries and CTEs"""
+    rng = random.Random(seed)
+    queries = []
+    for i in range(count):
+        table = rng.choice(list(TABLES))
+        cols = rng.sample(TABLES[table], 2)
+        kind = i % 5
+        if kind == 0:
+            sql = f"SELECT {cols[0]}, {cols[1]} FROM {table} WHERE {cols[0]} IS NOT NULL LIMIT {rng.randint(1, 100)}"
+        elif kind == 1:
+            sql = (f"SELECT l.status, COUNT(*) AS loans, ROUND(AVG(e.emi_amount), 2) avg_emi FROM loan l "
+                   f"JOIN emi e ON e.loan_id = l.loan_id WHERE e.due_date >= '2024-0{rng.randint(1, 9)}-01' "
+                   f"GROUP BY l.status ORDER BY loans DESC")
+        elif kind == 2:
+            sql = (f"SELECT u.name, u.email FROM users u WHERE u.user_id IN "
+                   f"(SELECT user_id FROM loan WHERE principal > {rng.randint(1000, 90000)})")
+        elif kind == 3:
+            sql = (f"WITH recent AS (SELECT loan_id, principal FROM loan WHERE disbursed_date >= CURDATE() - "
+                   f"INTERVAL {rng.randint(1, 12)} MONTH) SELECT r.loan_id, SUM(e.emi_amount) FROM recent r "
+                   f"JOIN emi e ON e.loan_id = r.loan_id GROUP BY r.loan_id")
+        else:
+            sql = (f"SELECT `{cols[0]}`, UPPER(TRIM({cols[1]})) FROM `{table}` "
+                   f"WHERE {cols[0]} BETWEEN {rng.randint(1, 50)} AND {rng.randint(51, 100)}")
+        queries.append(sql)
+    return queries
+
+
+
+
+# --- Previous implementation, kept verbatim for comparison ---
+def legacy_extract_tables_and_columns(query):
+    """
+    Extract tables and columns from a SQL query string.
+    Excludes aggregation functions (COUNT, SUM, AVG, etc.) from the columns list.
+    
+    Args:
+        query (str): SQL query string
+        
+    Returns:
+        tuple: (list of tables, list of columns)
+    """
+    import re
+    
+    # Convert query to lowercase for easier matching
+    query = query.lower()
+    
+    # Extract tables
+    # Look for patterns after FROM and JOIN keywords
+    from_pattern = r'from\s+([a-zA-Z0-9_\.]+(?:\s*(?:as)?\s*[a-zA-Z0-9_]+)?(?:\s*,\s*[a-zA-Z0-9_\.]+(?:\s*(?:as)?\s*[a-zA-Z0-9_]+)?)*)'
+    join_pattern = r'join\s+([a-zA-Z0-9_\.]+(?:\s*(?:as)?\s*[a-zA-Z0-9_]+)?)'
+    
+    tables = []
+    
+    # Find tables after FROM
+    from_match = re.search(from_pattern, query)
+    if from_match:
+        from_tables = from_match.group(1).split(',')
+        for table in from_tables:
+            # Remove aliases and trim whitespace
+            table = re.sub(r'\s+as\s+', ' ', table).strip()
+            table = table.split()[0].strip()  # Get the first word after removing aliases
+            tables.append(table)
+    
+    # Find tables after JOIN
+    join_matches = re.finditer(join_pattern, query)
+    for match in join_matches:
+        join_table = match.group(1).strip()
+        # Remove aliases
+        join_table = re.sub(r'\s+as\s+', ' ', join_table).strip()
+        join_table = join_table.split()[0].strip()
+        tables.append(join_table)
+    
+    # Extract columns
+    columns = []
+    
+    # Find columns in SELECT clause
+    select_pattern = r'select\s+(.*?)\s+from'
+    select_match = re.search(select_pattern, query, re.DOTALL | re.IGNORECASE)
+    
+    if select_match:
+        select_columns = select_match.group(1)
+        
+        # Split by commas, but not within parentheses
+        cols = []
+        current_col = ''
+        paren_count = 0
+        
+        for char in select_columns:
+            if char == '(' and paren_count == 0:
+                paren_count += 1
+                current_col += char
+            elif char == ')' and paren_count > 0:
+                paren_count -= 1
+                current_col += char
+            elif char == ',' and paren_count == 0:
+                cols.append(current_col.strip())
+                current_col = ''
+            else:
+                current_col += char
+        
+        if current_col:
+            cols.append(current_col.strip())
+        
+        # List of common SQL aggregation functions to exclude
+        agg_functions = ['count', 'sum', 'avg', 'min', 'max', 'stdev', 'variance', 
+                         'first', 'last', 'group_concat', 'string_agg', 'array_agg', 
+                         'listagg', 'median', 'percentile', 'mode', 'rank', 'dense_rank', 
+                         'row_number', 'ntile', 'lead', 'lag']
+        
+        for col in cols:
+            # Handle the case of "table.column as alias"
+            col = col.strip()
+            if ' as ' in col.lower():
+                col = col.split(' as ')[0].strip()
+            
+            # Check if this is an aggregation function
+            is_agg_function = False
+            for func in agg_functions:
+                if col.lower().startswith(func + '('):
+                    is_agg_function = True
+                    break
+            
+            # Skip aggregation functions
+            if is_agg_function:
+                continue
+                
+            # Handle the case of "function(column)" for non-aggregation functions
+            if '(' in col and ')' in col:
+                # Try to extract column name from function
+                match = re.search(r'\(([^()]*)\)', col)
+                if match:
+                    extracted_col = match.group(1).strip()
+                    # Check if extracted content is a literal or a column
+                    if not (extracted_col.startswith("'") or 
+                            extracted_col.startswith('"') or 
+                            extracted_col.isdigit()):
+                        col = extracted_col
+                    else:
+                        # Skip string literals and numbers
+                        continue
+            
+            # Handle wildcards
+            if col == '*':
+                columns.append(col)
+            else:
+                # Remove table prefix if present
+                if '.' in col:
+                    col = col.split('.')[1]
+                columns.append(col)
+    
+    # Remove duplicates while preserving order
+    unique_tables = []
+    for table in tables:
+        if table not in unique_tables:
+            unique_tables.append(table)
+    
+    unique_columns = []
+    for col in columns:
+        if col not in unique_columns:
+            unique_columns.append(col)
+    
+    return unique_tables, unique_columns
+
+
+def time_pass(fn, queries, repeat, before_pass=None):
+    best = float("inf")
+    for _ in range(repeat):
+        if before_pass:
+            before_pass()
+        start = time.perf_counter()
+        for sql in queries:
+            fn(sql)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5, help="passes per variant; the best is reported")
+    args = parser.parse_args()
+
+    queries = generate_queries(args.queries)
+    distinct = list(dict.fromkeys(queries))
+    cache_size = parse_sql.cache_parameters()["maxsize"]
+    print(f"{len(queries)} queries ({len(distinct)} distinct, parse cache holds {cache_size}), "
+          f"best of {args.repeat} passes")
+
+    results = {
+        "legacy regex": time_pass(legacy_extract_tables_and_columns, queries, args.repeat),
+        # Every distinct query parsed from scratch
+        "parser (cold)": time_pass(parse_sql, distinct, args.repeat, before_pass=parse_sql.cache_clear)
+                         * len(queries) / len(distinct),
+    }
+    if len(distinct) <= cache_size:
+        parse_sql.cache_clear()
+        for sql in distinct:
+            parse_sql(sql)
+        results["parser (warm)"] = time_pass(parse_sql, queries, args.repeat)
+    else:
+        print("  (corpus exceeds the parse cache; skipping the warm pass)")
+
+    for name, elapsed in results.items():
+        print(f"{name:>14}: {elapsed * 1000:8.1f} ms total, {elapsed / len(queries) * 1e6:7.1f} us/query")
+
+    # Where the two disagree on tables, show a few examples
+    mismatches = [sql for sql in queries if legacy_extract_tables_and_columns(sql)[0] != list(parse_sql(sql).tables)]
+    print(f"table lists differ on {len(mismatches)} queries (legacy vs parser), e.g.:")
+    for sql in mismatches[:3]:
+        print(f"  {sql[:90]}...")
+        print(f"    legacy: {legacy_extract_tables_and_columns(sql)[0]}  parser: {list(parse_sql(sql).tables)}")
+
+
+if __name__ == "__main__":
+    main()
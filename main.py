@@ -1,8 +1,9 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.endpoints import router
+from app.core.lifespan import lifespan
 
-app = FastAPI(title="Loan Chatbot API")
+app = FastAPI(title="Loan Chatbot API", lifespan=lifespan)
 
 origins = [
     "http://localhost:5174", 